@@ -0,0 +1,59 @@
+"""
+Benchmark the bot's ``get_prefix`` function, comparing building the prefixes for
+every message against using the prefixes cached on the bot for each guild.
+
+Run with ``python benchmarks/get_prefix.py`` from the root of the repository.
+"""
+
+import argparse
+import timeit
+import types
+
+from voxelbotutils.cogs.utils.custom_bot import get_prefix, _build_prefixes
+
+
+def make_bot(role_count: int) -> types.SimpleNamespace:
+    """
+    Make an object with just enough of the bot's attributes for ``get_prefix``.
+    """
+
+    roles = [types.SimpleNamespace(id=i, tags=None) for i in range(role_count - 1)]
+    roles.append(types.SimpleNamespace(id=999, tags=types.SimpleNamespace(bot_id=1)))
+
+    def get_managed_role_id(guild_id):
+        managed = [i for i in roles if i.tags and i.tags.bot_id == 1]
+        return managed[0].id if managed else None
+
+    return types.SimpleNamespace(
+        config={"default_prefix": "!"},
+        owner_ids=set(),
+        guild_settings={5: {"prefix": "bot"}},
+        user=types.SimpleNamespace(id=1),
+        _prefix_cache=dict(),
+        get_managed_role_id=get_managed_role_id,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=100_000)
+    parser.add_argument("--roles", type=int, nargs="+", default=[10, 250])
+    args = parser.parse_args()
+
+    message = types.SimpleNamespace(
+        guild=types.SimpleNamespace(id=5),
+        author=types.SimpleNamespace(id=2),
+    )
+    for role_count in args.roles:
+        bot = make_bot(role_count)
+        uncached = timeit.timeit(lambda: _build_prefixes(bot, message, "bot"), number=args.iterations)
+        cached = timeit.timeit(lambda: get_prefix(bot, message), number=args.iterations)
+        print(
+            f"{role_count} roles: "
+            f"{args.iterations / uncached:,.0f} msg/s uncached, "
+            f"{args.iterations / cached:,.0f} msg/s cached"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -75,6 +75,7 @@ extras = {
     ],
     "postgres": [
         "asyncpg<0.22",
+        "orjson",
     ],
     "mysql": [
         "aiomysql",
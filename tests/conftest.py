@@ -0,0 +1,44 @@
+import contextlib
+import pathlib
+import typing
+
+import pytest
+
+from voxelbotutils import DatabaseWrapper
+
+
+_CLASS_ATTRS = (
+    "config", "pool", "enabled", "driver", "write_behind", "chunk_size", "statement_cache_size",
+    "statement_cache_threshold", "instrumentation", "replicas", "query_cache", "notifications",
+    "partitions",
+)
+
+
+@pytest.fixture
+def sqlite_database(tmp_path: pathlib.Path):
+    """
+    Gives an async context manager that creates a database pool for a SQLite file
+    in a temporary directory, with any extra config given, and closes it again
+    afterwards. The database class is put back how it was once the test is done.
+    """
+
+    original = {i: DatabaseWrapper.__dict__[i] for i in _CLASS_ATTRS if i in DatabaseWrapper.__dict__}
+
+    @contextlib.asynccontextmanager
+    async def create(name: str = "database.db", **config: typing.Any):
+        await DatabaseWrapper.create_pool({
+            "type": "sqlite",
+            "database": str(tmp_path / name),
+            **config,
+        })
+        try:
+            yield DatabaseWrapper
+        finally:
+            await DatabaseWrapper.close_pool()
+
+    yield create
+    for i in _CLASS_ATTRS:
+        if i in original:
+            setattr(DatabaseWrapper, i, original[i])
+        elif i in DatabaseWrapper.__dict__:
+            delattr(DatabaseWrapper, i)
@@ -0,0 +1,61 @@
+import asyncio
+
+import pytest
+
+from voxelbotutils import DatabaseWrapper, deadline
+from voxelbotutils.cogs.utils.errors import DeadlineExceeded
+
+
+async def create_numbers(database, count: int = 10) -> None:
+    async with database() as db:
+        await db("CREATE TABLE numbers (value INTEGER)")
+        await db.copy_records("numbers", ("value",), [(i,) for i in range(count)])
+
+
+def test_iterate_fetches_in_chunks(sqlite_database):
+    async def main():
+        async with sqlite_database() as database:
+            await create_numbers(database)
+            async with database() as db:
+                values = [i["value"] async for i in db.iterate("SELECT value FROM numbers ORDER BY value", chunk_size=3)]
+            assert values == list(range(10))
+    asyncio.run(main())
+
+
+def test_iterate_stopped_early_is_closed_with_the_connection(sqlite_database):
+    async def main():
+        async with sqlite_database() as database:
+            await create_numbers(database)
+            async with database() as db:
+                iterator = db.iterate("SELECT value FROM numbers", chunk_size=3)
+                async for _ in iterator:
+                    break
+                assert iterator.ag_frame is not None
+            assert iterator.ag_frame is None
+            assert db._iterators is None
+    asyncio.run(main())
+
+
+def test_iterate_is_recorded_by_instrumentation(sqlite_database):
+    async def main():
+        async with sqlite_database(instrumentation={"enabled": True}) as database:
+            await create_numbers(database)
+            recorded = []
+            database.instrumentation.record = lambda sql, args, elapsed, rows: recorded.append((sql, rows))
+            async with database() as db:
+                async for _ in db.iterate("SELECT value FROM numbers", chunk_size=4):
+                    pass
+            assert recorded == [("SELECT value FROM numbers", 10)]
+    asyncio.run(main())
+
+
+def test_iterate_raises_at_the_deadline(sqlite_database):
+    async def main():
+        async with sqlite_database() as database:
+            await create_numbers(database)
+            async with database() as db:
+                with pytest.raises(DeadlineExceeded):
+                    with deadline(0):
+                        async for _ in db.iterate("SELECT value FROM numbers"):
+                            pass
+    asyncio.run(main())
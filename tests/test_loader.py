@@ -0,0 +1,49 @@
+import asyncio
+
+from voxelbotutils.cogs.utils.database.loader import DataLoader
+
+
+def run_loader_test(sqlite_database, test):
+    async def main():
+        async with sqlite_database() as database:
+            async with database() as db:
+                await db("CREATE TABLE inventory (user_id INTEGER, item TEXT)")
+                for user_id, item in [(1, "a"), (1, "b"), (2, "c"), (3, "d")]:
+                    await db("INSERT INTO inventory VALUES (?, ?)", user_id, item)
+            await test()
+    asyncio.run(main())
+
+
+def test_concurrent_loads_are_batched(sqlite_database):
+    async def test():
+        loader = DataLoader("inventory", "user_id", columns=("user_id", "item"), name="test.one")
+        rows = await asyncio.gather(loader.load(2), loader.load(3), loader.load(2), loader.load(9))
+        assert [row and row["item"] for row in rows] == ["c", "d", "c", None]
+        assert loader.reset_stats() == {"loads": 4, "batches": 1, "keys": 3}
+
+        # Loads in separate ticks are separate batches
+        await loader.load(2)
+        await loader.load(3)
+        assert loader.reset_stats()["batches"] == 2
+    run_loader_test(sqlite_database, test)
+
+
+def test_many_and_batch_size(sqlite_database):
+    async def test():
+        loader = DataLoader("inventory", "user_id", many=True, max_batch_size=2, name="test.many")
+        rows = await loader.load_many([1, 2, 3, 9])
+        assert [sorted(i["item"] for i in row) for row in rows] == [["a", "b"], ["c"], ["d"], []]
+        assert loader.reset_stats() == {"loads": 4, "batches": 2, "keys": 4}
+    run_loader_test(sqlite_database, test)
+
+
+def test_errors_go_to_every_caller(sqlite_database):
+    async def test():
+        loader = DataLoader("missing_table", "user_id", name="test.missing")
+        results = await asyncio.gather(loader.load(1), loader.load(2), return_exceptions=True)
+        assert all(isinstance(i, Exception) for i in results)
+
+        # And the loader still works afterwards
+        loader.table_name = "inventory"
+        assert (await loader.load(3))["item"] == "d"
+    run_loader_test(sqlite_database, test)
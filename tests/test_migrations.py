@@ -0,0 +1,74 @@
+import asyncio
+
+import pytest
+
+from voxelbotutils.cogs.utils.database.migrations import Migration, MigrationRunner, split_sql_statements
+
+
+def test_split_on_top_level_semicolons():
+    assert split_sql_statements("CREATE TABLE a (b INT);\nINSERT INTO a VALUES (1)\n;") == [
+        "CREATE TABLE a (b INT)",
+        "INSERT INTO a VALUES (1)",
+    ]
+
+
+def test_split_ignores_quoted_semicolons():
+    sql = "INSERT INTO a VALUES ('x;y', 'it''s; fine'); SELECT \"odd;name\" FROM a"
+    assert split_sql_statements(sql) == [
+        "INSERT INTO a VALUES ('x;y', 'it''s; fine')",
+        "SELECT \"odd;name\" FROM a",
+    ]
+
+
+def test_split_keeps_dollar_quoted_bodies_together():
+    function = (
+        "CREATE FUNCTION f() RETURNS TRIGGER AS $body$\n"
+        "BEGIN\n    NEW.a = 1; RETURN NEW;\nEND;\n$body$ LANGUAGE plpgsql"
+    )
+    anonymous = "DO $$ BEGIN PERFORM 1; END $$"
+    assert split_sql_statements(f"{function};\n{anonymous};") == [function, anonymous]
+
+
+def test_split_dollar_parameters_arent_quotes():
+    sql = "UPDATE a SET b=$1 WHERE c=$2; SELECT 1"
+    assert split_sql_statements(sql) == ["UPDATE a SET b=$1 WHERE c=$2", "SELECT 1"]
+
+
+def test_split_drops_comment_only_statements():
+    sql = "-- a comment; with a semicolon\nSELECT 1; /* another; */ ; -- trailing"
+    assert split_sql_statements(sql) == ["-- a comment; with a semicolon\nSELECT 1"]
+
+
+def test_split_unterminated_quote_runs_to_the_end():
+    assert split_sql_statements("SELECT 'a; b") == ["SELECT 'a; b"]
+    assert split_sql_statements("SELECT $x$ a; b") == ["SELECT $x$ a; b"]
+
+
+def test_changed_migration_is_refused_unless_repeatable():
+    runner = MigrationRunner([Migration(1, "one", "SELECT 1"), Migration(0, "legacy", "SELECT 0", repeatable=True)])
+    assert [i.version for i in runner.migrations] == [0, 1]
+    assert runner.get_pending({0: "changed", 1: runner.migrations[1].checksum}) == [runner.migrations[0]]
+    with pytest.raises(RuntimeError):
+        runner.get_pending({1: "changed"})
+    with pytest.raises(RuntimeError):
+        MigrationRunner([Migration(1, "one", "SELECT 1"), Migration(1, "also one", "SELECT 2")])
+
+
+def test_runner_applies_each_migration_once(sqlite_database, tmp_path):
+    directory = tmp_path / "migrations"
+    directory.mkdir()
+    (directory / "0001_create.sql").write_text("CREATE TABLE a (b INTEGER); INSERT INTO a VALUES (1);")
+    (directory / "0002_insert.sql").write_text("INSERT INTO a VALUES (';');")
+    (directory / "notes.txt").write_text("not a migration")
+
+    async def main():
+        async with sqlite_database() as database:
+            async with database() as db:
+                runner = MigrationRunner.from_directory(str(directory))
+                assert [i.version for i in await runner.run(db)] == [1, 2]
+                assert await runner.run(db) == []
+                rows = await db("SELECT b FROM a ORDER BY b")
+                assert [str(i["b"]) for i in rows] == ["1", ";"]
+                applied = await runner.get_applied(db)
+                assert applied == {i.version: i.checksum for i in runner.migrations}
+    asyncio.run(main())
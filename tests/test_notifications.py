@@ -0,0 +1,58 @@
+import asyncio
+
+from voxelbotutils.cogs.utils.database.notifications import NotificationListener
+
+
+class FakeConnection:
+
+    def __init__(self, name):
+        self.name = name
+        self.listeners = dict()
+
+    async def execute(self, sql):
+        pass
+
+    async def close(self):
+        pass
+
+
+class FakeDriver:
+
+    @staticmethod
+    async def connect_listener(config):
+        return FakeConnection(config["database"])
+
+    @staticmethod
+    async def add_notification_listener(connection, channel, callback):
+        connection.listeners[channel] = callback
+
+    @staticmethod
+    async def remove_notification_listener(connection, channel, callback):
+        connection.listeners.pop(channel, None)
+
+
+class FakeDatabase:
+    config = {"database": "main"}
+    driver = FakeDriver
+
+
+def test_every_database_is_listened_to():
+    async def main():
+        listener = NotificationListener(FakeDatabase, {None: FakeDatabase.config, "partition0": {"database": "partition0"}})
+        received = []
+        await listener.add("before", lambda channel, payload: received.append((channel, payload)))
+        listener.start()
+        while len(listener.connections) < 2:
+            await asyncio.sleep(0)
+        await listener.add("after", lambda channel, payload: received.append((channel, payload)))
+        for connection in listener.connections.values():
+            assert set(connection.listeners) == {"before", "after"}
+
+        # Send a notification from the partition
+        partition = listener.connections["partition0"]
+        partition.listeners["after"](partition, 1, "after", "payload")
+        assert received == [("after", "payload")]
+
+        await listener.close()
+        assert not listener.connections
+    asyncio.run(main())
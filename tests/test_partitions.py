@@ -0,0 +1,45 @@
+import asyncio
+
+import pytest
+
+from voxelbotutils.cogs.utils.database.partitions import get_referenced_tables
+
+
+@pytest.mark.parametrize("sql, tables", [
+    ("SELECT * FROM guild_settings WHERE guild_id=$1", {"guild_settings"}),
+    ("SELECT * FROM public.\"Guild_Settings\" g JOIN role_list r ON g.guild_id=r.guild_id", {"guild_settings", "role_list"}),
+    ("INSERT INTO role_list (guild_id) VALUES ($1)", {"role_list"}),
+    ("UPDATE user_settings SET x=1", {"user_settings"}),
+    ("DELETE FROM role_list WHERE guild_id=$1", {"role_list"}),
+    ("CREATE TABLE IF NOT EXISTS role_list (guild_id BIGINT)", {"role_list"}),
+    ("WITH recent AS (SELECT * FROM role_list) SELECT * FROM recent", {"role_list"}),
+    ("SELECT * FROM generate_series(1, 3)", set()),
+    ("SELECT 1", set()),
+])
+def test_get_referenced_tables(sql, tables):
+    assert get_referenced_tables(sql) == tables
+
+
+def test_partitioned_connections_only_use_partitioned_tables(sqlite_database):
+    async def main():
+        partitions = {
+            "databases": [{"database": ":memory:", "name": "a"}, {"database": ":memory:", "name": "b"}],
+            "tables": ["guild_settings"],
+        }
+        async with sqlite_database(partitions=partitions) as database:
+            assert database.get_partition("guild_settings", 3) == "b"
+            assert database.get_partition("user_settings", 3) is None
+            assert database.get_table_partitions("guild_settings") == ["a", "b"]
+
+            async with database(guild_id=3) as db:
+                await db("CREATE TABLE guild_settings (guild_id INTEGER PRIMARY KEY)")
+                await db("INSERT INTO guild_settings VALUES (?)", 3)
+                assert len(await db("SELECT * FROM guild_settings")) == 1
+                with pytest.raises(RuntimeError):
+                    await db("SELECT * FROM user_settings")
+
+            # Naming the partition outright means you know what you're doing
+            async with database(partition="b") as db:
+                await db("CREATE TABLE user_settings (user_id INTEGER)")
+                await db("SELECT * FROM user_settings")
+    asyncio.run(main())
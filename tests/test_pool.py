@@ -0,0 +1,82 @@
+import asyncio
+import time
+
+import pytest
+
+from voxelbotutils import deadline
+from voxelbotutils.cogs.utils.database.pool import MonitoredPool, DatabasePoolTimeout
+from voxelbotutils.cogs.utils.database.sqlite_ import SQLiteWrapper
+from voxelbotutils.cogs.utils.deadline import DeadlineExceeded
+
+
+class SlowPool:
+    """
+    A pool whose connection arrives after a delay. Cancelling the acquire doesn't stop
+    it, like when the connection has already been handed over as we give up on it.
+    """
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.released = []
+
+    async def acquire(self):
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            await asyncio.sleep(self.delay)
+        return "connection"
+
+    async def release(self, connection):
+        self.released.append(connection)
+
+
+def test_connection_arriving_after_timeout_is_released():
+    async def main():
+        driver_pool = SlowPool(0.05)
+        pool = MonitoredPool("primary", driver_pool, SQLiteWrapper, acquire_timeout=0.01)
+        with pytest.raises(DatabasePoolTimeout):
+            await pool.acquire()
+        assert pool.timeouts == 1
+        await asyncio.sleep(0.1)
+        assert driver_pool.released == ["connection"]
+        assert pool.in_use == 0
+    asyncio.run(main())
+
+
+def test_cancelled_acquire_releases_connection():
+    async def main():
+        driver_pool = SlowPool(0.02)
+        pool = MonitoredPool("primary", driver_pool, SQLiteWrapper, acquire_timeout=1)
+        task = asyncio.ensure_future(pool.acquire())
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        await asyncio.sleep(0.05)
+        assert driver_pool.released == ["connection"]
+    asyncio.run(main())
+
+
+def test_acquire_stops_at_the_deadline():
+    async def main():
+        driver_pool = SlowPool(0.05)
+        pool = MonitoredPool("primary", driver_pool, SQLiteWrapper, acquire_timeout=10)
+        with pytest.raises(DeadlineExceeded):
+            with deadline(time.monotonic() + 0.01):
+                await pool.acquire()
+        assert pool.timeouts == 0
+        await asyncio.sleep(0.1)
+        assert driver_pool.released == ["connection"]
+    asyncio.run(main())
+
+
+def test_acquire_as_context_manager():
+    async def main():
+        driver_pool = SlowPool(0)
+        pool = MonitoredPool("primary", driver_pool, SQLiteWrapper)
+        async with pool.acquire() as connection:
+            assert connection == "connection"
+            assert pool.in_use == 1
+        assert pool.in_use == 0
+        assert driver_pool.released == ["connection"]
+    asyncio.run(main())
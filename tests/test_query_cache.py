@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+
+from voxelbotutils.cogs.utils.database.query_cache import QueryCache, get_written_tables
+
+
+@pytest.mark.parametrize("sql, tables", [
+    ("INSERT INTO shop_items (guild_id) VALUES ($1)", {"shop_items"}),
+    ("INSERT INTO public.\"Shop_Items\" VALUES ($1) ON CONFLICT (guild_id) DO UPDATE SET x=1", {"shop_items"}),
+    ("UPDATE shop_items SET price=$1", {"shop_items"}),
+    ("DELETE FROM shop_items WHERE guild_id=$1", {"shop_items"}),
+    ("TRUNCATE TABLE shop_items", {"shop_items"}),
+    ("ALTER TABLE shop_items ADD COLUMN x INT", {"shop_items"}),
+    ("DROP TABLE IF EXISTS shop_items", {"shop_items"}),
+    ("WITH moved AS (DELETE FROM a RETURNING *) INSERT INTO b SELECT * FROM moved", {"a", "b"}),
+    ("SELECT * FROM shop_items FOR UPDATE SKIP LOCKED", set()),
+    ("SELECT * FROM shop_items", set()),
+])
+def test_get_written_tables(sql, tables):
+    assert get_written_tables(sql) == tables
+
+
+def test_invalidate_removes_tagged_results():
+    async def main():
+        cache = QueryCache(maxsize=2, shared=False)
+        cache.set("a", [1], ttl=60, tags=["Shop_Items"])
+        cache.set("b", [2], ttl=60, tags=["users"])
+        assert cache.get("a") == [1]
+        assert cache.invalidate_for_sql("UPDATE shop_items SET x=1") == {"shop_items"}
+        assert cache.get("a") is None
+        assert cache.get("b") == [2]
+
+        # Least recently used results are evicted first
+        cache.set("c", [3], ttl=60, tags=["users"])
+        cache.set("d", [4], ttl=60, tags=["users"])
+        assert cache.get("b") is None
+        assert cache.reset_stats() == {"hits": 2, "misses": 2, "evictions": 1, "invalidations": 1}
+    asyncio.run(main())
+
+
+def test_results_read_before_an_invalidation_arent_stored():
+    async def main():
+        cache = QueryCache(shared=False)
+        generation = cache.generation
+        cache.invalidate("shop_items")
+        cache.set("a", [1], ttl=60, tags=["shop_items"], generation=generation)
+        assert cache.get("a") is None
+        cache.set("a", [1], ttl=60, tags=["shop_items"], generation=cache.generation)
+        assert cache.get("a") == [1]
+    asyncio.run(main())
+
+
+def test_writes_through_the_database_invalidate(sqlite_database):
+    async def main():
+        async with sqlite_database(query_cache={"shared": False}) as database:
+            async with database() as db:
+                await db("CREATE TABLE shop_items (price INTEGER)")
+                await db("INSERT INTO shop_items VALUES (1)")
+                sql = "SELECT price FROM shop_items"
+                assert len(await db.cached(sql, tags=["shop_items"])) == 1
+                await db("INSERT INTO shop_items VALUES (2)")
+                assert len(await db.cached(sql, tags=["shop_items"])) == 2
+
+                # Writes in a transaction invalidate when it commits
+                async with db.transaction() as tra:
+                    await tra("INSERT INTO shop_items VALUES (3)")
+                assert len(await db.cached(sql, tags=["shop_items"])) == 3
+                assert database.query_cache.reset_stats()["invalidations"] == 2
+    asyncio.run(main())
@@ -0,0 +1,109 @@
+import asyncio
+import logging
+
+from voxelbotutils.cogs.utils.database.postgres import PostgresWrapper
+from voxelbotutils.cogs.utils.settings_cache import SettingsCache
+
+
+def run_cache_test(sqlite_database, test, **cache_kwargs):
+    async def main():
+        async with sqlite_database() as database:
+            async with database() as db:
+                await db("CREATE TABLE guild_settings (guild_id INTEGER PRIMARY KEY, prefix TEXT)")
+                for guild_id in range(1, 6):
+                    await db("INSERT INTO guild_settings VALUES (?, ?)", guild_id, f"g{guild_id}")
+            cache = SettingsCache("guild_settings", "guild_id", {"guild_id": None, "prefix": "!"}, database=database, **cache_kwargs)
+            selected = []
+            select = cache._select
+
+            async def counted_select(keys):
+                selected.append(sorted(keys))
+                return await select(keys)
+            cache._select = counted_select
+            await test(cache, selected)
+    asyncio.run(main())
+
+
+def test_get_loads_rows_and_defaults(sqlite_database):
+    async def test(cache, selected):
+        assert (await cache.get(1))["prefix"] == "g1"
+        assert (await cache.get(99))["prefix"] == "!"
+        assert (await cache.get(1))["prefix"] == "g1"
+        assert selected == [[1], [99]]
+        assert cache.hits == 1
+    run_cache_test(sqlite_database, test)
+
+
+def test_least_recently_used_rows_are_evicted(sqlite_database):
+    async def test(cache, selected):
+        await cache.prefetch(1, 2)
+        await cache.get(1)
+        await cache.get(3)
+        assert list(cache) == [1, 3]
+        assert cache.evictions == 1
+    run_cache_test(sqlite_database, test, max_size=2)
+
+
+def test_stale_rows_are_reloaded(sqlite_database):
+    async def test(cache, selected):
+        await cache.get(1)
+        await asyncio.sleep(0.02)
+        row = cache[1]
+        assert row["prefix"] == "g1"  # The stale row is given back while it reloads
+        await asyncio.sleep(0.01)
+        assert selected == [[1], [1]]
+    run_cache_test(sqlite_database, test, ttl=0.01)
+
+
+def test_concurrent_loads_share_one_query(sqlite_database):
+    async def test(cache, selected):
+        rows = await asyncio.gather(cache.get(1), cache.get(1), cache.prefetch(1, 2))
+        assert rows[0] is rows[1]
+        assert selected == [[1], [2]]
+    run_cache_test(sqlite_database, test)
+
+
+def test_failed_load_is_raised_to_waiters(sqlite_database):
+    async def test(cache, selected):
+        async def fail(keys):
+            await asyncio.sleep(0)
+            raise RuntimeError("database went away")
+        cache._select = fail
+        results = await asyncio.gather(cache.get(1), cache.get(1), return_exceptions=True)
+        assert [str(i) for i in results] == ["database went away"] * 2
+        assert not cache._loading
+    run_cache_test(sqlite_database, test)
+
+
+def test_failed_background_load_is_logged(sqlite_database, caplog):
+    async def test(cache, selected):
+        async def fail(keys):
+            raise RuntimeError("database went away")
+        cache._select = fail
+        with caplog.at_level(logging.ERROR, logger="vbu.settings_cache"):
+            assert cache[1]["prefix"] == "!"
+            await asyncio.sleep(0.01)
+        assert "database went away" in caplog.text
+    run_cache_test(sqlite_database, test)
+
+
+def test_select_uses_the_drivers_any_condition(sqlite_database):
+    async def test(cache, selected):
+        conditions = []
+        driver = cache.database.driver
+
+        class RecordingDriver(driver):
+            @classmethod
+            def get_any_sql(cls, column, values):
+                conditions.append(list(values))
+                return super().get_any_sql(column, values)
+        cache.database.driver = RecordingDriver
+        await cache.prefetch(1, 2, 3)
+        assert [sorted(i) for i in conditions] == [[1, 2, 3]]
+        assert len(cache) == 3
+    run_cache_test(sqlite_database, test)
+
+
+def test_postgres_any_condition_is_the_same_for_any_number_of_keys():
+    sql = {PostgresWrapper.get_any_sql("guild_id", list(range(count)))[0] for count in (1, 2, 50)}
+    assert sql == {"guild_id = ANY($1)"}
@@ -0,0 +1,45 @@
+import asyncio
+
+from voxelbotutils import Bot
+from voxelbotutils.cogs.utils.settings_cache import SettingsStore
+
+
+def make_bot(database) -> Bot:
+    bot = Bot.__new__(Bot)
+    bot.database = database
+    bot.shard_ids = None
+    bot.shard_count = None
+    bot._settings_snapshot_column = "updated_at"
+    bot.guild_settings = SettingsStore("guild_settings", {"guild_id": None, "prefix": "!", "updated_at": None})
+    bot.user_settings = SettingsStore("user_settings", {"user_id": None, "updated_at": None})
+    return bot
+
+
+def test_load_settings_since_fetches_changes_and_deletes(sqlite_database):
+    async def main():
+        async with sqlite_database() as database:
+            async with database() as db:
+                await db("CREATE TABLE guild_settings (guild_id INTEGER PRIMARY KEY, prefix TEXT, updated_at TEXT DEFAULT CURRENT_TIMESTAMP)")
+                await db("CREATE TABLE user_settings (user_id INTEGER PRIMARY KEY, updated_at TEXT DEFAULT CURRENT_TIMESTAMP)")
+                for guild_id in (1, 2, 3):
+                    await db("INSERT INTO guild_settings VALUES (?, ?, '2000-01-01 00:00:00')", guild_id, f"g{guild_id}")
+
+            bot = make_bot(database)
+            loaded_at, _ = await bot._load_settings()
+            assert sorted(bot.guild_settings) == [1, 2, 3]
+            assert list(loaded_at) == [None]
+
+            # Change some rows in the database, and one in the cache that shouldn't be reloaded
+            async with database() as db:
+                await db("UPDATE guild_settings SET prefix='changed', updated_at=CURRENT_TIMESTAMP WHERE guild_id=1")
+                await db("DELETE FROM guild_settings WHERE guild_id=2")
+                await db("INSERT INTO guild_settings (guild_id, prefix) VALUES (4, 'new')")
+            bot.guild_settings[3]["prefix"] = "local"
+
+            _, changed = await bot._load_settings(since=loaded_at)
+            assert changed == 3
+            assert sorted(bot.guild_settings) == [1, 3, 4]
+            assert bot.guild_settings[1]["prefix"] == "changed"
+            assert bot.guild_settings[3]["prefix"] == "local"
+            assert bot.guild_settings[4]["prefix"] == "new"
+    asyncio.run(main())
@@ -0,0 +1,59 @@
+import gc
+import pickle
+
+from voxelbotutils.cogs.utils.settings_cache import SettingsStore
+
+
+def make_store() -> SettingsStore:
+    return SettingsStore("guild_settings", {"guild_id": None, "prefix": "!", "roles": [], "channels": {}, "tags": set()})
+
+
+def test_reading_unknown_keys_stores_nothing():
+    store = make_store()
+    for key in range(100):
+        assert store[key]["prefix"] == "!"
+        assert store[key]["roles"] == []
+        assert store[key]["channels"] == {}
+    gc.collect()
+    assert len(store) == 0
+    assert len(store._pending) == 0
+
+
+def test_setting_a_column_stores_the_row():
+    store = make_store()
+    row = store[1]
+    row["prefix"] = "?"
+    assert store[1] is row
+    assert store.dump() == {1: {"prefix": "?"}}
+
+
+def test_changing_a_mutable_default_in_place_stores_the_row():
+    store = make_store()
+    store[1]["roles"].append(10)
+    store[2]["channels"]["log"] = 20
+    store[3]["tags"].add("a")
+    store[4]["roles"] += [30]
+    assert store.dump() == {
+        1: {"roles": [10]},
+        2: {"channels": {"log": 20}},
+        3: {"tags": {"a"}},
+        4: {"roles": [30]},
+    }
+    assert make_store().defaults["roles"] == []
+
+
+def test_detached_row_merges_into_a_row_stored_since():
+    store = make_store()
+    roles = store[1]["roles"]
+    store[1] = store.row_class()
+    store[1]["prefix"] = "?"
+    roles.append(10)
+    assert store[1]["prefix"] == "?"
+    assert store[1]["roles"] == [10]
+
+
+def test_dump_pickles_as_plain_types():
+    store = make_store()
+    store[1]["roles"].append(10)
+    data = pickle.loads(pickle.dumps(store.dump()))
+    assert type(data[1]["roles"]) is list
@@ -0,0 +1,52 @@
+import asyncio
+
+import pytest
+
+
+def test_writes_are_batched_and_failures_only_undo_themselves(sqlite_database):
+    async def main():
+        async with sqlite_database() as database:
+            async with database() as db:
+                await db("CREATE TABLE items (id INTEGER PRIMARY KEY)")
+                writer = database.pool.pool.writer
+                assert writer is not None
+                batches = []
+                run_batch = writer.run_batch
+
+                async def counted_run_batch(batch):
+                    batches.append(len(batch))
+                    await run_batch(batch)
+                writer.run_batch = counted_run_batch
+
+                # Everything queued together goes in one transaction, and the bad
+                # writes don't stop the others from being committed
+                results = await asyncio.gather(
+                    db("INSERT INTO items VALUES (?)", 1),
+                    db.executemany("INSERT INTO items VALUES (?)", (2,), (3,), (1,)),
+                    db("INSERT INTO items VALUES (?)", 4),
+                    db("INSERT INTO missing VALUES (?)", 5),
+                    return_exceptions=True,
+                )
+                assert batches == [4]
+                assert results[0] == [] and results[2] == []
+                assert isinstance(results[1], Exception)
+                assert isinstance(results[3], Exception)
+                rows = await db("SELECT id FROM items ORDER BY id")
+                assert [i["id"] for i in rows] == [1, 4]
+    asyncio.run(main())
+
+
+def test_transactions_use_their_own_connection(sqlite_database):
+    async def main():
+        async with sqlite_database() as database:
+            async with database() as db:
+                await db("CREATE TABLE items (id INTEGER PRIMARY KEY)")
+                async with db.transaction() as tra:
+                    await db.executemany("INSERT INTO items VALUES (?)", (1,), (2,))
+                with pytest.raises(ValueError):
+                    async with db.transaction() as tra:
+                        await tra("INSERT INTO items VALUES (?)", 3)
+                        raise ValueError()
+                rows = await db("SELECT id FROM items ORDER BY id")
+                assert [i["id"] for i in rows] == [1, 2]
+    asyncio.run(main())
@@ -0,0 +1,78 @@
+import asyncio
+
+from voxelbotutils.cogs.utils.tiered_cache import CachedFunction
+
+
+def make_cache(**kwargs):
+    calls = []
+    release = asyncio.Event()
+
+    async def load(key):
+        calls.append(key)
+        await release.wait()
+        return f"{key}:{len(calls)}"
+    return CachedFunction(load, shared=False, name=f"test.{id(calls)}", **kwargs), calls, release
+
+
+def test_concurrent_calls_share_one_load():
+    async def main():
+        cache, calls, release = make_cache()
+        waiting = [asyncio.ensure_future(cache("a")) for _ in range(3)]
+        await asyncio.sleep(0)
+        release.set()
+        assert await asyncio.gather(*waiting) == ["a:1"] * 3
+        assert await cache("a") == "a:1"
+        assert calls == ["a"]
+        assert cache.reset_stats() == {"hits": 1, "shared_hits": 0, "misses": 1, "evictions": 0}
+    asyncio.run(main())
+
+
+def test_invalidate_during_load_drops_the_result():
+    async def main():
+        cache, calls, release = make_cache()
+        stale = asyncio.ensure_future(cache("a"))
+        await asyncio.sleep(0)
+        await cache.invalidate("a")
+
+        # Calls made after the invalidation don't wait on the old load
+        fresh = asyncio.ensure_future(cache("a"))
+        await asyncio.sleep(0)
+        release.set()
+        assert await stale == "a:2"
+        assert await fresh == "a:2"
+        assert calls == ["a", "a"]
+
+        # Only the load that started after the invalidation was stored
+        assert await cache("a") == "a:2"
+        assert len(calls) == 2
+        assert not cache._loading and not cache._invalidated_at
+    asyncio.run(main())
+
+
+def test_invalidate_keys_and_clear_drop_running_loads():
+    async def main():
+        cache, calls, release = make_cache()
+        first = asyncio.ensure_future(cache("a"))
+        second = asyncio.ensure_future(cache("b"))
+        await asyncio.sleep(0)
+        cache.invalidate_keys(cache._make_key(("a",), {}))
+        cache.clear()
+        release.set()
+        await asyncio.gather(first, second)
+        assert len(cache) == 0
+        await cache("b")
+        assert len(cache) == 1
+    asyncio.run(main())
+
+
+def test_lru_eviction():
+    async def main():
+        cache, calls, release = make_cache(maxsize=2)
+        release.set()
+        for key in ("a", "b", "a", "c"):
+            await cache(key)
+        assert cache.evictions == 1
+        await cache("a")
+        await cache("b")
+        assert calls == ["a", "b", "c", "b"]
+    asyncio.run(main())
@@ -0,0 +1,79 @@
+import asyncio
+
+
+def run_queue_test(sqlite_database, test, **write_behind):
+    async def main():
+        config = {"enabled": True, "delay": 60, **write_behind}
+        async with sqlite_database(write_behind=config) as database:
+            async with database() as db:
+                await db("CREATE TABLE settings (guild_id INTEGER PRIMARY KEY, prefix TEXT, level INTEGER CHECK (level >= 0))")
+            await test(database, database.write_behind)
+    asyncio.run(main())
+
+
+def test_writes_to_the_same_row_are_merged(sqlite_database):
+    async def test(database, queue):
+        await database.queue_upsert("settings", {"guild_id": 1}, {"prefix": "!"})
+        await database.queue_upsert("settings", {"guild_id": 1}, {"level": 2})
+        await database.queue_upsert("settings", {"guild_id": 1}, {"prefix": "?"})
+        assert len(queue) == 1
+        await queue.flush()
+        assert len(queue) == 0
+        async with database() as db:
+            rows = await db("SELECT * FROM settings")
+        assert [dict(i) for i in rows] == [{"guild_id": 1, "prefix": "?", "level": 2}]
+    run_queue_test(sqlite_database, test)
+
+
+def test_bad_row_does_not_block_its_batch(sqlite_database):
+    async def test(database, queue):
+        for guild_id, level in [(1, 1), (2, -1), (3, 3)]:
+            await database.queue_upsert("settings", {"guild_id": guild_id}, {"level": level})
+        await queue.flush()
+        async with database() as db:
+            rows = await db("SELECT guild_id FROM settings ORDER BY guild_id")
+        assert [i["guild_id"] for i in rows] == [1, 3]
+        assert list(queue.pending) == [("settings", (("guild_id", 2),))]
+        assert not queue.dead_letters
+    run_queue_test(sqlite_database, test, max_retries=2)
+
+
+def test_row_is_dropped_after_max_retries(sqlite_database):
+    async def test(database, queue):
+        await database.queue_upsert("settings", {"guild_id": 2}, {"level": -1})
+        await queue.flush()
+        assert len(queue) == 1
+        await queue.flush()
+        assert len(queue) == 0
+        assert not queue.attempts
+        [dropped] = queue.dead_letters
+        assert dropped.table_name == "settings"
+        assert dropped.keys == {"guild_id": 2}
+        assert dropped.values == {"level": -1}
+    run_queue_test(sqlite_database, test, max_retries=2)
+
+
+def test_failed_write_keeps_newer_values(sqlite_database):
+    async def test(database, queue):
+        await database.queue_upsert("settings", {"guild_id": 1}, {"prefix": "!", "level": -1})
+        await queue.flush()
+        await database.queue_upsert("settings", {"guild_id": 1}, {"level": 1})
+        assert queue.pending[("settings", (("guild_id", 1),))] == {"prefix": "!", "level": 1}
+        await queue.flush()
+        async with database() as db:
+            rows = await db("SELECT * FROM settings")
+        assert [dict(i) for i in rows] == [{"guild_id": 1, "prefix": "!", "level": 1}]
+        assert not queue.attempts
+    run_queue_test(sqlite_database, test)
+
+
+def test_discard_drops_queued_write(sqlite_database):
+    async def test(database, queue):
+        await database.queue_upsert("settings", {"guild_id": 1}, {"prefix": "!"})
+        await database.queue_upsert("settings", {"guild_id": 2}, {"prefix": "?"})
+        await database.discard_queued_upsert("settings", {"guild_id": 1})
+        await queue.flush()
+        async with database() as db:
+            rows = await db("SELECT guild_id FROM settings")
+        assert [i["guild_id"] for i in rows] == [2]
+    run_queue_test(sqlite_database, test)
@@ -179,7 +179,7 @@ def main():
         if config_type in ["website", "all"]:
             create_file("config", "website.toml", content=get_path_relative_to_file("config/web_config_example_file.toml"))
             create_file("config", "website.example.toml", content=get_path_relative_to_file("config/web_config_example_file.toml"))
-            create_file("config", "database.pgsql", content=get_path_relative_to_file("config/database_base_file.pgsql"))
+            create_file("config", "migrations", "0001_initial.sql", content=get_path_relative_to_file("config/database_base_file.pgsql"))
             create_file("_run_website.sh", content="vbu run-website .\n")
             create_file(".gitignore", content="__pycache__/\n.venv/\nconfig/config.toml\nconfig/website.toml\n")
             create_file("requirements.txt", content=f"voxelbotutils[web]>={__version__},<{next_version}\n")
@@ -192,7 +192,7 @@ def main():
         if config_type in ["bot", "all"]:
             create_file("config", "config.toml", content=get_path_relative_to_file("config/config_example_file.toml"))
             create_file("config", "config.example.toml", content=get_path_relative_to_file("config/config_example_file.toml"))
-            create_file("config", "database.pgsql", content=get_path_relative_to_file("config/database_base_file.pgsql"))
+            create_file("config", "migrations", "0001_initial.sql", content=get_path_relative_to_file("config/database_base_file.pgsql"))
             create_file("cogs", "ping_command.py", content=get_path_relative_to_file("config/cog_example_file.py"))
             create_file("_run_bot.sh", content="vbu run-bot .\n")
             create_file(".gitignore", content="__pycache__/\nconfig/config.toml\nconfig/website.toml\n")
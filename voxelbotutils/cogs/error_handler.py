@@ -49,6 +49,18 @@ class ErrorHandler(vbu.Cog):
                 "The bot isn't ready to start processing that command yet - please wait.",
             )
         ),
+        (
+            vbu.errors.DatabasePoolTimeout,
+            lambda ctx, error: gt("errors", localedir=LOCALE_PATH, languages=[ctx.locale], fallback=True).gettext(
+                "I'm too busy to run that command right now - please try again in a moment.",
+            )
+        ),
+        (
+            vbu.errors.DeadlineExceeded,
+            lambda ctx, error: gt("errors", localedir=LOCALE_PATH, languages=[ctx.locale], fallback=True).gettext(
+                "That command took too long to run - please try again in a moment.",
+            )
+        ),
         (
             commands.NSFWChannelRequired,
             lambda ctx, error: gt("errors", localedir=LOCALE_PATH, languages=[ctx.locale], fallback=True).gettext(
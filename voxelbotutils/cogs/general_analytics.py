@@ -13,12 +13,27 @@ class Analytics(vbu.Cog):
     def __init__(self, bot: vbu.Bot):
         super().__init__(bot)
         self.post_statsd_guild_count.start()
+        self.post_statsd_settings_cache.start()
+        self.post_statsd_caches.start()
+        self.post_statsd_statement_cache.start()
+        self.post_statsd_database_pool.start()
+        self.post_statsd_loaders.start()
         self.post_topgg_guild_count.start()
         self.post_discordbotlist_guild_count.start()
 
     def cog_unload(self):
         self.logger.info("Stopping Statsd guild count poster loop")
         self.post_statsd_guild_count.cancel()
+        self.logger.info("Stopping Statsd settings cache poster loop")
+        self.post_statsd_settings_cache.cancel()
+        self.logger.info("Stopping Statsd cache poster loop")
+        self.post_statsd_caches.cancel()
+        self.logger.info("Stopping Statsd statement cache poster loop")
+        self.post_statsd_statement_cache.cancel()
+        self.logger.info("Stopping Statsd database pool poster loop")
+        self.post_statsd_database_pool.cancel()
+        self.logger.info("Stopping Statsd data loader poster loop")
+        self.post_statsd_loaders.cancel()
         self.logger.info("Stopping Top.gg guild count poster loop")
         self.post_topgg_guild_count.cancel()
         self.logger.info("Stopping DiscordbotList.com guild count poster loop")
@@ -108,6 +123,98 @@ class Analytics(vbu.Cog):
     async def before_post_statsd_guild_count(self):
         await self.bot.wait_until_ready()
 
+    @tasks.loop(minutes=1)
+    async def post_statsd_settings_cache(self):
+        """
+        Post the hit/miss/eviction counts of the settings caches to Statsd.
+        """
+
+        if not self.bot.lazy_settings:
+            self.post_statsd_settings_cache.stop()
+            return
+        async with self.bot.stats() as stats:
+            for cache in (self.bot.guild_settings, self.bot.user_settings):
+                tags = {"table": cache.table_name}
+                for name, value in cache.reset_stats().items():
+                    stats.increment(f"vbu.settings_cache.{name}", value=value, tags=tags)
+                stats.gauge("vbu.settings_cache.size", value=len(cache), tags=tags)
+
+    @tasks.loop(minutes=1)
+    async def post_statsd_statement_cache(self):
+        """
+        Post the hit/miss counts of the database's prepared statement cache to Statsd.
+        """
+
+        if not self.bot.database.enabled:
+            return
+        async with self.bot.stats() as stats:
+            for name, value in self.bot.database.driver.reset_statement_cache_stats().items():
+                stats.increment(f"vbu.database.statement_cache.{name}", value=value)
+
+    @tasks.loop(seconds=15)
+    async def post_statsd_database_pool(self):
+        """
+        Post how the connections in the database pools are being used, and how long
+        it's taking to acquire them, to Statsd.
+        """
+
+        if not self.bot.database.enabled:
+            return
+        async with self.bot.stats() as stats:
+            for pool in self.bot.database.get_pools():
+                tags = {"pool": pool.name}
+                stats.gauge("vbu.database.pool.in_use", value=pool.in_use, tags=tags)
+                stats.gauge("vbu.database.pool.waiting", value=pool.waiting, tags=tags)
+                idle = pool.idle
+                if idle is not None:
+                    stats.gauge("vbu.database.pool.idle", value=idle, tags=tags)
+                pool_stats = pool.reset_stats()
+                stats.increment("vbu.database.pool.acquires", value=pool_stats["acquires"], tags=tags)
+                stats.increment("vbu.database.pool.timeouts", value=pool_stats["timeouts"], tags=tags)
+                stats.gauge("vbu.database.pool.acquire_wait_avg", value=pool_stats["wait_avg"], tags=tags)
+                stats.gauge("vbu.database.pool.acquire_wait_max", value=pool_stats["wait_max"], tags=tags)
+
+    @tasks.loop(minutes=1)
+    async def post_statsd_loaders(self):
+        """
+        Post the load and batch counts of each :class:`voxelbotutils.DataLoader` to Statsd.
+        """
+
+        async with self.bot.stats() as stats:
+            for loader in list(vbu.DataLoader.registry.values()):
+                tags = {"loader": loader.name}
+                loader_stats = loader.reset_stats()
+                for name, value in loader_stats.items():
+                    stats.increment(f"vbu.loader.{name}", value=value, tags=tags)
+                if loader_stats["batches"]:
+                    stats.gauge("vbu.loader.batch_size", value=loader_stats["keys"] / loader_stats["batches"], tags=tags)
+
+    @tasks.loop(minutes=1)
+    async def post_statsd_caches(self):
+        """
+        Post the size and hit rate of each of the caches made with :func:`voxelbotutils.cached` to Statsd.
+        """
+
+        async with self.bot.stats() as stats:
+            for cache in list(self.bot.caches.values()):
+                tags = {"cache": cache.name}
+                cache_stats = cache.reset_stats()
+                for name, value in cache_stats.items():
+                    stats.increment(f"vbu.cache.{name}", value=value, tags=tags)
+                stats.gauge("vbu.cache.size", value=len(cache), tags=tags)
+                lookups = cache_stats["hits"] + cache_stats["shared_hits"] + cache_stats["misses"]
+                if lookups:
+                    hit_rate = (cache_stats["hits"] + cache_stats["shared_hits"]) / lookups
+                    stats.gauge("vbu.cache.hit_rate", value=hit_rate, tags=tags)
+
+            # And the database's query cache
+            if self.bot.database.enabled:
+                query_cache = self.bot.database.query_cache
+                tags = {"cache": "vbu.query_cache"}
+                for name, value in query_cache.reset_stats().items():
+                    stats.increment(f"vbu.cache.{name}", value=value, tags=tags)
+                stats.gauge("vbu.cache.size", value=len(query_cache), tags=tags)
+
     @vbu.Cog.listener()
     async def on_socket_raw_send(self, payload: dict):
         """
@@ -641,11 +641,16 @@ class OwnerOnly(vbu.Cog, command_attrs={'hidden': True, 'add_slash_command': Fal
         Exports data for a given guild from the database.
 
         Autoamtically searches for any public tables with a `guild_id` column, and then exports that as a
-        file of "insert into" statements for you to use.
+        file of "insert into" statements for you to use. Partitioned tables are exported from the
+        partition that the guild is on.
         """
 
         # Open db connection
+        guild_id = guild_id or ctx.guild.id
         db = await self.bot.database.get_connection()
+        partition_db = db
+        if self.bot.database.partitions is not None:
+            partition_db = await self.bot.database.get_connection(guild_id=guild_id)
 
         # Get the tables that we want to export
         table_names = await db("SELECT DISTINCT table_name FROM INFORMATION_SCHEMA.COLUMNS WHERE table_schema='public' AND column_name='guild_id'")
@@ -655,7 +660,8 @@ class OwnerOnly(vbu.Cog, command_attrs={'hidden': True, 'add_slash_command': Fal
         for table in table_names:
 
             # Select the data we want to export
-            rows = await db("SELECT * FROM {} WHERE guild_id=$1".format(table['table_name']), guild_id or ctx.guild.id)
+            table_db = partition_db if self.bot.database.get_partition(table['table_name'], guild_id) else db
+            rows = await table_db("SELECT * FROM {} WHERE guild_id=$1".format(table['table_name']), guild_id)
             for row in rows:
                 cols = []
                 datas = []
@@ -673,6 +679,8 @@ class OwnerOnly(vbu.Cog, command_attrs={'hidden': True, 'add_slash_command': Fal
 
         # Wew nice
         await db.disconnect()
+        if partition_db is not db:
+            await partition_db.disconnect()
 
         # Make sure we have some data
         if not insert_statements:
@@ -717,7 +725,7 @@ class OwnerOnly(vbu.Cog, command_attrs={'hidden': True, 'add_slash_command': Fal
         file_content = textwrap.dedent(file_content).lstrip()
 
         # And donezo
-        file = discord.File(io.StringIO(file_content), filename=f"_db_migrate_{guild_id or ctx.guild.id}.py")
+        file = discord.File(io.StringIO(file_content), filename=f"_db_migrate_{guild_id}.py")
         await ctx.send(file=file)
 
     @export.command(name="table")
@@ -39,12 +39,12 @@ class BotSettings(vbu.Cog):
 
         # Store setting
         self.bot.guild_settings[ctx.guild.id][prefix_column] = new_prefix
-        async with self.bot.database() as db:
-            await db(
-                """INSERT INTO guild_settings (guild_id, {prefix_column}) VALUES ($1, $2)
-                ON CONFLICT (guild_id) DO UPDATE SET {prefix_column}=excluded.prefix""".format(prefix_column=prefix_column),
-                ctx.guild.id, new_prefix
-            )
+        await self.bot.database.queue_upsert(
+            "guild_settings",
+            {"guild_id": ctx.guild.id},
+            {prefix_column: new_prefix},
+        )
+        await self.bot.publish_settings_update("guild_settings", ctx.guild.id, prefix_column, new_prefix)
         await ctx.send(
             _(ctx, "bot_settings").gettext(f"My prefix has been updated to `{new_prefix}`."),
             allowed_mentions=discord.AllowedMentions.none(),
@@ -11,10 +11,14 @@ from .custom_bot import MinimalBot, Bot
 from .custom_cog import Cog
 from .custom_command import Command, Group
 from .custom_context import Context, AbstractMentionable, PrintContext, SlashContext
-from .database import DatabaseWrapper, DatabaseTransaction
+from .database import DatabaseWrapper, DatabaseTransaction, DataLoader
+from .settings_cache import SettingsCache, SettingsStore
+from .settings_snapshot import SettingsSnapshot
 from .redis import RedisConnection, RedisChannelHandler, redis_channel_handler
 from .statsd import StatsdConnection
+from .tiered_cache import CachedFunction, cached
 from .time_value import TimeValue
+from .deadline import deadline, time_remaining
 from .paginator import Paginator
 from .help_command import HelpCommand
 from .string import Formatter
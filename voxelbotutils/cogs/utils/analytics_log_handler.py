@@ -2,9 +2,12 @@ import typing
 import re
 import logging
 import json
+import asyncio
 
 import aiohttp
 
+from .deadline import DeadlineExceeded, time_remaining
+
 
 class AnalyticsLogHandler(logging.NullHandler):
     """
@@ -155,6 +158,18 @@ class AnalyticsClientSession(aiohttp.ClientSession):
             })
 
     async def _request(self, *args, **kwargs):
-        v = await super()._request(*args, **kwargs)
+
+        # Don't let a request outlive the command that made it
+        remaining = time_remaining()
+        if remaining is not None and 'timeout' not in kwargs:
+            if remaining <= 0:
+                raise DeadlineExceeded(0)
+            kwargs['timeout'] = aiohttp.ClientTimeout(total=remaining)
+        try:
+            v = await super()._request(*args, **kwargs)
+        except asyncio.TimeoutError:
+            if remaining is None or time_remaining() > 0:
+                raise
+            raise DeadlineExceeded(remaining) from None
         self.bot.loop.create_task(self.log_message_increment(v))
         return v
@@ -1,16 +1,15 @@
 from __future__ import annotations
 
 import asyncio
-import collections
 import glob
 import logging
 import typing
-import copy
 import string
 import platform
 import random
 import json
 import sys
+import time
 
 import aiohttp
 import toml
@@ -20,9 +19,13 @@ from discord.ext import commands
 import upgradechat
 
 from .custom_context import Context, SlashContext
+from .custom_cog import Cog
 from .database import DatabaseWrapper
-from .redis import RedisConnection
+from .settings_cache import SettingsCache, SettingsStore
+from .settings_snapshot import SettingsSnapshot
+from .redis import RedisConnection, RedisChannelHandler
 from .statsd import StatsdConnection
+from .tiered_cache import CachedFunction
 from .analytics_log_handler import AnalyticsLogHandler, AnalyticsClientSession
 from .shard_manager import ShardManagerClient
 from .embeddify import Embeddify
@@ -38,6 +41,9 @@ sys.path.append(".")
 def get_prefix(bot, message: discord.Message):
     """
     Get the guild prefix for the bot given the message that should be invoking a command.
+    The full list of prefixes is built once per guild and cached on the bot (as a tuple,
+    so that it can't be changed by whatever it's given to) until the guild's prefix
+    or managed role changes.
     """
 
     # Set our default
@@ -47,13 +53,36 @@ def get_prefix(bot, message: discord.Message):
 
     # Default prefix for DMs
     if message.guild is None:
+        guild_id = None
         prefix = config_prefix
 
     # Custom prefix or default prefix
     else:
-        guild_prefix = bot.guild_settings[message.guild.id][bot.config.get('guild_settings_prefix_column', 'prefix')]
+        guild_id = message.guild.id
+        guild_prefix = bot.guild_settings[guild_id][bot.config.get('guild_settings_prefix_column', 'prefix')]
         prefix = guild_prefix or config_prefix
 
+    # See if we've already built the prefixes for this guild
+    cache_key = tuple(prefix) if isinstance(prefix, list) else prefix
+    try:
+        cached_key, cached_prefixes = bot._prefix_cache[guild_id]
+    except KeyError:
+        pass
+    else:
+        if cached_key == cache_key:
+            return cached_prefixes
+
+    # We haven't so let's do that
+    prefixes = _build_prefixes(bot, message, prefix)
+    bot._prefix_cache[guild_id] = (cache_key, prefixes)
+    return prefixes
+
+
+def _build_prefixes(bot, message: discord.Message, prefix) -> typing.Tuple[str, ...]:
+    """
+    Build the list of prefixes that the bot should respond to given the guild's prefix setting.
+    """
+
     # Fuck iOS devices
     if type(prefix) is not list and prefix in ["'", "‘"]:
         prefix = ["'", "‘"]
@@ -74,15 +103,12 @@ def get_prefix(bot, message: discord.Message):
 
     # Add the bot's managed role
     if message.guild:
-        try:
-            managed_role = [i for i in message.guild.roles if i.tags and i.tags.bot_id == bot.user.id]
-        except Exception:
-            managed_role = None
-        if managed_role:
-            prefix.extend([f"<@&{managed_role[0].id}> "])
+        managed_role_id = bot.get_managed_role_id(message.guild.id)
+        if managed_role_id:
+            prefix.extend([f"<@&{managed_role_id}> "])
 
     # And we're FINALLY done
-    return commands.when_mentioned_or(*prefix)(bot, message)
+    return tuple(commands.when_mentioned_or(*prefix)(bot, message))
 
 
 class MinimalBot(commands.AutoShardedBot):
@@ -201,8 +227,14 @@ class Bot(MinimalBot):
             :class:`config file<BotConfig.statsd>`. May not be authenticated, but will fail silently
             if not.
         startup_method (asyncio.Task): The task that's run when the bot is starting up.
-        guild_settings (dict): A dictionary from the `guild_settings` Postgres table.
-        user_settings (dict): A dictionary from the `user_settings` Postgres table.
+        guild_settings (dict): A dictionary of rows from the `guild_settings` Postgres table. If the
+            :attr:`settings cache<BotConfig.database.settings_cache>` is enabled, this will instead
+            be a :class:`voxelbotutils.SettingsCache` instance.
+        user_settings (dict): A dictionary of rows from the `user_settings` Postgres table. If the
+            :attr:`settings cache<BotConfig.database.settings_cache>` is enabled, this will instead
+            be a :class:`voxelbotutils.SettingsCache` instance.
+        caches (typing.Dict[str, voxelbotutils.CachedFunction]): Every function that's been
+            decorated with :func:`voxelbotutils.cached`, by the name of its cache.
         user_agent (str): The user agent that the bot should use for web requests as set in the
             :attr:`config file<BotConfig.user_agent>`. This isn't used automatically anywhere,
             so it just here as a provided convenience.
@@ -262,6 +294,17 @@ class Bot(MinimalBot):
             allowed_mentions=allowed_mentions, max_messages=cached_messages, *args, **kwargs,
         )
 
+        # Cache the built prefixes for each guild, and keep track of our managed roles
+        self._prefix_cache: typing.Dict[typing.Optional[int], typing.Tuple[typing.Any, typing.Tuple[str, ...]]] = dict()
+        self._managed_roles: typing.Dict[int, int] = dict()
+        self.add_listener(self._index_all_managed_roles, "on_ready")
+        self.add_listener(self._index_managed_role, "on_guild_join")
+        self.add_listener(self._index_managed_role, "on_guild_available")
+        self.add_listener(self._remove_managed_role_index, "on_guild_remove")
+        self.add_listener(self._on_role_create_managed_role, "on_guild_role_create")
+        self.add_listener(self._on_role_delete_managed_role, "on_guild_role_delete")
+        self.add_listener(self._on_role_update_managed_role, "on_guild_role_update")
+
         # Set up our default guild settings
         self.DEFAULT_GUILD_SETTINGS = {
             self.config.get('guild_settings_prefix_column', 'prefix'): self.config['default_prefix'],
@@ -292,6 +335,25 @@ class Bot(MinimalBot):
         # the config is reloaded
         self._upgrade_chat = None
 
+        # Listen for settings changes made by other processes
+        self.settings_update_listener = RedisChannelHandler(
+            RedisConnection.settings_channel,
+            type(self).apply_settings_update,
+        )
+        self.settings_update_listener.cog = self
+        self.query_cache_listener = RedisChannelHandler(
+            RedisConnection.query_cache_channel,
+            type(self).apply_query_cache_invalidation,
+        )
+        self.query_cache_listener.cog = self
+        self.cache_listener = RedisChannelHandler(
+            RedisConnection.cache_channel,
+            type(self).apply_cache_invalidation,
+        )
+        self.cache_listener.cog = self
+        self._row_change_channel: typing.Optional[str] = None
+        self._reloading_rows: typing.Dict[typing.Tuple[str, int], bool] = dict()
+
         # Store the startup method so I can see if it completed successfully
         self.startup_method = None
         self.shard_manager = None
@@ -304,8 +366,362 @@ class Bot(MinimalBot):
         logging.getLogger('discord.webhook.sync').addHandler(handler)
 
         # Here's the storage for cached stuff
-        self.guild_settings = collections.defaultdict(lambda: copy.deepcopy(self.DEFAULT_GUILD_SETTINGS))
-        self.user_settings = collections.defaultdict(lambda: copy.deepcopy(self.DEFAULT_USER_SETTINGS))
+        self.caches: typing.Dict[str, CachedFunction] = CachedFunction.registry
+        settings_cache_config = self.config.get('database', {}).get('settings_cache', {})
+        if settings_cache_config.get('enabled', False):
+            self.guild_settings = SettingsCache(
+                "guild_settings", "guild_id", self.DEFAULT_GUILD_SETTINGS,
+                max_size=settings_cache_config.get('max_size') or None, ttl=settings_cache_config.get('ttl') or None,
+                key_filter=self.is_guild_on_shards,
+            )
+            self.user_settings = SettingsCache(
+                "user_settings", "user_id", self.DEFAULT_USER_SETTINGS,
+                max_size=settings_cache_config.get('max_size') or None, ttl=settings_cache_config.get('ttl') or None,
+            )
+        else:
+            self.guild_settings = SettingsStore("guild_settings", self.DEFAULT_GUILD_SETTINGS)
+            self.user_settings = SettingsStore("user_settings", self.DEFAULT_USER_SETTINGS)
+
+        # Keep a snapshot of the settings between restarts
+        self.settings_snapshot: typing.Optional[SettingsSnapshot] = None
+        snapshot_config = self.config.get('database', {}).get('snapshot', {})
+        if snapshot_config.get('enabled', False) and not self.lazy_settings:
+            self.settings_snapshot = SettingsSnapshot(snapshot_config.get('path', '.settings_snapshot'))
+        self._settings_snapshot_column: str = snapshot_config.get('updated_column', 'updated_at')
+
+    def clear_prefix_cache(self, guild: typing.Optional[discord.abc.Snowflake] = None) -> None:
+        """
+        Remove the cached prefixes for a guild, so that they're rebuilt the next time a
+        message is received. Changes to a guild's prefix setting are picked up automatically,
+        so you should only need this if you've changed how the prefixes are built.
+
+        Args:
+            guild (discord.abc.Snowflake, optional): The guild whose prefixes should be removed.
+                If not given, the prefixes for every guild are removed.
+        """
+
+        if guild is None:
+            self._prefix_cache.clear()
+        else:
+            self._prefix_cache.pop(guild.id, None)
+
+    def get_managed_role_id(self, guild_id: int) -> typing.Optional[int]:
+        """
+        Get the ID of the role that Discord made for the bot in a given guild. This is
+        looked up from an index that's kept up to date from gateway events, so it's
+        safe to use in hot paths.
+
+        Args:
+            guild_id (int): The ID of the guild whose managed role you want.
+
+        Returns:
+            typing.Optional[int]: The ID of the bot's managed role, if the guild has one.
+        """
+
+        return self._managed_roles.get(guild_id)
+
+    def get_managed_role(self, guild: discord.Guild) -> typing.Optional[discord.Role]:
+        """
+        Get the role that Discord made for the bot in a given guild.
+
+        Args:
+            guild (discord.Guild): The guild whose managed role you want.
+
+        Returns:
+            typing.Optional[discord.Role]: The bot's managed role, if the guild has one.
+        """
+
+        role_id = self._managed_roles.get(guild.id)
+        if role_id is None:
+            return None
+        return guild.get_role(role_id)
+
+    def _is_managed_role(self, role: discord.Role) -> bool:
+        return bool(role.tags and self.user and role.tags.bot_id == self.user.id)
+
+    def _set_managed_role(self, guild_id: int, role_id: typing.Optional[int]) -> None:
+        """
+        Update the managed role index for a guild, removing the guild's cached
+        prefixes if the role changed.
+        """
+
+        if self._managed_roles.get(guild_id) == role_id:
+            return
+        if role_id is None:
+            self._managed_roles.pop(guild_id, None)
+        else:
+            self._managed_roles[guild_id] = role_id
+        self._prefix_cache.pop(guild_id, None)
+
+    async def _index_all_managed_roles(self) -> None:
+        for guild in self.guilds:
+            await self._index_managed_role(guild)
+
+    async def _index_managed_role(self, guild: discord.Guild) -> None:
+        role = discord.utils.find(self._is_managed_role, guild.roles)
+        self._set_managed_role(guild.id, role.id if role else None)
+
+    async def _remove_managed_role_index(self, guild: discord.Guild) -> None:
+        self._managed_roles.pop(guild.id, None)
+        self._prefix_cache.pop(guild.id, None)
+
+    async def _on_role_create_managed_role(self, role: discord.Role) -> None:
+        if self._is_managed_role(role):
+            self._set_managed_role(role.guild.id, role.id)
+
+    async def _on_role_delete_managed_role(self, role: discord.Role) -> None:
+        if self._managed_roles.get(role.guild.id) == role.id:
+            self._set_managed_role(role.guild.id, None)
+
+    async def _on_role_update_managed_role(self, before: discord.Role, after: discord.Role) -> None:
+        if self._is_managed_role(after):
+            self._set_managed_role(after.guild.id, after.id)
+        elif self._managed_roles.get(after.guild.id) == after.id:
+            self._set_managed_role(after.guild.id, None)
+
+    async def publish_settings_update(self, table: str, key: int, column: str, value: typing.Any) -> None:
+        """
+        Tell every other process running the bot that a cached setting has been changed, so that
+        they can update their own :attr:`guild_settings` or :attr:`user_settings`. This does nothing
+        if Redis isn't enabled. You should call this after writing the change to the database
+        and to the bot's own cache.
+
+        Args:
+            table (str): The name of the cached table that was changed - ``guild_settings`` or ``user_settings``.
+            key (int): The guild or user ID whose settings were changed.
+            column (str): The name of the setting that was changed.
+            value (typing.Any): The new value of the setting.
+        """
+
+        if not self.redis.enabled:
+            return
+        async with self.redis() as re:
+            await re.publish_settings_update(table, key, column, value)
+
+    def apply_settings_update(self, payload: dict) -> None:
+        """
+        Apply a settings change published by another process via :func:`publish_settings_update`.
+
+        :meta private:
+        """
+
+        # Don't apply our own changes
+        if payload.get("origin") == RedisConnection.instance_id:
+            return
+
+        # Get the cache that was changed
+        key = payload["key"]
+        cache = self._get_settings_cache(payload["table"], key)
+        if cache is None:
+            return
+
+        # Lazy caches will load the row when it's next needed
+        if self.lazy_settings and key not in cache:
+            return
+        cache[key][payload["column"]] = payload["value"]
+
+    def _get_settings_cache(self, table: str, key: int) -> typing.Optional[typing.MutableMapping]:
+        """
+        Get the settings cache for the given table, or ``None`` if the table isn't cached
+        or the key belongs to a guild that isn't on the running shards.
+        """
+
+        if table == "guild_settings":
+            if not self.is_guild_on_shards(key):
+                return None
+            return self.guild_settings
+        elif table == "user_settings":
+            return self.user_settings
+        return None
+
+    async def apply_row_change(self, channel: str, payload: str) -> None:
+        """
+        Apply a row change sent by a trigger from :func:`DatabaseWrapper.get_notify_trigger_sql`,
+        dropping the query cache results for its table and updating the cached settings.
+        Changed rows are selected again rather than cached from the payload, since the
+        payload's JSON values don't always have the same types as the row's columns
+        (and are left out entirely for large rows).
+
+        :meta private:
+        """
+
+        data = json.loads(payload)
+        self.database.query_cache.invalidate(data["table"], publish=False)
+
+        # Get the cache that was changed
+        keys = data.get("keys", {})
+        if len(keys) != 1:
+            return
+        key_column, key = list(keys.items())[0]
+        cache = self._get_settings_cache(data["table"], key)
+        if cache is None:
+            return
+
+        # Update the cached row
+        if data["op"] == "DELETE":
+            if key in cache:
+                del cache[key]
+            return
+        if self.lazy_settings and key not in cache:
+            return
+        try:
+            await self._reload_settings_row(data["table"], key_column, key, cache)
+        except Exception as e:
+            self.logger.error(f"Failed to reload changed row {key} of {data['table']} - {e}", exc_info=True)
+
+    async def _reload_settings_row(self, table: str, key_column: str, key: int, cache: typing.MutableMapping) -> None:
+        """
+        Select a settings row from the database and update the cached copy. If the row is
+        changed again while it's being selected, it's selected again once that's done,
+        so that an older read can never overwrite a newer one.
+        """
+
+        reload_key = (table, key)
+        if reload_key in self._reloading_rows:
+            self._reloading_rows[reload_key] = True
+            return
+        try:
+            while True:
+                self._reloading_rows[reload_key] = False
+                sql = "SELECT * FROM {0} WHERE {1}={2}".format(table, key_column, next(self.database.driver().prepare()))
+                async with self.database(partition=self.database.get_partition(table, key)) as db:
+                    rows = await db(sql, key)
+                if not self._reloading_rows[reload_key]:
+                    break
+        finally:
+            self._reloading_rows.pop(reload_key, None)
+        if not rows:
+            if key in cache:
+                del cache[key]
+            return
+        row = cache[key]
+        for column, value in rows[0].items():
+            row[column] = value
+
+    def apply_query_cache_invalidation(self, payload: dict) -> None:
+        """
+        Drop the query cache results invalidated by another process.
+
+        :meta private:
+        """
+
+        if payload.get("origin") == RedisConnection.instance_id:
+            return
+        self.database.query_cache.invalidate(*payload["tags"], publish=False)
+
+    def apply_cache_invalidation(self, payload: dict) -> None:
+        """
+        Drop the :class:`voxelbotutils.CachedFunction` results invalidated by another process.
+
+        :meta private:
+        """
+
+        if payload.get("origin") == RedisConnection.instance_id:
+            return
+        cache = CachedFunction.registry.get(payload["name"])
+        if cache is not None:
+            cache.invalidate_keys(*payload["keys"])
+
+    @property
+    def _filters_shards(self) -> bool:
+        """
+        Whether or not this instance only runs a subset of the bot's shards.
+        """
+
+        if not self.shard_ids or not self.shard_count or self.shard_count <= 1:
+            return False
+        return len(set(self.shard_ids)) < self.shard_count
+
+    def is_guild_on_shards(self, guild_id: int) -> bool:
+        """
+        Whether or not a guild with the given ID would be connected to one of this
+        instance's shards. This is always ``True`` if the instance runs all of the
+        bot's shards.
+
+        Args:
+            guild_id (int): The ID of the guild that you want to check.
+
+        Returns:
+            bool: Whether or not the guild belongs to this instance.
+        """
+
+        if not self._filters_shards:
+            return True
+        return (guild_id >> 22) % self.shard_count in self.shard_ids
+
+    def get_shard_filter_sql(self, column: str = "guild_id", *, start: int = 1) -> typing.Tuple[str, typing.List[int]]:
+        """
+        Get an SQL condition that only matches rows whose guild IDs belong to this
+        instance's shards, for use when filling caches in
+        :func:`voxelbotutils.Cog.cache_setup`.
+
+        Examples:
+
+            ::
+
+                async def cache_setup(self, db):
+                    condition, args = self.bot.get_shard_filter_sql()
+                    async for row in db.iterate(f"SELECT * FROM role_list WHERE {condition}", *args):
+                        ...
+
+                    # Or if you have other arguments before it
+                    condition, args = self.bot.get_shard_filter_sql(start=2)
+                    rows = await db(f"SELECT * FROM role_list WHERE key=$1 AND {condition}", "example", *args)
+
+        Args:
+            column (str, optional): The name of the column that holds the guild ID.
+            start (int, optional): The number of the first placeholder that the condition
+                should use, for drivers with numbered arguments.
+
+        Returns:
+            typing.Tuple[str, typing.List[int]]: The SQL condition and the arguments that should
+                be passed along with it. If this instance runs all of the bot's shards then the
+                condition matches every row.
+        """
+
+        if not self._filters_shards:
+            return "1=1", []
+        prep = self.database.driver().prepare()
+        for _ in range(start - 1):
+            next(prep)
+        shard_ids = sorted(set(self.shard_ids))
+        shard_count_arg = next(prep)
+        condition = "({0} >> 22) % {1} IN ({2})".format(
+            column,
+            shard_count_arg,
+            ", ".join(next(prep) for _ in shard_ids),
+        )
+        return condition, [self.shard_count, *shard_ids]
+
+    @property
+    def lazy_settings(self) -> bool:
+        """
+        Whether or not the bot's settings are being loaded lazily via a
+        :class:`voxelbotutils.SettingsCache`.
+        """
+
+        return isinstance(self.guild_settings, SettingsCache)
+
+    async def prefetch_settings(self, guild_id: int = None, user_id: int = None) -> None:
+        """
+        Make sure that the settings for a given guild and user are loaded into
+        :attr:`guild_settings` and :attr:`user_settings`. This does nothing unless the
+        :attr:`settings cache<BotConfig.database.settings_cache>` is enabled, as all of the
+        settings are otherwise loaded at startup.
+
+        Args:
+            guild_id (int, optional): The ID of the guild whose settings should be loaded.
+            user_id (int, optional): The ID of the user whose settings should be loaded.
+        """
+
+        if not self.lazy_settings or not self.database.enabled:
+            return
+        tasks = []
+        if guild_id is not None:
+            tasks.append(self.guild_settings.prefetch(guild_id))
+        if user_id is not None:
+            tasks.append(self.user_settings.prefetch(user_id))
+        await asyncio.gather(*tasks)
 
     async def startup(self):
         """
@@ -333,19 +749,15 @@ class Bot(MinimalBot):
         # Get database connection
         db = await self.database.get_connection()
 
-        # Get default guild settings
-        default_guild_settings = await db("SELECT * FROM guild_settings WHERE guild_id=0")
-        if not default_guild_settings:
-            await db("INSERT INTO guild_settings (guild_id) VALUES (0)")
-            default_guild_settings = await db("SELECT * FROM guild_settings WHERE guild_id=0")
+        # Get default guild settings, which are kept with guild 0 if the table is partitioned
+        async with self.database(partition=self.database.get_partition("guild_settings", 0)) as guild_db:
+            default_guild_settings = await guild_db("SELECT * FROM guild_settings WHERE guild_id=0")
+            if not default_guild_settings:
+                await guild_db("INSERT INTO guild_settings (guild_id) VALUES (0)")
+                default_guild_settings = await guild_db("SELECT * FROM guild_settings WHERE guild_id=0")
         for i, o in default_guild_settings[0].items():
             self.DEFAULT_GUILD_SETTINGS.setdefault(i, o)
-
-        # Get guild settings
-        data = await self._get_all_table_data(db, "guild_settings")
-        for row in data:
-            for key, value in row.items():
-                self.guild_settings[row['guild_id']][key] = value
+        self.guild_settings.set_columns()
 
         # Get default user settings
         default_user_settings = await db("SELECT * FROM user_settings WHERE user_id=0")
@@ -354,25 +766,260 @@ class Bot(MinimalBot):
             default_user_settings = await db("SELECT * FROM user_settings WHERE user_id=0")
         for i, o in default_user_settings[0].items():
             self.DEFAULT_USER_SETTINGS.setdefault(i, o)
+        self.user_settings.set_columns()
+
+        # Get the settings from our snapshot if we can, otherwise from the database
+        restored_cogs: typing.Set[str] = set()
+        snapshot = None
+        if self.settings_snapshot is not None and self.settings_snapshot.loaded_at is None:
+            snapshot = await self.settings_snapshot.read(**self._get_snapshot_shards())
+        if snapshot is not None:
+            restored_cogs = await self._apply_settings_snapshot(snapshot)
+        elif not self.lazy_settings:
+            loaded_at, _ = await self._load_settings()
+            if self.settings_snapshot is not None:
+                self.settings_snapshot.loaded_at = loaded_at
 
-        # Get user settings
-        data = await self._get_all_table_data(db, "user_settings")
-        for row in data:
-            for key, value in row.items():
-                self.user_settings[row['user_id']][key] = value
+        # Close database connection
+        await db.disconnect()
 
         # Run the user-added startup methods
-        async def fake_cache_setup_method(db):
-            pass
-        for _, cog in self.cogs.items():
-            await getattr(cog, "cache_setup", fake_cache_setup_method)(db)
+        restored_at = snapshot["loaded_at"].get(None) if restored_cogs else None
+        await self._run_cache_setup(restored=restored_cogs, restored_at=restored_at)
 
         # Wait for the bot to cache users before continuing
         self.logger.debug("Waiting until ready before completing startup method.")
         await self.wait_until_ready()
 
-        # Close database connection
-        await db.disconnect()
+    async def _load_settings(self, since: typing.Optional[dict] = None) -> typing.Tuple[typing.Dict[typing.Optional[str], typing.Any], int]:
+        """
+        Load the guild and user settings tables into the cache. Each database that the tables
+        are on is read in a single transaction, along with the database's current time, so that
+        the rows changed afterwards can be found using the database's own clock.
+
+        If ``since`` is given (the times from a previous load, by partition) then only the rows
+        changed since then are fetched, and any cached rows that have since been deleted
+        from the database are removed.
+
+        Returns the time that each database was read at, keyed by partition name (``None``
+        for the main database), and the number of rows that were loaded or removed.
+        """
+
+        tables = [
+            ("guild_settings", "guild_id", self.guild_settings, True),
+            ("user_settings", "user_id", self.user_settings, False),
+        ]
+        databases: typing.Dict[typing.Optional[str], list] = dict()
+        for table in tables:
+            for partition in self.database.get_table_partitions(table[0]):
+                databases.setdefault(partition, list()).append(table)
+
+        # Read each database
+        loaded_at: typing.Dict[typing.Optional[str], typing.Any] = dict()
+        present_keys: typing.Dict[str, typing.Set[int]] = {i[0]: set() for i in tables}
+        changed = 0
+        for partition, partition_tables in databases.items():
+            partition_since = since[partition] if since is not None else None
+            async with self.database(partition=partition) as db:
+                async with db.transaction(commit_on_exit=False) as transaction:
+                    rows = await transaction("SELECT CURRENT_TIMESTAMP AS loaded_at")
+                    loaded_at[partition] = rows[0]["loaded_at"]
+                    for table_name, key_column, store, sharded in partition_tables:
+                        changed += await self._load_settings_table(
+                            transaction, table_name, key_column, store,
+                            sharded=sharded, since=partition_since,
+                            present_keys=present_keys[table_name] if since is not None else None,
+                        )
+
+        # Remove anything that's been deleted
+        if since is not None:
+            for table_name, _, store, _ in tables:
+                for key in [i for i in store if i not in present_keys[table_name]]:
+                    del store[key]
+                    changed += 1
+        return loaded_at, changed
+
+    async def _load_settings_table(
+            self, db, table_name: str, key_column: str, store, *,
+            sharded: bool, since: typing.Any = None, present_keys: typing.Optional[typing.Set[int]] = None) -> int:
+        """
+        Load the rows of one of the settings tables into the given store, only getting those
+        changed since the given time if there is one. The primary keys of every row in the
+        table are added to ``present_keys`` if it's given.
+
+        Returns the number of rows that were loaded.
+        """
+
+        conditions, args = [], []
+        if since is not None:
+            conditions.append("{0} >= {1}".format(self._settings_snapshot_column, next(self.database.driver().prepare())))
+            args.append(since)
+        if sharded:
+            condition, shard_args = self.get_shard_filter_sql(key_column, start=len(args) + 1)
+            conditions.append(condition)
+            args.extend(shard_args)
+        sql = "SELECT * FROM {0}".format(table_name)
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        loaded = 0
+        async for row in db.iterate(sql, *args):
+            cached = store[row[key_column]]
+            for key, value in row.items():
+                cached[key] = value
+            loaded += 1
+
+        # Get the keys of every row, so that deleted rows can be removed
+        if present_keys is not None:
+            sql, args = "SELECT {0} FROM {1}".format(key_column, table_name), []
+            if sharded:
+                condition, args = self.get_shard_filter_sql(key_column)
+                sql += " WHERE " + condition
+            async for row in db.iterate(sql, *args):
+                present_keys.add(row[key_column])
+        return loaded
+
+    def _get_snapshot_shards(self) -> typing.Dict[str, typing.Any]:
+        """
+        Get the shard information that a settings snapshot is valid for.
+        """
+
+        return {
+            "shard_count": self.shard_count,
+            "shard_ids": sorted(set(self.shard_ids)) if self.shard_ids is not None else None,
+        }
+
+    async def _apply_settings_snapshot(self, snapshot: dict) -> typing.Set[str]:
+        """
+        Restore the settings and cog caches from a snapshot, then fetch any settings
+        rows that were changed after the snapshot was taken and remove any that were deleted.
+        Falls back to loading the full tables if the changed rows can't be fetched.
+
+        Returns the names of the cogs whose caches were restored.
+        """
+
+        assert self.settings_snapshot is not None
+        self.guild_settings.load(snapshot["guild_settings"])
+        self.user_settings.load(snapshot["user_settings"])
+
+        # Get the rows that have changed since the snapshot
+        try:
+            loaded_at, changed = await self._load_settings(since=snapshot["loaded_at"])
+        except Exception as e:
+            self.logger.warning(f"Failed to get changed settings since the snapshot, loading all settings - {e}")
+            self.guild_settings.clear()
+            self.user_settings.clear()
+            loaded_at, _ = await self._load_settings()
+            self.settings_snapshot.loaded_at = loaded_at
+            return set()
+        self.settings_snapshot.loaded_at = loaded_at
+
+        # Restore the cog caches
+        restored_cogs = set()
+        for name, attributes in snapshot["cogs"].items():
+            cog = self.cogs.get(name)
+            if cog is None or set(attributes) != set(getattr(cog, "snapshot_attributes", ())):
+                continue
+            for attr, value in attributes.items():
+                setattr(cog, attr, value)
+            restored_cogs.add(name)
+        self.logger.info(f"Restored settings from snapshot with {changed} changed rows and {len(restored_cogs)} cog caches")
+        return restored_cogs
+
+    async def save_settings_snapshot(self) -> bool:
+        """
+        Write the bot's settings and the :attr:`snapshotted attributes<voxelbotutils.Cog.snapshot_attributes>`
+        of its cogs to the :attr:`settings snapshot<BotConfig.database.snapshot>` file. This is run
+        automatically when the bot is closed.
+
+        Returns:
+            bool: Whether or not the snapshot was written. It won't be if snapshots aren't enabled
+                or if the settings haven't been loaded.
+        """
+
+        if self.settings_snapshot is None:
+            return False
+        cogs = {
+            name: {attr: getattr(cog, attr) for attr in cog.snapshot_attributes}
+            for name, cog in self.cogs.items()
+            if getattr(cog, "snapshot_attributes", None)
+        }
+        data = {
+            "guild_settings": self.guild_settings.dump(),
+            "user_settings": self.user_settings.dump(),
+            "cogs": cogs,
+        }
+        return await self.settings_snapshot.write(data, **self._get_snapshot_shards())
+
+    async def _run_cache_setup(self, restored: typing.Collection[str] = (), restored_at: typing.Any = None):
+        """
+        Run the cache setup method for each of the loaded cogs concurrently, each on its own
+        database connection. Cogs wait for those named in their
+        :attr:`voxelbotutils.Cog.cache_setup_after` list to finish before starting.
+        Cogs named in ``restored`` had their caches restored from the settings snapshot,
+        so have their :func:`voxelbotutils.Cog.cache_restored` method run instead.
+        """
+
+        def is_overridden(cog, name):
+            method = getattr(type(cog), name, None)
+            return method is not None and method is not getattr(Cog, name)
+
+        cogs = {
+            name: cog
+            for name, cog in self.cogs.items()
+            if is_overridden(cog, "cache_setup")
+            or (name in restored and is_overridden(cog, "cache_restored"))
+        }
+        limit = asyncio.Semaphore(self.config.get('database', {}).get('cache_setup_concurrency', 5) or len(cogs) or 1)
+        timings: typing.Dict[str, float] = {}
+        tasks: typing.Dict[str, asyncio.Task] = {}
+
+        async def run_cache_setup(name, cog, dependencies):
+            if dependencies:
+                await asyncio.gather(*dependencies)
+            async with limit:
+                start = time.perf_counter()
+                async with self.database() as db:
+                    if name in restored:
+                        await cog.cache_restored(db, restored_at)
+                    else:
+                        await cog.cache_setup(db)
+                timings[name] = (time.perf_counter() - start) * 1_000
+            self.logger.debug(f"Ran cache setup for cog {name} in {timings[name]:.2f}ms")
+
+        def create_task(name, stack=()):
+            if name in tasks:
+                return tasks[name]
+            if name in stack:
+                raise RuntimeError(f"Cog {name} has a circular cache setup dependency")
+            cog = cogs[name]
+            dependencies = []
+            for dependency in getattr(cog, "cache_setup_after", ()):
+                if dependency not in cogs:
+                    if dependency in self.cogs:
+                        continue  # It's loaded but has nothing to set up
+                    self.logger.warning(f"Cog {name} depends on cog {dependency} for cache setup, but it isn't loaded")
+                    continue
+                dependencies.append(create_task(dependency, (*stack, name)))
+            tasks[name] = self.loop.create_task(run_cache_setup(name, cog, dependencies))
+            return tasks[name]
+
+        # Start all of our tasks
+        try:
+            for name in cogs:
+                create_task(name)
+            await asyncio.gather(*tasks.values())
+        except Exception:
+            for task in tasks.values():
+                task.cancel()
+            raise
+
+        # And report how long they took
+        async with self.stats() as stats:
+            for name, elapsed in timings.items():
+                stats.timing("vbu.cache_setup.duration", value=elapsed, tags={"cog": name})
+        if timings:
+            slowest = sorted(timings.items(), key=lambda i: i[1], reverse=True)
+            self.logger.info("Ran cache setup for cogs - " + ", ".join(f"{i} ({o:.2f}ms)" for i, o in slowest))
 
     async def _run_sql_exit_on_error(self, db, sql, *args):
         """
@@ -385,12 +1032,41 @@ class Bot(MinimalBot):
             self.logger.critical(f"Error selecting from table - {e}")
             exit(1)
 
-    async def _get_all_table_data(self, db, table_name):
+    async def _iterate_table_data(self, db, table_name, guild_column=None):
+        """
+        Iterate over all of the rows in a table given its name, fetching them in chunks,
+        and exit if we get an error. If a guild column is given then only the rows for
+        guilds on this instance's shards are selected. Partitioned tables are read from
+        each of their partitions.
+        """
+
+        if guild_column is None:
+            sql, args = "SELECT * FROM {0}".format(table_name), []
+        else:
+            condition, args = self.get_shard_filter_sql(guild_column)
+            sql = "SELECT * FROM {0} WHERE {1}".format(table_name, condition)
+        try:
+            async for row in self._iterate_partitions(db, table_name, sql, *args):
+                yield row
+        except Exception as e:
+            self.logger.critical(f"Error selecting from table - {e}")
+            exit(1)
+
+    async def _iterate_partitions(self, db, table_name, sql, *args):
         """
-        Select all from a table given its name.
+        Iterate over the rows returned by some SQL that selects from the given table,
+        running it on each of the :attr:`partitions<BotConfig.database.partitions>` that
+        the table is spread across, or just with the given connection if it isn't partitioned.
         """
 
-        return await self._run_sql_exit_on_error(db, "SELECT * FROM {0}".format(table_name))
+        for partition in self.database.get_table_partitions(table_name):
+            if partition is None:
+                async for row in db.iterate(sql, *args):
+                    yield row
+                continue
+            async with self.database(partition=partition) as partition_db:
+                async for row in partition_db.iterate(sql, *args):
+                    yield row
 
     async def _get_list_table_data(self, db, table_name, key):
         """
@@ -399,6 +1075,34 @@ class Bot(MinimalBot):
 
         return await self._run_sql_exit_on_error(db, "SELECT * FROM {0} WHERE key=$1".format(table_name), key)
 
+    async def get_context(self, message, *, cls=None) -> Context:
+        """
+        Create a new context object using the utils' Context, making sure that the
+        guild's settings are loaded first so that its prefix is known.
+
+        :meta private:
+        """
+
+        if message.guild is not None and not message.author.bot:
+            await self.prefetch_settings(message.guild.id)
+        return await super().get_context(message, cls=cls)
+
+    async def invoke(self, ctx) -> None:
+        """
+        Invoke a command, making sure that the relevant settings are loaded first.
+        Settings are only loaded for messages that are actually running a command.
+
+        :meta private:
+        """
+
+        if ctx.command is not None and not ctx.author.bot:
+            if isinstance(ctx, commands.SlashContext):
+                guild_id = ctx.interaction.guild_id
+            else:
+                guild_id = ctx.guild.id if ctx.guild else None
+            await self.prefetch_settings(guild_id, ctx.author.id)
+        return await super().invoke(ctx)
+
     async def fetch_support_guild(self) -> typing.Optional[discord.Guild]:
         """
         Get the support guild as set in the bot's :attr:`config file<BotConfig.support_guild_id>`.
@@ -822,6 +1526,20 @@ class Bot(MinimalBot):
                 self.logger.critical(f"Cloudflare rate limit reached - {json.dumps(headers)}")
             raise
 
+        # Start listening for settings changes from other processes
+        if self.redis.enabled and self.settings_update_listener.task is None:
+            self.settings_update_listener.start()
+        if self.redis.enabled and self.query_cache_listener.task is None:
+            self.query_cache_listener.start()
+        if self.redis.enabled and self.cache_listener.task is None:
+            self.cache_listener.start()
+
+        # Start listening for row changes sent by the database
+        notifications_config = self.config.get("database", {}).get("notifications", {})
+        if notifications_config.get("enabled", False) and self.database.enabled and self._row_change_channel is None:
+            self._row_change_channel = notifications_config.get("channel", "vbu_row_changes")
+            await self.database.listen(self._row_change_channel, self.apply_row_change)
+
     async def start(self, token: str = None, *args, **kwargs):
         """:meta private:"""
 
@@ -860,6 +1578,25 @@ class Bot(MinimalBot):
     async def close(self, *args, **kwargs):
         """:meta private:"""
 
+        if self.settings_update_listener.task is not None:
+            self.logger.debug("Cancelling settings update listener")
+            self.settings_update_listener.cancel()
+        if self.query_cache_listener.task is not None:
+            self.logger.debug("Cancelling query cache listener")
+            self.query_cache_listener.cancel()
+        if self.cache_listener.task is not None:
+            self.logger.debug("Cancelling cache invalidation listener")
+            self.cache_listener.cancel()
+        if self._row_change_channel is not None:
+            self.logger.debug("Removing database row change listener")
+            await self.database.unlisten(self._row_change_channel, self.apply_row_change)
+            self._row_change_channel = None
+        if self.database.write_behind is not None:
+            self.logger.debug("Flushing database write queue")
+            await self.database.flush_writes()
+        if self.settings_snapshot is not None:
+            self.logger.debug("Writing settings snapshot")
+            await self.save_settings_snapshot()
         self.logger.debug("Closing aiohttp ClientSession")
         await asyncio.wait_for(self.session.close(), timeout=None)
         self.logger.debug("Running original D.py logout method")
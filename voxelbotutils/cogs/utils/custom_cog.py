@@ -24,6 +24,25 @@ class Cog(OriginalCog, typing.Generic[BotT]):
         bot (Bot): The bot instance that the cog was added to.
         logger (logging.Logger): The logger that's assigned to the cog instance. This will be used
             for logging command calls, even if you choose not to use it yourself.
+        cache_setup_after (typing.List[str]): The names of the cogs whose :func:`cache_setup` method
+            should finish before this cog's is run. Cache setup methods are otherwise run concurrently.
+
+            ::
+
+                class MyCog(voxelbotutils.Cog):
+                    cache_setup_after = ["OtherCog"]
+
+        snapshot_attributes (typing.List[str]): The names of the attributes on the cog that should be
+            saved in the :attr:`settings snapshot<BotConfig.database.snapshot>`, if it's enabled.
+            When the bot starts from a snapshot these attributes are restored and the cog's
+            :func:`cache_restored` method is run instead of :func:`cache_setup`. The attributes'
+            values must be picklable.
+
+            ::
+
+                class MyCog(voxelbotutils.Cog):
+                    snapshot_attributes = ["role_cache"]
+
         qualified_name (str): The human-readable name for the cog.
 
             ::
@@ -37,6 +56,9 @@ class Cog(OriginalCog, typing.Generic[BotT]):
                 c.qualified_name  # "API Commands"
     """
 
+    cache_setup_after: typing.ClassVar[typing.List[str]] = []
+    snapshot_attributes: typing.ClassVar[typing.List[str]] = []
+
     def __init__(self, bot: BotT, logger_name: str = None):
         """
         Args:
@@ -84,6 +106,48 @@ class Cog(OriginalCog, typing.Generic[BotT]):
         :attr:`voxelbotutils.Bot.guild_settings` or :attr:`voxelbotutils.Bot.user_settings`
         tables. This setup should *clear* your caches before setting them, as the :func:`voxelbotutils.Bot.startup`
         method may be called multiple times.
+
+        Each cog's cache setup is run concurrently on its own connection from the pool,
+        so any cogs that rely on another cog's cache being set up should name it in
+        :attr:`cache_setup_after`.
+
+        For large tables, use :func:`voxelbotutils.DatabaseWrapper.iterate` to fill your cache
+        as the rows are fetched rather than loading the whole table into memory at once.
+
+        Examples:
+
+            ::
+
+                async def cache_setup(self, db):
+                    self.bot.role_cache.clear()
+                    async for row in db.iterate("SELECT * FROM role_list"):
+                        self.bot.role_cache[row['guild_id']].append(row['role_id'])
         """
 
         pass
+
+    async def cache_restored(self, database: DatabaseWrapper, since: typing.Any):
+        """
+        A method that gets run instead of :func:`cache_setup` when the cog's
+        :attr:`snapshot_attributes` have been restored from the
+        :attr:`settings snapshot<BotConfig.database.snapshot>`, so that anything changed
+        while the bot was offline can be caught up on. By default this just runs
+        :func:`cache_setup` again, which is always correct but loses the benefit of
+        the snapshot, so cogs with snapshotted attributes should override it.
+
+        Args:
+            database (DatabaseWrapper): A connection to the bot's database.
+            since (typing.Any): The time that the snapshot was loaded from the main database
+                at, as given by the database's own clock, so it can be compared against
+                your tables' timestamp columns.
+
+        Examples:
+
+            ::
+
+                async def cache_restored(self, db, since):
+                    async for row in db.iterate("SELECT * FROM role_list WHERE updated_at >= $1", since):
+                        self.role_cache[row['guild_id']].append(row['role_id'])
+        """
+
+        await self.cache_setup(database)
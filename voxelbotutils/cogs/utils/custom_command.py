@@ -1,19 +1,51 @@
+import time
+import typing
+
 from discord.ext import commands
 
 from .custom_cog import Cog
+from .deadline import deadline
+
+
+def _get_deadline(command: typing.Union['Command', 'Group'], ctx: commands.Context) -> typing.Optional[float]:
+    """
+    Get the :func:`time.monotonic` time that the command should be done by, or
+    ``None`` if it doesn't have a deadline.
+    """
+
+    timeout = command.deadline
+    if timeout is None:
+        config = getattr(ctx.bot, 'config', None) or {}
+        if isinstance(ctx, commands.SlashContext):
+            timeout = config.get('slash_command_deadline', 0)
+        else:
+            timeout = config.get('command_deadline', 0)
+    if not timeout:
+        return None
+    return getattr(ctx, 'received_at', time.monotonic()) + timeout
 
 
 class Command(commands.Command):
 
     def __init__(self, *args, **kwargs):
+        self.deadline: typing.Optional[float] = kwargs.pop('deadline', None)
         super().__init__(*args, cooldown_after_parsing=kwargs.pop('cooldown_after_parsing', True), **kwargs)
 
+    async def invoke(self, ctx):
+        with deadline(_get_deadline(self, ctx)):
+            return await super().invoke(ctx)
+
 
 class Group(commands.Group):
 
     def __init__(self, *args, **kwargs):
+        self.deadline: typing.Optional[float] = kwargs.pop('deadline', None)
         super().__init__(*args, cooldown_after_parsing=kwargs.pop('cooldown_after_parsing', True), **kwargs)
 
+    async def invoke(self, ctx):
+        with deadline(_get_deadline(self, ctx)):
+            return await super().invoke(ctx)
+
     def group(self, *args, **kwargs):
         kwargs.setdefault('cls', Group)
         kwargs.setdefault('case_insensitive', self.case_insensitive)
@@ -1,9 +1,12 @@
 from typing import TypeVar, Optional, Generic, Union
 import collections
+import time
 
 import discord
 from discord.ext import commands
 
+from .deadline import clear_deadline
+
 
 GuildT = TypeVar("GuildT", None, discord.Guild, Optional[discord.Guild])
 
@@ -87,18 +90,34 @@ class Context(commands.Context, ContextMixin, Generic[GuildT]):
     Attributes:
         original_author_id (int): The ID of the original person to run the command. Persists through
             the bot's ``sudo`` command, if you want to check the original author.
+        received_at (float): The :func:`time.monotonic` time that the context was made at. The
+            command's :attr:`deadline<BotConfig.command_deadline>` is counted from here, and
+            ends once the command first responds.
     """
 
     guild: GuildT
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        self.received_at: float = time.monotonic()
         self.original_author_id: Optional[int]
         try:
             self.original_author_id = self.author.id
         except AttributeError:
             self.original_author_id = None
 
+    async def send(self, *args, **kwargs):
+        clear_deadline()  # We've responded, so anything after can take as long as it needs
+        return await super().send(*args, **kwargs)
+
+    async def reply(self, *args, **kwargs):
+        clear_deadline()
+        return await super().reply(*args, **kwargs)
+
+    async def defer(self, *args, **kwargs) -> None:
+        clear_deadline()
+        return await super().defer(*args, **kwargs)
+
     async def okay(self) -> None:
         """
         Adds the okay hand reaction to a message.
@@ -113,12 +132,21 @@ class SlashContext(commands.SlashContext, ContextMixin, Generic[GuildT]):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        self.received_at: float = time.monotonic()
         self.original_author_id: Optional[int]
         try:
             self.original_author_id = self.author.id
         except AttributeError:
             self.original_author_id = None
 
+    async def send(self, *args, **kwargs):
+        clear_deadline()  # The interaction's been answered, so anything after can take as long as it needs
+        return await super().send(*args, **kwargs)
+
+    async def defer(self, *args, **kwargs) -> None:
+        clear_deadline()
+        return await super().defer(*args, **kwargs)
+
     async def okay(self) -> None:
         """
         Sends an okay hand emoji.
@@ -1 +1,2 @@
 from .model import DatabaseWrapper, DatabaseTransaction
+from .loader import DataLoader
@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import asyncio
+import collections
+import functools
+import hashlib
+import logging
+import re
+import typing
+
+from ..statsd import StatsdConnection
+
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"\$\d+|%s|\?")
+_PLACEHOLDER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+@functools.lru_cache(maxsize=1_024)
+def get_query_fingerprint(sql: str) -> typing.Tuple[str, str]:
+    """
+    Normalise some SQL into a fingerprint, where literals and placeholders are replaced
+    with ``?`` and whitespace is collapsed, so that the same query with different values
+    is grouped together.
+
+    Returns
+    --------
+    Tuple[:class:`str`, :class:`str`]
+        The fingerprint and a short hash of it.
+    """
+
+    fingerprint = _STRING_LITERAL.sub("?", sql)
+    fingerprint = _PLACEHOLDER.sub("?", fingerprint)
+    fingerprint = _NUMBER_LITERAL.sub("?", fingerprint)
+    fingerprint = _PLACEHOLDER_LIST.sub("(?+)", fingerprint)
+    fingerprint = _WHITESPACE.sub(" ", fingerprint).strip()
+    return fingerprint, hashlib.sha1(fingerprint.encode()).hexdigest()[:12]
+
+
+class QueryInstrumentation(object):
+    """
+    Records the latency and row count of each query run via :class:`DatabaseWrapper`,
+    sending them to Statsd in batches and logging any queries that took longer than
+    the slow query threshold.
+
+    Parameters
+    -----------
+    slow_query_threshold: Optional[:class:`float`]
+        The number of milliseconds after which a query is logged as slow. If ``None``,
+        queries are never logged as slow.
+    max_logged_args: :class:`int`
+        The maximum number of a slow query's arguments that are included in its log.
+    flush_interval: :class:`float`
+        How many seconds to wait between sending batches of metrics to Statsd.
+    """
+
+    logger: logging.Logger = logging.getLogger("vbu.database.instrumentation")
+    slow_query_logger: logging.Logger = logging.getLogger("vbu.database.slow_query")
+
+    def __init__(
+            self,
+            *,
+            slow_query_threshold: typing.Optional[float] = 500,
+            max_logged_args: int = 5,
+            flush_interval: float = 10):
+        self.slow_query_threshold = slow_query_threshold
+        self.max_logged_args = max_logged_args
+        self.flush_interval = flush_interval
+        self.pending: typing.Deque[typing.Tuple[str, str, float, int]] = collections.deque(maxlen=10_000)
+        self._flush_task: typing.Optional[asyncio.Task] = None
+
+    def record(self, sql: str, args: typing.Sequence[typing.Any], elapsed: float, rows: int) -> None:
+        """
+        Record that a query was run.
+
+        Parameters
+        -----------
+        sql: :class:`str`
+            The SQL that was run.
+        args: Sequence[Any]
+            The arguments that the SQL was run with.
+        elapsed: :class:`float`
+            How many milliseconds the query took.
+        rows: :class:`int`
+            The number of rows that were returned, or the number of argument sets for
+            an ``executemany``.
+        """
+
+        fingerprint, query_hash = get_query_fingerprint(sql)
+        query_type = fingerprint.split(" ", 1)[0].lower()
+        self.pending.append((query_hash, query_type, elapsed, rows))
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.get_running_loop().create_task(self._delayed_flush())
+
+        # Log slow queries
+        if self.slow_query_threshold is None or elapsed < self.slow_query_threshold:
+            return
+        if not self.slow_query_logger.isEnabledFor(logging.WARNING):
+            return
+        logged_args = [repr(i)[:100] for i in args[:self.max_logged_args]]
+        if len(args) > self.max_logged_args:
+            logged_args.append(f"... ({len(args) - self.max_logged_args} more)")
+        self.slow_query_logger.warning(
+            "Slow query (%.2fms, %s rows) [%s]: %s %s",
+            elapsed, rows, query_hash, fingerprint, ", ".join(logged_args),
+        )
+
+    async def _delayed_flush(self) -> None:
+        await asyncio.sleep(self.flush_interval)
+        await self.flush()
+
+    async def flush(self) -> None:
+        """
+        Send all of the recorded queries to Statsd.
+        """
+
+        if not self.pending:
+            return
+        pending, self.pending = self.pending, collections.deque(maxlen=self.pending.maxlen)
+        try:
+            async with StatsdConnection() as stats:
+                for query_hash, query_type, elapsed, rows in pending:
+                    tags = {"query": query_hash, "query_type": query_type}
+                    stats.histogram("vbu.database.query.duration", value=elapsed, tags=tags)
+                    stats.histogram("vbu.database.query.rows", value=rows, tags=tags)
+        except Exception as e:
+            self.logger.warning(f"Failed to send query metrics - {e}")
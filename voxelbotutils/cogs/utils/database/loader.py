@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import typing
+
+from ..deadline import clear_deadline, wait_with_deadline
+from .model import DatabaseWrapper
+
+
+class DataLoader(object):
+    """
+    Batches lookups of rows by a single column. Every key requested within the same
+    event loop tick is fetched in one query (``WHERE column = ANY($1)`` with PostgreSQL,
+    ``WHERE column IN (...)`` otherwise) on one connection, and the rows are handed
+    back out to each caller. Keys requested more than once in a tick are only
+    fetched once. If the table is :attr:`partitioned<BotConfig.database.partitions>`
+    and keyed by ``guild_id``, there's one query for each partition instead.
+
+    Every loader is added to :attr:`registry`, and its stats are sent to Statsd
+    by the bot.
+
+    Examples
+    ---------
+    >>> user_loader = vbu.DataLoader("user_settings", "user_id")
+    >>> row = await user_loader.load(ctx.author.id)
+
+    >>> inventory_loader = vbu.DataLoader("inventory", "user_id", many=True)
+    >>> items = await inventory_loader.load(ctx.author.id)
+
+    Parameters
+    -----------
+    table_name: :class:`str`
+        The table that rows are loaded from. This should NOT be a user supplied value.
+    key_column: :class:`str`
+        The column that rows are looked up by. This should NOT be a user supplied value.
+    columns: Sequence[:class:`str`]
+        The columns that should be selected. Defaults to every column. If given, this
+        must include the ``key_column``.
+    many: :class:`bool`
+        Whether each key can match multiple rows, in which case :func:`load` gives a list
+        of rows rather than a single row or ``None``.
+    max_batch_size: :class:`int`
+        The maximum number of keys fetched in a single query.
+    readonly: :class:`bool`
+        Whether or not lookups should be sent to a :attr:`read replica<BotConfig.database.replicas>`.
+    name: Optional[:class:`str`]
+        The name of the loader, used in :attr:`registry` and for metrics. Defaults
+        to ``table_name.key_column``.
+
+    Attributes
+    -----------
+    loads: :class:`int`
+        The number of keys requested since the stats were last reset.
+    batches: :class:`int`
+        The number of queries run since the stats were last reset.
+    keys: :class:`int`
+        The number of distinct keys fetched since the stats were last reset.
+    """
+
+    registry: typing.ClassVar[typing.Dict[str, DataLoader]] = {}
+    database: typing.ClassVar[typing.Type[DatabaseWrapper]] = DatabaseWrapper
+    logger: logging.Logger = logging.getLogger("vbu.database.loader")
+
+    def __init__(
+            self,
+            table_name: str,
+            key_column: str,
+            *,
+            columns: typing.Sequence[str] = ("*",),
+            many: bool = False,
+            max_batch_size: int = 500,
+            readonly: bool = False,
+            name: typing.Optional[str] = None):
+        self.table_name = table_name
+        self.key_column = key_column
+        self.columns = tuple(columns)
+        self.many = many
+        self.max_batch_size = max_batch_size
+        self.readonly = readonly
+        self.name = name or f"{table_name}.{key_column}"
+        self._pending: typing.Dict[typing.Any, typing.List[asyncio.Future]] = dict()
+        self._dispatch_scheduled: bool = False
+        self.loads: int = 0
+        self.batches: int = 0
+        self.keys: int = 0
+        self.registry[self.name] = self
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__} name={self.name!r}>"
+
+    async def load(self, key: typing.Any) -> typing.Any:
+        """
+        Get the row (or rows, if the loader was made with ``many=True``) with the given key.
+
+        Parameters
+        -----------
+        key: Any
+            The value of the key column to look up.
+
+        Returns
+        --------
+        Any
+            The row with the given key, or ``None`` if there isn't one. If the loader
+            was made with ``many=True``, a list of every row with the given key.
+        """
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.setdefault(key, list()).append(future)
+        self.loads += 1
+        if not self._dispatch_scheduled:
+            self._dispatch_scheduled = True
+            loop.call_soon(self._dispatch)
+        return await wait_with_deadline(future)
+
+    async def load_many(self, keys: typing.Iterable[typing.Any]) -> typing.List[typing.Any]:
+        """
+        Get the rows for each of the given keys, in the same order. See :func:`load`.
+        """
+
+        return list(await asyncio.gather(*(self.load(i) for i in keys)))
+
+    def _dispatch(self) -> None:
+        """
+        Split the keys that have been requested this tick into batches and fetch them.
+        """
+
+        self._dispatch_scheduled = False
+        pending, self._pending = self._pending, dict()
+        items = list(pending.items())
+        for index in range(0, len(items), self.max_batch_size):
+            batch = dict(items[index:index + self.max_batch_size])
+            asyncio.get_running_loop().create_task(self._run_batch(batch))
+
+    async def _run_batch(self, batch: typing.Dict[typing.Any, typing.List[asyncio.Future]]) -> None:
+        """
+        Fetch the rows for a batch of keys and give them to everyone waiting on them.
+        """
+
+        clear_deadline()  # The batch is shared, so it goes by each caller's own deadline
+        self.batches += 1
+        self.keys += len(batch)
+        keys = list(batch.keys())
+        self.logger.debug("Loading %s keys with %s", len(keys), self.name)
+
+        # Guilds in partitioned tables are looked up on their own partition
+        partitions = self.database.partitions
+        if self.key_column == "guild_id" and partitions is not None and partitions.is_partitioned(self.table_name):
+            groups: typing.Dict[typing.Optional[str], typing.List[typing.Any]] = dict(partitions.group_by_partition(keys))
+        else:
+            groups = {None: keys}
+        rows = []
+        try:
+            for partition, partition_keys in groups.items():
+                condition, args = self.database.driver.get_any_sql(self.key_column, partition_keys)
+                sql = "SELECT {0} FROM {1} WHERE {2}".format(", ".join(self.columns), self.table_name, condition)
+                async with self.database(readonly=self.readonly, partition=partition) as db:
+                    rows.extend(await db.fetch(sql, *args))
+        except Exception as e:
+            for futures in batch.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+            return
+
+        # Group the rows by their key
+        results: typing.Dict[typing.Any, typing.Any] = dict()
+        for row in rows:
+            key = row[self.key_column]
+            if self.many:
+                results.setdefault(key, list()).append(row)
+            else:
+                results[key] = row
+        for key, futures in batch.items():
+            result = results.get(key, [] if self.many else None)
+            for future in futures:
+                if not future.done():
+                    future.set_result(result)
+
+    def reset_stats(self) -> typing.Dict[str, int]:
+        """
+        Reset the load, batch, and key counters, returning their values before being reset.
+        """
+
+        stats = {
+            "loads": self.loads,
+            "batches": self.batches,
+            "keys": self.keys,
+        }
+        self.loads = self.batches = self.keys = 0
+        return stats
@@ -0,0 +1,245 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import re
+import typing
+
+if typing.TYPE_CHECKING:
+    from .model import DatabaseWrapper
+
+
+_MIGRATION_FILENAME = re.compile(r"^(\d+)[_\-]?(.*)\.(?:sql|pgsql)$", re.IGNORECASE)
+_DOLLAR_QUOTE = re.compile(r"\$(?:[A-Za-z_]\w*)?\$")
+
+
+def split_sql_statements(sql: str) -> typing.List[str]:
+    """
+    Split a script into its statements on the semicolons that aren't inside
+    of quotes, dollar quotes, or comments. Anything that's only comments is dropped.
+    """
+
+    statements = []
+    current: typing.List[str] = []
+    has_code = False
+    index = 0
+    length = len(sql)
+    while index < length:
+        char = sql[index]
+
+        # Comments are kept as they are, but their semicolons don't count
+        if sql.startswith("--", index):
+            end = sql.find("\n", index)
+            end = length if end == -1 else end
+        elif sql.startswith("/*", index):
+            end = sql.find("*/", index + 2)
+            end = length if end == -1 else end + 2
+
+        # As is anything quoted
+        elif char in ("'", '"', "`"):
+            end = index + 1
+            while end < length:
+                if sql[end] == char:
+                    if sql.startswith(char * 2, end):  # An escaped quote
+                        end += 2
+                        continue
+                    break
+                end += 1
+            end = min(end + 1, length)
+        elif char == "$" and (match := _DOLLAR_QUOTE.match(sql, index)):
+            tag = match.group(0)
+            end = sql.find(tag, index + len(tag))
+            end = length if end == -1 else end + len(tag)
+
+        # And this is what we're looking for
+        elif char == ";":
+            if has_code:
+                statements.append("".join(current).strip())
+            current = []
+            has_code = False
+            index += 1
+            continue
+        else:
+            end = index + 1
+        if not (sql.startswith("--", index) or sql.startswith("/*", index) or char.isspace()):
+            has_code = True
+        current.append(sql[index:end])
+        index = end
+
+    if has_code:
+        statements.append("".join(current).strip())
+    return statements
+
+
+class Migration(object):
+    """
+    A single SQL file that changes the database's schema.
+
+    Parameters
+    -----------
+    version: :class:`int`
+        The version of the migration. Migrations are applied in order of version.
+    name: :class:`str`
+        The name of the migration.
+    sql: :class:`str`
+        The SQL that the migration runs.
+    repeatable: :class:`bool`
+        Whether or not the migration should be applied again when its SQL changes,
+        rather than that being treated as an error.
+
+    Attributes
+    -----------
+    checksum: :class:`str`
+        A hash of the migration's SQL, used to see whether it was changed after being applied.
+
+    :meta private:
+    """
+
+    def __init__(self, version: int, name: str, sql: str, *, repeatable: bool = False):
+        self.version = version
+        self.name = name
+        self.sql = sql
+        self.repeatable = repeatable
+        self.checksum = hashlib.sha256(sql.replace("\r\n", "\n").encode()).hexdigest()
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__} version={self.version} name={self.name!r}>"
+
+    @classmethod
+    def from_file(cls, path: str, *, version: typing.Optional[int] = None, repeatable: bool = False) -> Migration:
+        """
+        Load a migration from a file named as ``0001_name.sql``.
+        """
+
+        filename = os.path.basename(path)
+        if version is None:
+            match = _MIGRATION_FILENAME.match(filename)
+            if match is None:
+                raise ValueError(f"Migration filename {filename!r} doesn't start with a version number")
+            version = int(match.group(1))
+            filename = match.group(2) or filename
+        with open(path, encoding="utf-8") as a:
+            sql = a.read()
+        return cls(version, filename, sql, repeatable=repeatable)
+
+
+class MigrationRunner(object):
+    """
+    Applies the migrations that a database doesn't have yet, keeping track of which
+    have been applied (and their checksums) in a table. The applied migrations are
+    read in a single query, and a lock is only taken (so that only one process runs
+    the migrations) when there's something to apply.
+
+    Parameters
+    -----------
+    migrations: List[:class:`Migration`]
+        The migrations that the database should have.
+    table_name: :class:`str`
+        The table that applied migrations are recorded in.
+
+    :meta private:
+    """
+
+    logger: logging.Logger = logging.getLogger("vbu.database.migrations")
+
+    def __init__(self, migrations: typing.List[Migration], *, table_name: str = "vbu_schema_migrations"):
+        self.migrations = sorted(migrations, key=lambda i: i.version)
+        self.table_name = table_name
+        versions = [i.version for i in self.migrations]
+        if len(versions) != len(set(versions)):
+            raise RuntimeError("Multiple migrations have the same version number")
+
+    @classmethod
+    def from_directory(cls, directory: str, *, legacy_file: typing.Optional[str] = None, **kwargs) -> MigrationRunner:
+        """
+        Load every ``.sql`` (or ``.pgsql``) file in a directory as a migration.
+
+        Parameters
+        -----------
+        directory: :class:`str`
+            The directory to load migrations from. It's fine for this to not exist.
+        legacy_file: Optional[:class:`str`]
+            A single schema file which is applied before the migrations, and is applied
+            again whenever it's changed. If it doesn't exist, it's ignored.
+        """
+
+        migrations = []
+        if legacy_file and os.path.isfile(legacy_file):
+            migrations.append(Migration.from_file(legacy_file, version=0, repeatable=True))
+        if os.path.isdir(directory):
+            for filename in os.listdir(directory):
+                if not _MIGRATION_FILENAME.match(filename):
+                    continue
+                migrations.append(Migration.from_file(os.path.join(directory, filename)))
+        return cls(migrations, **kwargs)
+
+    async def get_applied(self, db: DatabaseWrapper) -> typing.Optional[typing.Dict[int, str]]:
+        """
+        Get the checksum of each applied migration by its version, or ``None`` if
+        the migrations table doesn't exist yet.
+        """
+
+        try:
+            rows = await db.fetch(f"SELECT version, checksum FROM {self.table_name}")
+        except Exception:
+            return None
+        return {row["version"]: row["checksum"] for row in rows}
+
+    def get_pending(self, applied: typing.Optional[typing.Dict[int, str]]) -> typing.List[Migration]:
+        """
+        Get the migrations that haven't been applied yet. Raises a :class:`RuntimeError` if a
+        migration has been changed since it was applied.
+        """
+
+        applied = applied or dict()
+        pending = []
+        for migration in self.migrations:
+            checksum = applied.get(migration.version)
+            if checksum is None:
+                pending.append(migration)
+            elif checksum != migration.checksum:
+                if not migration.repeatable:
+                    raise RuntimeError(
+                        f"Migration {migration.version} ({migration.name}) has been changed since it was "
+                        "applied - add a new migration instead"
+                    )
+                pending.append(migration)
+        return pending
+
+    async def run(self, db: DatabaseWrapper) -> typing.List[Migration]:
+        """
+        Apply any pending migrations, each in its own transaction, returning the
+        migrations that were applied.
+        """
+
+        if not self.migrations:
+            return []
+        if not self.get_pending(await self.get_applied(db)):
+            self.logger.info("Database schema is up to date")
+            return []
+
+        # Someone else may have applied them while we were waiting for the lock, so check again
+        await db.driver.acquire_migration_lock(db)
+        try:
+            await db.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table_name} (version INTEGER PRIMARY KEY, "
+                "name TEXT NOT NULL, checksum TEXT NOT NULL, applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP)"
+            )
+            pending = self.get_pending(await self.get_applied(db))
+            prep = db.driver().prepare()
+            delete_sql = f"DELETE FROM {self.table_name} WHERE version={next(prep)}"
+            prep = db.driver().prepare()
+            insert_sql = (
+                f"INSERT INTO {self.table_name} (version, name, checksum) "
+                f"VALUES ({next(prep)}, {next(prep)}, {next(prep)})"
+            )
+            for migration in pending:
+                self.logger.info(f"Applying database migration {migration.version} ({migration.name})")
+                async with db.transaction() as tra:
+                    await db.driver.execute_script(tra.parent, migration.sql)
+                    await tra.execute(delete_sql, migration.version)
+                    await tra.execute(insert_sql, migration.version, migration.name, migration.checksum)
+        finally:
+            await db.driver.release_migration_lock(db)
+        return pending
@@ -1,15 +1,68 @@
 from __future__ import annotations
 
+import asyncio
+import contextvars
 import logging
+import time
 import typing
+import weakref
+
+from ..deadline import DeadlineExceeded, wait_with_deadline
+from .instrumentation import QueryInstrumentation
+from .notifications import NotificationListener, NotificationCallback, get_notify_trigger_sql
+from .partitions import PartitionSet, get_referenced_tables
+from .pool import MonitoredPool, DatabasePoolTimeout
+from .query_cache import QueryCache
+from .replicas import ReplicaPool, ReplicaSet
+from .write_behind import WriteBehindQueue
 
 if typing.TYPE_CHECKING:
     from .types import (
         UserDatabaseConfig, DatabaseConfig, DriverWrapper,
-        DriverPool, DriverConnection,
+        DriverPool, DriverConnection, CopyOutput,
     )
 
 
+# The connection opened by the outermost `async with DatabaseWrapper()` in the current task
+_current_connection: contextvars.ContextVar[typing.Optional[typing.Tuple[DatabaseWrapper, typing.Optional[asyncio.Task]]]] = contextvars.ContextVar(
+    "vbu_database_connection",
+    default=None,
+)
+
+
+def _is_read_only_sql(sql: str) -> bool:
+    """
+    Whether or not some SQL only reads data, and so can be run on a replica.
+    """
+
+    folded = sql.lstrip().casefold()
+    return folded.startswith(("select", "show")) and " for update" not in folded and " for share" not in folded
+
+
+async def _iterate_chunks(
+        records: typing.Union[typing.Iterable[typing.Sequence[typing.Any]], typing.AsyncIterable[typing.Sequence[typing.Any]]],
+        chunk_size: int) -> typing.AsyncIterator[typing.List[typing.Sequence[typing.Any]]]:
+    """
+    Split an iterable or an async iterable into lists of at most the given size.
+    """
+
+    chunk = []
+    if isinstance(records, typing.AsyncIterable):
+        async for i in records:
+            chunk.append(i)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+    else:
+        for i in records:
+            chunk.append(i)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
 class DatabaseTransaction(object):
     """
     A wrapper around a transaction for your database.
@@ -33,10 +86,17 @@ class DatabaseTransaction(object):
         self._transaction = None
         self.is_active: bool = False
         self.commit_on_exit = commit_on_exit
+        self._tracks_writes: bool = False
 
     async def __aenter__(self) -> DatabaseTransaction:
+        await self.parent._use_primary()
         await self._driver.start_transaction(self)
         self.is_active = True
+
+        # Keep track of the tables written to so their cached queries can be dropped on commit
+        if self.parent.written_tables is None:
+            self.parent.written_tables = set()
+            self._tracks_writes = True
         return self
 
     async def __aexit__(self, *args):
@@ -66,6 +126,69 @@ class DatabaseTransaction(object):
 
         return await self.parent.execute_many(*args, **kwargs)
 
+    async def fetch(self, *args, **kwargs):
+        """
+        Run some SQL, returning every row. See :func:`DatabaseWrapper.fetch`.
+        """
+
+        return await self.parent.fetch(*args, **kwargs)
+
+    async def fetchrow(self, *args, **kwargs):
+        """
+        Run some SQL, returning the first row. See :func:`DatabaseWrapper.fetchrow`.
+        """
+
+        return await self.parent.fetchrow(*args, **kwargs)
+
+    async def fetchval(self, *args, **kwargs):
+        """
+        Run some SQL, returning a value from the first row. See :func:`DatabaseWrapper.fetchval`.
+        """
+
+        return await self.parent.fetchval(*args, **kwargs)
+
+    async def execute(self, *args, **kwargs):
+        """
+        Run some SQL without returning anything. See :func:`DatabaseWrapper.execute`.
+        """
+
+        return await self.parent.execute(*args, **kwargs)
+
+    def iterate(self, *args, **kwargs) -> typing.AsyncIterator[typing.Any]:
+        """
+        Run some SQL, iterating over its returned rows. See :func:`DatabaseWrapper.iterate`.
+        """
+
+        return self.parent.iterate(*args, **kwargs)
+
+    async def copy_records(self, *args, **kwargs) -> int:
+        """
+        Bulk insert rows into a table. See :func:`DatabaseWrapper.copy_records`.
+        """
+
+        return await self.parent.copy_records(*args, **kwargs)
+
+    async def copy_from_query(self, *args, **kwargs) -> int:
+        """
+        Write the rows returned by some SQL as CSV. See :func:`DatabaseWrapper.copy_from_query`.
+        """
+
+        return await self.parent.copy_from_query(*args, **kwargs)
+
+    async def cached(self, *args, **kwargs) -> typing.List[typing.Any]:
+        """
+        Run some SQL, caching its returned rows. See :func:`DatabaseWrapper.cached`.
+        """
+
+        return await self.parent.cached(*args, **kwargs)
+
+    async def notify(self, *args, **kwargs) -> None:
+        """
+        Send a notification once the transaction is committed. See :func:`DatabaseWrapper.notify`.
+        """
+
+        return await self.parent.notify(*args, **kwargs)
+
     async def commit(self):
         """
         Commit the changes made to the database in this transaction context.
@@ -74,6 +197,12 @@ class DatabaseTransaction(object):
         await self._driver.commit_transaction(self)
         self.is_active = False
 
+        # Anything cached while the transaction was open may have missed its writes
+        if self._tracks_writes:
+            written_tables, self.parent.written_tables = self.parent.written_tables, None
+            if written_tables:
+                self.parent.query_cache.invalidate(*written_tables)
+
     async def rollback(self):
         """
         Roll back the changes made to the database in this transaction context.
@@ -81,31 +210,83 @@ class DatabaseTransaction(object):
 
         await self._driver.rollback_transaction(self)
         self.is_active = False
+        if self._tracks_writes:
+            self.parent.written_tables = None
 
 
 class DatabaseWrapper(object):
     """
     A wrapper around your preferred database driver.
+
+    Parameters
+    -----------
+    readonly: :class:`bool`
+        Whether or not the connection should be made to one of the :attr:`read replicas<BotConfig.database.replicas>`,
+        if any are configured and caught up with the primary. Transactions and writes made with
+        the connection are moved over to the primary automatically.
+    reuse: :class:`bool`
+        Whether or not to borrow the connection of an ``async with DatabaseWrapper()`` block that's
+        already open in the same task, rather than acquiring another from the pool. A borrowed
+        connection shares any transaction that the outer block has open, and isn't released
+        until the outer block is left. Pass ``False`` if you need a connection of your own.
+        Connections are never shared between tasks.
+    guild_id: Optional[:class:`int`]
+        The guild whose rows you're working with. If :attr:`partitions<BotConfig.database.partitions>`
+        are configured, the connection is made to the partition that the guild's rows are on
+        rather than to the main database. Only the partitioned tables can be used with that
+        connection - SQL that touches just the main database's tables raises a :class:`RuntimeError`,
+        and a single statement can't join partitioned tables with unpartitioned ones.
+    partition: Optional[:class:`str`]
+        The name of the partition to connect to, rather than the main database.
     """
 
-    __slots__ = ("conn", "is_active", "cursor",)
+    __slots__ = (
+        "conn", "is_active", "cursor", "readonly", "source_pool", "written_tables",
+        "reuse", "borrowed", "_context_token", "guild_id", "partition", "_iterators",
+    )
+
+    # The attributes that describe the connection itself, and so are copied between wrappers
+    _connection_attrs: typing.ClassVar[typing.Tuple[str, ...]] = (
+        "conn", "is_active", "cursor", "readonly", "source_pool", "written_tables",
+    )
 
     config: typing.ClassVar[DatabaseConfig] = None  # type: ignore
-    pool: typing.ClassVar[DriverPool] = None  # type: ignore
+    pool: typing.ClassVar[MonitoredPool] = None  # type: ignore
     logger: logging.Logger = logging.getLogger("vbu.database")
     enabled: typing.ClassVar[bool] = False
     driver: typing.ClassVar[typing.Type[DriverWrapper]]
+    write_behind: typing.ClassVar[typing.Optional[WriteBehindQueue]] = None
+    chunk_size: typing.ClassVar[int] = 1_000
+    statement_cache_size: typing.ClassVar[int] = 100
+    statement_cache_threshold: typing.ClassVar[int] = 3
+    instrumentation: typing.ClassVar[typing.Optional[QueryInstrumentation]] = None
+    replicas: typing.ClassVar[typing.Optional[ReplicaSet]] = None
+    query_cache: typing.ClassVar[QueryCache] = QueryCache()
+    notifications: typing.ClassVar[typing.Optional[NotificationListener]] = None
+    partitions: typing.ClassVar[typing.Optional[PartitionSet]] = None
 
     def __init__(
             self,
             conn=None,
             *,
-            cursor: DriverConnection = None):
-        """:meta private:"""
-
+            cursor: DriverConnection = None,
+            readonly: bool = False,
+            reuse: bool = True,
+            guild_id: typing.Optional[int] = None,
+            partition: typing.Optional[str] = None,
+            source_pool: typing.Optional[DriverPool] = None):
         self.conn = conn
         self.cursor = cursor
         self.is_active = False
+        self.readonly = readonly
+        self.source_pool = source_pool
+        self.written_tables: typing.Optional[typing.Set[str]] = None
+        self.reuse = reuse
+        self.borrowed: bool = False
+        self._context_token: typing.Optional[contextvars.Token] = None
+        self.guild_id = guild_id
+        self.partition = partition
+        self._iterators: typing.Optional[weakref.WeakSet] = None
 
     @property
     def caller(self) -> DriverConnection:
@@ -113,6 +294,16 @@ class DatabaseWrapper(object):
         assert v
         return v
 
+    @property
+    def on_replica(self) -> bool:
+        """
+        Whether or not the connection is to a read replica.
+
+        :meta private:
+        """
+
+        return isinstance(self.source_pool, ReplicaPool)
+
     @classmethod
     async def create_pool(cls, config: UserDatabaseConfig) -> None:
         """
@@ -125,7 +316,7 @@ class DatabaseWrapper(object):
         """
 
         # Grab the args that are valid
-        config_args = ("host", "port", "database", "user", "password",)
+        config_args = ("host", "port", "database", "user", "password", "min_size", "max_size",)
         stripped_config: DatabaseConfig = {i: o for i, o in config.items() if i in config_args}  # type: ignore
         cls.config = stripped_config
 
@@ -145,14 +336,335 @@ class DatabaseWrapper(object):
             raise RuntimeError("Invalid database type passed")
         cls.driver = Driver
 
+        # SQLite doesn't have a server, so its connections are set up by us
+        if database_type == "sqlite":
+            stripped_config.update(config.get("sqlite", {}))  # type: ignore
+        elif database_type != "mysql":
+            stripped_config.update(config.get("postgres", {}))  # type: ignore
+        cls.chunk_size = config.get("chunk_size", 1_000)
+        cls.statement_cache_size = config.get("statement_cache_size", 100)
+        cls.statement_cache_threshold = config.get("statement_cache_threshold", 3)
 
         # Start and store our pool
+        acquire_timeout = config.get("acquire_timeout", 0) or None
         created = await cls.driver.create_pool(stripped_config)
-        cls.pool = created
+        cls.pool = MonitoredPool("primary", created, cls.driver, acquire_timeout=acquire_timeout)
         cls.enabled = True
 
+        # Connect to our read replicas
+        replica_configs = config.get("replicas", [])
+        if replica_configs and database_type == "sqlite":
+            raise RuntimeError("Read replicas aren't supported with SQLite")
+        if replica_configs:
+            replicas = []
+            for replica_config in replica_configs:
+                replica_stripped_config = {**stripped_config, **{i: o for i, o in replica_config.items() if i in config_args}}
+                replica_pool = await cls.driver.create_pool(replica_stripped_config)  # type: ignore
+                name = f"{replica_stripped_config.get('host')}:{replica_stripped_config.get('port')}"
+                replicas.append(ReplicaPool(name, replica_pool, cls.driver, acquire_timeout=acquire_timeout))
+            cls.replicas = ReplicaSet(
+                cls,
+                replicas,
+                max_lag=config.get("replica_max_lag", 10) or None,
+                check_interval=config.get("replica_check_interval", 5),
+            )
+            await cls.replicas.check_lag()
+            cls.replicas.start()
+
+        # Connect to the databases that our partitioned tables are spread across
+        partitions_config = config.get("partitions", {})
+        if partitions_config.get("databases"):
+            partition_pools = []
+            partition_configs = {}
+            for index, partition_config in enumerate(partitions_config["databases"]):
+                partition_stripped_config = {**stripped_config, **{i: o for i, o in partition_config.items() if i in config_args}}
+                partition_pool = await cls.driver.create_pool(partition_stripped_config)  # type: ignore
+                name = partition_config.get("name") or f"partition{index}"
+                partition_pools.append(MonitoredPool(name, partition_pool, cls.driver, acquire_timeout=acquire_timeout))
+                partition_configs[name] = partition_stripped_config
+            cls.partitions = PartitionSet(
+                partition_pools,
+                tables=partitions_config.get("tables", []),
+                router=partitions_config.get("router") or None,
+                configs=partition_configs,
+            )
+
+        # Set up our query cache
+        query_cache_config = config.get("query_cache", {})
+        cls.query_cache = QueryCache(
+            maxsize=query_cache_config.get("max_size", 1_024) or None,
+            shared=query_cache_config.get("shared", True),
+        )
+
+        # Set up our query instrumentation
+        instrumentation_config = config.get("instrumentation", {})
+        if instrumentation_config.get("enabled", False):
+            cls.instrumentation = QueryInstrumentation(
+                slow_query_threshold=instrumentation_config.get("slow_query_threshold", 500) or None,
+                max_logged_args=instrumentation_config.get("max_logged_args", 5),
+            )
+
+        # Set up our write queue
+        write_behind_config = config.get("write_behind", {})
+        if write_behind_config.get("enabled", False):
+            cls.write_behind = WriteBehindQueue(
+                cls,
+                delay=write_behind_config.get("delay", 0.5),
+                max_size=write_behind_config.get("max_size", 500),
+                max_retries=write_behind_config.get("max_retries", 3),
+            )
+
     @classmethod
-    async def get_connection(cls) -> DatabaseWrapper:
+    async def queue_upsert(
+            cls,
+            table_name: str,
+            keys: typing.Dict[str, typing.Any],
+            values: typing.Dict[str, typing.Any]) -> None:
+        """
+        Insert a row into a table, updating the given values if a row with the same
+        keys already exists. If the :attr:`write queue<BotConfig.database.write_behind>`
+        is enabled then the write is held for a short time so that it can be merged
+        with other writes to the same row and batched with writes to other rows;
+        otherwise it's run immediately.
+
+        Examples
+        ---------
+        >>> await vbu.Database.queue_upsert(
+        ...     "guild_settings",
+        ...     {"guild_id": guild.id},
+        ...     {"prefix": "!"},
+        ... )
+
+        Parameters
+        ----------
+        table_name: :class:`str`
+            The table that you want to write to. This should NOT be a user supplied value.
+        keys: Dict[:class:`str`, Any]
+            The primary key columns of the row and their values.
+        values: Dict[:class:`str`, Any]
+            The columns that should be set and their values.
+        """
+
+        if cls.write_behind is not None:
+            cls.write_behind.add(table_name, keys, values)
+            return
+        sql = cls.driver.get_upsert_sql(table_name, tuple(keys), tuple(values))
+        async with cls(partition=cls.get_partition(table_name, keys.get("guild_id"))) as db:
+            await db(sql, *keys.values(), *values.values())
+
+    @classmethod
+    async def discard_queued_upsert(cls, table_name: str, keys: typing.Dict[str, typing.Any]) -> None:
+        """
+        Drop any write to the given row that's waiting in the write queue, so that
+        it isn't written back after the row is deleted. This does nothing if the
+        write queue isn't enabled.
+
+        Examples
+        ---------
+        >>> keys = {"guild_id": guild.id, "role_id": role.id}
+        >>> await vbu.Database.discard_queued_upsert("role_list", keys)
+        >>> async with vbu.Database(guild_id=guild.id) as db:
+        ...     await db("DELETE FROM role_list WHERE guild_id=$1 AND role_id=$2", *keys.values())
+
+        Parameters
+        ----------
+        table_name: :class:`str`
+            The table that the row is in.
+        keys: Dict[:class:`str`, Any]
+            The primary key columns of the row and their values, in the same order
+            that they were given to :func:`queue_upsert`.
+        """
+
+        if cls.write_behind is not None:
+            await cls.write_behind.discard(table_name, keys)
+
+    @classmethod
+    async def flush_writes(cls) -> None:
+        """
+        Write everything that's waiting in the write queue to the database. This is
+        run automatically when the bot is closed.
+        """
+
+        if cls.write_behind is not None:
+            await cls.write_behind.flush()
+
+    @classmethod
+    async def close_pool(cls) -> None:
+        """
+        Close the database pool and the pools of any read replicas and partitions. This is
+        run automatically when the bot is closed.
+        """
+
+        if cls.notifications is not None:
+            await cls.notifications.close()
+            cls.notifications = None
+        if cls.replicas is not None:
+            await cls.replicas.close()
+            cls.replicas = None
+        if cls.partitions is not None:
+            await cls.partitions.close()
+            cls.partitions = None
+        await cls.pool.close()
+
+    @classmethod
+    async def listen(cls, channel: str, callback: NotificationCallback) -> None:
+        """
+        Run a callback whenever a notification is sent to the given channel, such as
+        by :func:`notify` or by a trigger from :func:`get_notify_trigger_sql`. Notifications
+        are received on a single connection to each database (the main database and any
+        :attr:`partitions<BotConfig.database.partitions>`) that's kept open outside of the
+        pools, and which is reconnected (listening to every channel again) if it drops. Only
+        supported with PostgreSQL.
+
+        Examples
+        ---------
+        >>> def on_ban(channel, payload):
+        ...     banned_users.add(int(payload))
+        >>> await vbu.Database.listen("user_bans", on_ban)
+
+        Parameters
+        -----------
+        channel: :class:`str`
+            The channel to listen on.
+        callback: Callable[[:class:`str`, :class:`str`], Any]
+            The function to run with the channel name and the notification's payload. This
+            can be a coroutine function.
+        """
+
+        if not cls.driver.supports_notifications:
+            raise RuntimeError("Listening for notifications is only supported with PostgreSQL")
+        if cls.notifications is None:
+            configs = {None: cls.config}
+            if cls.partitions is not None:
+                configs.update(cls.partitions.configs)
+            cls.notifications = NotificationListener(cls, configs)
+            cls.notifications.start()
+        await cls.notifications.add(channel, callback)
+
+    @classmethod
+    async def unlisten(cls, channel: str, callback: NotificationCallback) -> None:
+        """
+        Stop running a callback that was added with :func:`listen`.
+        """
+
+        if cls.notifications is not None:
+            await cls.notifications.remove(channel, callback)
+
+    @staticmethod
+    def get_notify_trigger_sql(table_name: str, key_columns: typing.Sequence[str], *, channel: str = "vbu_row_changes") -> str:
+        """
+        Get the SQL to create a PostgreSQL trigger which sends a notification to the given
+        channel whenever a row in the table is inserted, updated, or deleted. The payload
+        is a JSON object with the ``table`` name, the ``op`` (``INSERT``, ``UPDATE``, or ``DELETE``),
+        the row's ``keys``, and the ``values`` of the columns that were changed. Add this
+        to one of your :attr:`migrations<BotConfig.database.migrations>`.
+
+        Examples
+        ---------
+        >>> print(vbu.Database.get_notify_trigger_sql("guild_settings", ["guild_id"]))
+
+        Parameters
+        -----------
+        table_name: :class:`str`
+            The table to send changes from.
+        key_columns: List[:class:`str`]
+            The primary key columns of the table.
+        channel: :class:`str`
+            The channel to send the notifications to.
+        """
+
+        return get_notify_trigger_sql(table_name, key_columns, channel=channel)
+
+    @classmethod
+    def get_pools(cls) -> typing.List[MonitoredPool]:
+        """
+        Get the primary pool and the pools of any read replicas and partitions.
+
+        :meta private:
+        """
+
+        pools = [cls.pool]
+        if cls.replicas is not None:
+            pools.extend(cls.replicas.replicas)
+        if cls.partitions is not None:
+            pools.extend(cls.partitions.pools)
+        return pools
+
+    @classmethod
+    def get_pool(cls, *, guild_id: typing.Optional[int] = None, partition: typing.Optional[str] = None) -> MonitoredPool:
+        """
+        Get the pool for the given partition, or for the partition that the given guild's
+        rows are on, falling back to the main database's pool.
+
+        :meta private:
+        """
+
+        if cls.partitions is None:
+            return cls.pool
+        if partition is not None:
+            try:
+                return cls.partitions.pools_by_name[partition]
+            except KeyError:
+                raise ValueError(f"There's no database partition named {partition!r}") from None
+        if guild_id is not None:
+            return cls.partitions.get_pool(guild_id)
+        return cls.pool
+
+    @classmethod
+    def get_partition(cls, table_name: str, guild_id: typing.Optional[int]) -> typing.Optional[str]:
+        """
+        Get the name of the partition that the given guild's rows in a table are on.
+
+        Examples
+        ---------
+        >>> partition = vbu.Database.get_partition("guild_settings", guild.id)
+        >>> async with vbu.Database(partition=partition) as db:
+        ...     rows = await db("SELECT * FROM guild_settings WHERE guild_id=$1", guild.id)
+
+        Parameters
+        -----------
+        table_name: :class:`str`
+            The table that the rows are in.
+        guild_id: Optional[:class:`int`]
+            The guild whose rows you want.
+
+        Returns
+        --------
+        Optional[:class:`str`]
+            The name of the partition, or ``None`` if the table isn't partitioned (and so
+            is on the main database).
+        """
+
+        if cls.partitions is None or guild_id is None or not cls.partitions.is_partitioned(table_name):
+            return None
+        return cls.partitions.get_pool(guild_id).name
+
+    @classmethod
+    def get_table_partitions(cls, table_name: str) -> typing.List[typing.Optional[str]]:
+        """
+        Get the names of every partition that a table's rows are spread across, or
+        ``[None]`` if the table is only on the main database. Use this when you need
+        to read a whole table.
+
+        Examples
+        ---------
+        >>> for partition in vbu.Database.get_table_partitions("guild_settings"):
+        ...     async with vbu.Database(partition=partition) as db:
+        ...         async for row in db.iterate("SELECT * FROM guild_settings"):
+        ...             ...
+        """
+
+        if cls.partitions is None or not cls.partitions.is_partitioned(table_name):
+            return [None]
+        return list(cls.partitions.pools_by_name)
+
+    @classmethod
+    async def get_connection(
+            cls,
+            *,
+            readonly: bool = False,
+            guild_id: typing.Optional[int] = None,
+            partition: typing.Optional[str] = None) -> DatabaseWrapper:
         """
         Acquires a connection to the database from the pool.
 
@@ -165,14 +677,49 @@ class DatabaseWrapper(object):
         >>> rows = await db("SELECT 1")
         >>> await db.disconnect()
 
+        Parameters
+        ----------
+        readonly: :class:`bool`
+            Whether or not the connection should be made to a read replica if one
+            is available.
+        guild_id: Optional[:class:`int`]
+            The guild whose rows you're working with, so that the connection is made
+            to the partition that they're on.
+        partition: Optional[:class:`str`]
+            The name of the partition that the connection should be made to.
+
         Returns
         --------
         :class:`DatabaseWrapper`
             The connection that was aquired from the pool.
+
+        Raises
+        -------
+        :class:`voxelbotutils.errors.DatabasePoolTimeout`
+            If no connection could be acquired within the configured acquire timeout.
         """
 
         assert cls.driver, "No driver has been established"
-        return await cls.driver.get_connection(cls)
+        pool = cls.get_pool(guild_id=guild_id, partition=partition)
+        if pool is not cls.pool:
+            v = await cls.driver.get_connection(cls, pool)
+            if partition is None:
+                v.guild_id = guild_id
+            return v
+        if readonly and cls.replicas is not None:
+            replica = cls.replicas.choose()
+            if replica is not None:
+                try:
+                    v = await cls.driver.get_connection(cls, replica)
+                except DatabasePoolTimeout:
+                    pass  # The replica is busy, so use the primary
+                except Exception as e:
+                    cls.logger.warning(f"Failed to connect to replica {replica.name}, using the primary - {e}")
+                    replica.healthy = False
+                else:
+                    v.readonly = True
+                    return v
+        return await cls.driver.get_connection(cls, cls.pool)
 
     async def disconnect(self) -> None:
         """
@@ -182,11 +729,55 @@ class DatabaseWrapper(object):
 
         if self.conn is None:
             return
+        if self._iterators:
+            await self._close_iterators()
+        if self.borrowed:
+            self.conn = self.cursor = None  # The lender releases it
+            self.is_active = False
+            self.borrowed = False
+            return
         await self.driver.release_connection(self)
 
+    async def _close_iterators(self) -> None:
+        """
+        Close any :func:`iterate` calls that were stopped early, so that their cursors
+        (and, with PostgreSQL, their transactions) are closed before the connection is
+        released rather than whenever they're garbage collected.
+        """
+
+        assert self._iterators is not None
+        iterators, self._iterators = list(self._iterators), None
+        for iterator in iterators:
+            try:
+                await iterator.aclose()
+            except Exception as e:
+                self.logger.warning(f"Failed to close a database iterator - {e}")
+
+    def _copy_connection(self, other: DatabaseWrapper) -> None:
+        for i in self._connection_attrs:
+            setattr(self, i, getattr(other, i))
+
+    def _get_lendable_connection(self) -> typing.Optional[DatabaseWrapper]:
+        """
+        Get the connection opened by an outer ``async with`` block in the current task,
+        if there is one and it can be used by this wrapper.
+        """
+
+        current = _current_connection.get()
+        if current is None:
+            return None
+        lender, task = current
+        if task is not asyncio.current_task() or lender.conn is None:
+            return None  # Child tasks inherit our context but mustn't share the connection
+        if lender.source_pool is not self.get_pool(guild_id=self.guild_id, partition=self.partition):
+            return None  # Only share connections to our own primary, which never get swapped out
+        return lender
+
     async def __aenter__(self) -> DatabaseWrapper:
         """
         Get a connection from your database and close it automatically when you're done.
+        If another ``async with`` block in the same task already has a connection open,
+        that connection is borrowed instead.
 
         Examples
         ---------
@@ -194,14 +785,39 @@ class DatabaseWrapper(object):
         >>>     rows = await db("SELECT 1")
         """
 
-        new_connection = await self.get_connection()
-        for i in self.__slots__:
-            setattr(self, i, getattr(new_connection, i))
+        if self.reuse:
+            lender = self._get_lendable_connection()
+            if lender is not None:
+                self._copy_connection(lender)
+                self.borrowed = True
+                return self
+        new_connection = await self.get_connection(
+            readonly=self.readonly,
+            guild_id=self.guild_id,
+            partition=self.partition,
+        )
+        self._copy_connection(new_connection)
+        self._context_token = _current_connection.set((self, asyncio.current_task()))
         return self
 
     async def __aexit__(self, *_) -> None:
+        if self._context_token is not None:
+            _current_connection.reset(self._context_token)
+            self._context_token = None
         return await self.disconnect()
 
+    async def _use_primary(self) -> None:
+        """
+        Swap this connection for one to the primary if it's currently connected to a
+        read replica, so that writes and transactions are never sent to a replica.
+        """
+
+        if not self.on_replica or self.conn is None:
+            return
+        await self.disconnect()
+        new_connection = await self.driver.get_connection(type(self), self.pool)
+        self._copy_connection(new_connection)
+
     def transaction(self, *args, **kwargs) -> DatabaseTransaction:
         """
         Start a database transaction.
@@ -249,6 +865,69 @@ class DatabaseWrapper(object):
         assert self.conn, "No connection has been established"
         return self.driver.transaction(self, *args, **kwargs)
 
+    def _check_partition_tables(self, tables: typing.Iterable[str]) -> None:
+        """
+        Make sure that a connection that was routed to a partition by its guild ID
+        isn't being used for tables that are only on the main database, which would
+        otherwise silently read from and write to the partition's empty copies.
+        """
+
+        if self.guild_id is None or self.partition is not None or self.partitions is None:
+            return
+        if self.source_pool is None or self.source_pool is self.pool:
+            return
+        tables = set(tables)
+        if tables and not any(self.partitions.is_partitioned(i) for i in tables):
+            raise RuntimeError(
+                f"Tables {', '.join(sorted(tables))} aren't partitioned, so can't be used "
+                f"with a connection for guild {self.guild_id} - use a connection to the main database"
+            )
+
+    async def _run(self, method: typing.Callable[..., typing.Awaitable[typing.Any]], sql: str, args: tuple, *, many: bool = False) -> typing.Any:
+        """
+        Run one of the driver's methods, recording how long it took if query
+        instrumentation is enabled, and cancelling it if the current command's
+        deadline passes.
+        """
+
+        if self.guild_id is not None:
+            self._check_partition_tables(get_referenced_tables(sql))
+        if self.on_replica and (many or not _is_read_only_sql(sql)):
+            await self._use_primary()
+        if self.instrumentation is None:
+            result = await self._run_with_deadline(method(self, sql, *args))
+        else:
+            start = time.perf_counter()
+            result = await self._run_with_deadline(method(self, sql, *args))
+            elapsed = (time.perf_counter() - start) * 1_000
+            if many:
+                rows = len(args)
+            elif isinstance(result, list):
+                rows = len(result)
+            else:
+                rows = int(result is not None)
+            self.instrumentation.record(sql, args, elapsed, rows)
+
+        # Drop any cached queries for the tables we've written to
+        if self.query_cache.known_tags and (many or not _is_read_only_sql(sql)):
+            tables = self.query_cache.invalidate_for_sql(sql)
+            if tables and self.written_tables is not None:
+                self.written_tables.update(tables)
+        return result
+
+    async def _run_with_deadline(self, coro: typing.Awaitable[typing.Any]) -> typing.Any:
+        """
+        Wait for a query, making sure that the database stops running it too
+        if the current command's deadline passes.
+        """
+
+        try:
+            return await wait_with_deadline(coro)
+        except DeadlineExceeded:
+            self.logger.warning("Cancelled a database query at its command's deadline")
+            await self.driver.cancel_query(self)
+            raise
+
     async def __call__(self, sql: str, *args) -> typing.List[typing.Any]:
         return await self.call(sql, *args)
 
@@ -281,8 +960,342 @@ class DatabaseWrapper(object):
         """
 
         assert self.conn, "No connection has been established"
-        self.logger.debug(f"Running SQL: {sql} {args!s}")
-        return await self.driver.fetch(self, sql, *args)
+        self.logger.debug("Running SQL: %s %s", sql, args)
+        return await self._run(self.driver.fetch, sql, args)
+
+    async def fetch(self, sql: str, *args) -> typing.List[typing.Any]:
+        """
+        Run a line of SQL against your database driver, returning every row. Unlike
+        :func:`call`, the SQL is always run as a query, so this should be used for anything
+        that returns rows. With PostgreSQL, frequently used SQL is run via a cached
+        prepared statement.
+
+        Parameters
+        ----------
+        sql: :class:`str`
+            The SQL that you want to run. See :func:`DatabaseWrapper.call`.
+        *args: typing.Any
+            The arguments that are passed to your database call.
+
+        Examples
+        ---------
+        >>> rows = await db.fetch("SELECT * FROM example WHERE a=$1", 1)
+
+        Returns
+        --------
+        typing.List[:class:`dict`]
+            The list of rows that were returned from the database.
+        """
+
+        assert self.conn, "No connection has been established"
+        self.logger.debug("Fetching SQL: %s %s", sql, args)
+        return await self._run(self.driver.fetch_all, sql, args)
+
+    async def fetchrow(self, sql: str, *args) -> typing.Optional[typing.Any]:
+        """
+        Run a line of SQL against your database driver, returning only the first row.
+
+        Parameters
+        ----------
+        sql: :class:`str`
+            The SQL that you want to run. See :func:`DatabaseWrapper.call`.
+        *args: typing.Any
+            The arguments that are passed to your database call.
+
+        Examples
+        ---------
+        >>> row = await db.fetchrow("SELECT * FROM example WHERE a=$1", 1)
+
+        Returns
+        --------
+        Optional[:class:`dict`]
+            The first row that was returned from the database, or ``None`` if there were no rows.
+        """
+
+        assert self.conn, "No connection has been established"
+        self.logger.debug("Fetching row with SQL: %s %s", sql, args)
+        return await self._run(self.driver.fetch_row, sql, args)
+
+    async def fetchval(self, sql: str, *args, column: int = 0) -> typing.Any:
+        """
+        Run a line of SQL against your database driver, returning a single value from the
+        first row.
+
+        Parameters
+        ----------
+        sql: :class:`str`
+            The SQL that you want to run. See :func:`DatabaseWrapper.call`.
+        *args: typing.Any
+            The arguments that are passed to your database call.
+        column: :class:`int`
+            The index of the column whose value should be returned.
+
+        Examples
+        ---------
+        >>> count = await db.fetchval("SELECT COUNT(*) FROM example")
+
+        Returns
+        --------
+        Any
+            The value from the first row, or ``None`` if there were no rows.
+        """
+
+        row = await self.fetchrow(sql, *args)
+        if row is None:
+            return None
+        return list(row.values())[column]
+
+    async def execute(self, sql: str, *args) -> None:
+        """
+        Run a line of SQL against your database driver without returning any rows.
+        With PostgreSQL, frequently used SQL is run via a cached prepared statement.
+
+        Parameters
+        ----------
+        sql: :class:`str`
+            The SQL that you want to run. See :func:`DatabaseWrapper.call`.
+        *args: typing.Any
+            The arguments that are passed to your database call.
+
+        Examples
+        ---------
+        >>> await db.execute("INSERT INTO example (a, b) VALUES ($1, $2)", 1, 2)
+        """
+
+        assert self.conn, "No connection has been established"
+        self.logger.debug("Executing SQL: %s %s", sql, args)
+        await self._run(self.driver.execute, sql, args)
+
+    async def notify(self, channel: str, payload: str = "") -> None:
+        """
+        Send a notification to everything listening on the given channel via :func:`listen`.
+        Notifications sent inside of a transaction are only delivered once it's committed.
+        Only supported with PostgreSQL.
+
+        Parameters
+        -----------
+        channel: :class:`str`
+            The channel to send the notification to.
+        payload: :class:`str`
+            The payload of the notification.
+        """
+
+        if not self.driver.supports_notifications:
+            raise RuntimeError("Sending notifications is only supported with PostgreSQL")
+        await self._use_primary()
+        await self.execute("SELECT pg_notify($1, $2)", channel, payload)
+
+    async def cached(self, sql: str, *args, ttl: float = 60, tags: typing.Iterable[str] = ()) -> typing.List[typing.Any]:
+        """
+        Run a line of SQL against your database driver, returning every row, and caching
+        the rows in memory so that running the same SQL with the same arguments again
+        doesn't need to query the database.
+
+        The cached rows are tagged with the given tables, and any write made via
+        :class:`DatabaseWrapper` to one of those tables removes them from the cache. If
+        :attr:`BotConfig.database.query_cache.shared` is set and Redis is enabled, the
+        bot's other processes remove them too. Writes made elsewhere (eg by triggers or
+        by other programs) aren't seen, so the TTL should be short enough to cover them.
+
+        Queries run inside of a transaction are never cached. The returned rows are shared
+        between callers, so they shouldn't be modified.
+
+        Parameters
+        ----------
+        sql: :class:`str`
+            The SQL that you want to run. See :func:`DatabaseWrapper.call`.
+        *args: typing.Any
+            The arguments that are passed to your database call.
+        ttl: :class:`float`
+            The number of seconds the rows are cached for.
+        tags: Iterable[:class:`str`]
+            The tables that the rows are read from.
+
+        Examples
+        ---------
+        >>> rows = await db.cached(
+        ...     "SELECT * FROM shop_items WHERE guild_id=$1",
+        ...     guild.id,
+        ...     ttl=300,
+        ...     tags=("shop_items",),
+        ... )
+
+        Returns
+        --------
+        typing.List[:class:`dict`]
+            The list of rows that were returned from the database.
+        """
+
+        if self.written_tables is not None:
+            return await self.fetch(sql, *args)
+        key = self.query_cache.make_key(sql, args)
+        rows = self.query_cache.get(key)
+        if rows is not None:
+            return list(rows)
+        generation = self.query_cache.generation
+        rows = await self.fetch(sql, *args)
+        self.query_cache.set(key, rows, ttl=ttl, tags=tags, generation=generation)
+        return list(rows)
+
+    def iterate(self, sql: str, *args, chunk_size: typing.Optional[int] = None) -> typing.AsyncIterator[typing.Any]:
+        """
+        Run a line of SQL against your database driver, fetching the returned rows from the
+        database in chunks as they're iterated over rather than all at once. This uses a
+        server-side cursor where the driver supports one, so the full result set is never
+        held in memory.
+
+        If you stop iterating early, the cursor is closed when the iterator is garbage
+        collected or when the connection is released, whichever comes first.
+
+        Parameters
+        ----------
+        sql: :class:`str`
+            The SQL that you want to run. See :func:`DatabaseWrapper.call`.
+        *args: typing.Any
+            The arguments that are passed to your database call.
+        chunk_size: Optional[:class:`int`]
+            The number of rows that should be fetched from the database at a time.
+            Defaults to the ``chunk_size`` set in your database config, or 1000.
+
+        Examples
+        ---------
+        >>> async for row in db.iterate("SELECT * FROM example WHERE a=$1", 1):
+        >>>     print(row)
+
+        Yields
+        -------
+        :class:`dict`
+            The rows returned from the database.
+        """
+
+        iterator = self._iterate(sql, *args, chunk_size=chunk_size)
+        if self._iterators is None:
+            self._iterators = weakref.WeakSet()
+        self._iterators.add(iterator)
+        return iterator
+
+    async def _iterate(self, sql: str, *args, chunk_size: typing.Optional[int] = None) -> typing.AsyncIterator[typing.Any]:
+        """
+        The generator behind :func:`iterate`, fetching each chunk within the current
+        deadline and recording the time spent fetching if instrumentation is enabled.
+        """
+
+        assert self.conn, "No connection has been established"
+        self.logger.debug("Iterating over SQL: %s %s", sql, args)
+        self._check_partition_tables(get_referenced_tables(sql))
+        if self.on_replica and not _is_read_only_sql(sql):
+            await self._use_primary()
+        chunks = self.driver.iterate(self, sql, *args, chunk_size=chunk_size or self.chunk_size)
+        row_count = 0
+        elapsed = 0.0
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    rows = await self._run_with_deadline(chunks.__anext__())
+                except StopAsyncIteration:
+                    break
+                finally:
+                    elapsed += time.perf_counter() - start
+                row_count += len(rows)
+                for row in rows:
+                    yield row
+        finally:
+            await chunks.aclose()
+            if self.instrumentation is not None:
+                self.instrumentation.record(sql, args, elapsed * 1_000, row_count)
+
+    async def copy_records(
+            self,
+            table_name: str,
+            columns: typing.Sequence[str],
+            records: typing.Union[typing.Iterable[typing.Sequence[typing.Any]], typing.AsyncIterable[typing.Sequence[typing.Any]]],
+            *,
+            chunk_size: typing.Optional[int] = None) -> int:
+        """
+        Insert a large number of rows into a table as quickly as the driver allows. With
+        PostgreSQL this uses ``COPY``; with MySQL, multi-row ``INSERT`` statements; and with
+        SQLite, one transaction per chunk.
+
+        Records are read from the given iterable in chunks, so an async generator can
+        be used to stream an import without holding all of it in memory. Each chunk is
+        committed on its own unless this is run inside of a transaction, so wrap it in
+        :func:`transaction` if the import should be all-or-nothing.
+
+        Parameters
+        ----------
+        table_name: :class:`str`
+            The table that you want to insert into. This should NOT be a user supplied value.
+        columns: Sequence[:class:`str`]
+            The columns that each record holds the values for, in order. These should NOT
+            be user supplied values.
+        records: Union[Iterable[Sequence[Any]], AsyncIterable[Sequence[Any]]]
+            The rows that should be inserted.
+        chunk_size: Optional[:class:`int`]
+            The number of records that should be sent to the database at a time.
+            Defaults to the ``chunk_size`` set in your database config, or 1000.
+
+        Examples
+        ---------
+        >>> async def get_messages():
+        >>>     async for message in channel.history(limit=None):
+        >>>         yield (message.id, message.author.id, message.created_at)
+        >>> await db.copy_records("message_log", ("message_id", "user_id", "timestamp"), get_messages())
+
+        Returns
+        --------
+        :class:`int`
+            The number of rows that were inserted.
+        """
+
+        assert self.conn, "No connection has been established"
+        self.logger.debug("Copying records into %s %s", table_name, columns)
+        self._check_partition_tables([table_name.lower()])
+        await self._use_primary()
+        total = 0
+        async for chunk in _iterate_chunks(records, chunk_size or self.chunk_size):
+            await self.driver.copy_records(self, table_name, tuple(columns), chunk)
+            total += len(chunk)
+        if table_name.lower() in self.query_cache.known_tags:
+            self.query_cache.invalidate(table_name)
+            if self.written_tables is not None:
+                self.written_tables.add(table_name.lower())
+        return total
+
+    async def copy_from_query(self, sql: str, *args, output: CopyOutput, header: bool = False) -> int:
+        """
+        Run a line of SQL against your database driver, writing the returned rows to the
+        given output as CSV. With PostgreSQL this uses ``COPY``; with other drivers the rows
+        are streamed in chunks and converted to CSV as they're read.
+
+        Parameters
+        ----------
+        sql: :class:`str`
+            The SQL that you want to run. See :func:`DatabaseWrapper.call`.
+        *args: typing.Any
+            The arguments that are passed to your database call.
+        output: Union[:class:`str`, :class:`os.PathLike`, BinaryIO, Callable[[:class:`bytes`], Awaitable[None]]]
+            Where the CSV should be written - a path, a file opened in binary mode, or
+            a coroutine function that's called with each chunk of data.
+        header: :class:`bool`
+            Whether or not the column names should be written as the first line.
+
+        Examples
+        ---------
+        >>> await db.copy_from_query("SELECT * FROM message_log WHERE user_id=$1", user.id, output="log.csv")
+
+        Returns
+        --------
+        :class:`int`
+            The number of rows that were written.
+        """
+
+        assert self.conn, "No connection has been established"
+        self.logger.debug("Copying from SQL: %s %s", sql, args)
+        self._check_partition_tables(get_referenced_tables(sql))
+        if self.on_replica and not _is_read_only_sql(sql):
+            await self._use_primary()
+        return await self.driver.copy_from_query(self, sql, *args, output=output, header=header, chunk_size=self.chunk_size)
 
     async def executemany(self, sql: str, *args_list: typing.Iterable[typing.Any]) -> None:
         """
@@ -311,8 +1324,8 @@ class DatabaseWrapper(object):
         """
 
         assert self.conn, "No connection has been established"
-        self.logger.debug(f"Running SQL: {sql} {args_list!s}")
-        return await self.driver.executemany(self, sql, *args_list)
+        self.logger.debug("Running SQL: %s %s", sql, args_list)
+        return await self._run(self.driver.executemany, sql, args_list, many=True)
 
     async def execute_many(self, sql: str, *args) -> None:
         """:meta private:"""
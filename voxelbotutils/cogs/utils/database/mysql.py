@@ -1,13 +1,16 @@
 from __future__ import annotations
 
+import asyncio
+import logging
 import typing
 
 import aiomysql
 
+from ..deadline import clear_deadline
 from .types import DriverWrapper
 
 if typing.TYPE_CHECKING:
-    from .types import UserDatabaseConfig, DatabaseConfig
+    from .types import UserDatabaseConfig, DatabaseConfig, DriverPool
     from .model import DatabaseWrapper, DatabaseTransaction
 
     class MysqlDatabaseWrapper(DatabaseWrapper):
@@ -19,23 +22,35 @@ if typing.TYPE_CHECKING:
 
     class MysqlDatabaseTransaction(DatabaseTransaction):
         parent: MysqlDatabaseWrapper
-        _transaction: None
+        _transaction: typing.Optional[str]
         is_active: bool
         commit_on_exit: bool
 
 
 class MysqlWrapper(DriverWrapper):
 
+    logger: logging.Logger = logging.getLogger("vbu.database.mysql")
+
     @staticmethod
     async def create_pool(config: DatabaseConfig) -> aiomysql.Pool:
+        config = dict(config)  # type: ignore
+        if "min_size" in config:
+            config["minsize"] = config.pop("min_size")  # type: ignore
+        if "max_size" in config:
+            config["maxsize"] = config.pop("max_size")  # type: ignore
         return await aiomysql.create_pool(**config, autocommit=True)
 
     @staticmethod
-    async def get_connection(dbw: typing.Type[MysqlDatabaseWrapper]) -> MysqlDatabaseWrapper:
-        connection: aiomysql.Connection = await dbw.pool.acquire()
+    def get_pool_size(pool: aiomysql.Pool) -> typing.Optional[int]:
+        return pool.size
+
+    @staticmethod
+    async def get_connection(dbw: typing.Type[MysqlDatabaseWrapper], pool: DriverPool) -> MysqlDatabaseWrapper:
+        connection: aiomysql.Connection = await pool.acquire()
         cursor = await connection.cursor(aiomysql.DictCursor)
         v = dbw(
             conn=connection,
+            source_pool=pool,
             cursor=cursor,
         )
         v.is_active = True
@@ -45,24 +60,49 @@ class MysqlWrapper(DriverWrapper):
     async def release_connection(dbw: MysqlDatabaseWrapper) -> None:
         assert dbw.conn
         assert dbw.cursor
-        await dbw.cursor.close()
-        await dbw.pool.release(dbw.conn)
+        if not dbw.conn.closed:  # It's closed if its query was cancelled
+            await dbw.cursor.close()
+        await dbw.source_pool.release(dbw.conn)
         dbw.conn = None
         dbw.is_active = False
 
+    @staticmethod
+    async def get_replication_lag(dbw: MysqlDatabaseWrapper) -> typing.Optional[float]:
+        await dbw.caller.execute("SHOW SLAVE STATUS")
+        status = await dbw.caller.fetchone()
+        if not status:
+            return None  # Not a replica
+        lag = status.get("Seconds_Behind_Master")
+        if lag is None:
+            return float("inf")  # Replication isn't running
+        return float(lag)
+
     @classmethod
     async def start_transaction(cls, tra: MysqlDatabaseTransaction):
         assert tra.parent.conn
+
+        # Transactions started inside of another (ie on a borrowed connection) are savepoints
+        if tra.parent.conn.get_transaction_status():
+            tra._transaction = f"vbu_{id(tra)}"
+            await tra.parent.caller.execute(f"SAVEPOINT {tra._transaction}")
+            return
         await tra.parent.conn.begin()
 
     @staticmethod
     async def commit_transaction(tra: MysqlDatabaseTransaction) -> None:
         assert tra.parent.conn
+        if tra._transaction:
+            await tra.parent.caller.execute(f"RELEASE SAVEPOINT {tra._transaction}")
+            return
         await tra.parent.conn.commit()
 
     @staticmethod
     async def rollback_transaction(tra: MysqlDatabaseTransaction) -> None:
         assert tra.parent.conn
+        if tra._transaction:
+            await tra.parent.caller.execute(f"ROLLBACK TO SAVEPOINT {tra._transaction}")
+            await tra.parent.caller.execute(f"RELEASE SAVEPOINT {tra._transaction}")
+            return
         await tra.parent.conn.rollback()
 
     @staticmethod
@@ -71,11 +111,101 @@ class MysqlWrapper(DriverWrapper):
         data = await dbw.caller.fetchall()
         return data or list()
 
+    @staticmethod
+    async def fetch_all(dbw: MysqlDatabaseWrapper, sql: str, *args) -> typing.List[typing.Any]:
+        await dbw.caller.execute(sql, args)
+        return list(await dbw.caller.fetchall() or ())
+
+    @staticmethod
+    async def fetch_row(dbw: MysqlDatabaseWrapper, sql: str, *args) -> typing.Optional[typing.Any]:
+        await dbw.caller.execute(sql, args)
+        return await dbw.caller.fetchone()
+
+    @staticmethod
+    async def execute(dbw: MysqlDatabaseWrapper, sql: str, *args) -> None:
+        await dbw.caller.execute(sql, args)
+
+    @classmethod
+    async def cancel_query(cls, dbw: MysqlDatabaseWrapper) -> None:
+        if not dbw.conn:
+            return
+        thread_id = dbw.conn.thread_id()
+        dbw.conn.close()  # The pool won't hand out a closed connection again
+        asyncio.get_running_loop().create_task(cls._kill_query(dbw.source_pool, thread_id))
+
+    @classmethod
+    async def _kill_query(cls, pool: DriverPool, thread_id: int) -> None:
+        """
+        Stop the server running a query whose connection was closed, as closing the
+        connection on our side doesn't.
+        """
+
+        clear_deadline()
+        try:
+            connection: aiomysql.Connection = await pool.acquire()
+            try:
+                async with connection.cursor() as cursor:
+                    await cursor.execute("KILL QUERY %s", (thread_id,))
+            finally:
+                await pool.release(connection)
+        except Exception as e:
+            cls.logger.warning(f"Failed to kill MySQL query on connection {thread_id} - {e}")
+
+    @staticmethod
+    async def acquire_migration_lock(dbw: MysqlDatabaseWrapper) -> None:
+        await dbw.caller.execute("SELECT GET_LOCK('vbu_schema_migrations', -1) AS locked")
+        row = await dbw.caller.fetchone()
+        if not row or row["locked"] != 1:
+            raise RuntimeError("Failed to get the database migration lock")
+
+    @staticmethod
+    async def release_migration_lock(dbw: MysqlDatabaseWrapper) -> None:
+        await dbw.caller.execute("SELECT RELEASE_LOCK('vbu_schema_migrations')")
+        await dbw.caller.fetchone()
+
     @staticmethod
     async def executemany(dbw: MysqlDatabaseWrapper, sql: str, *args_list) -> None:
         assert dbw.conn
         await dbw.caller.executemany(sql, args_list)
 
+    @staticmethod
+    async def iterate(dbw: MysqlDatabaseWrapper, sql: str, *args, chunk_size: int) -> typing.AsyncIterator[typing.List[typing.Any]]:
+        assert dbw.conn
+
+        # Use an unbuffered cursor so that rows are only read from the server as they're fetched
+        cursor: aiomysql.SSDictCursor = await dbw.conn.cursor(aiomysql.SSDictCursor)
+        try:
+            await cursor.execute(sql, args)
+            while True:
+                rows = await cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            await cursor.close()
+
+    @classmethod
+    async def copy_records(cls, dbw: MysqlDatabaseWrapper, table_name: str, columns: typing.Sequence[str], records: typing.List[typing.Sequence[typing.Any]]) -> None:
+
+        # Send the whole chunk as a single multi-row insert
+        row = "({0})".format(", ".join("%s" for _ in columns))
+        sql = "INSERT INTO {0} ({1}) VALUES {2}".format(
+            table_name,
+            ", ".join(columns),
+            ", ".join(row for _ in records),
+        )
+        await dbw.caller.execute(sql, [i for record in records for i in record])
+
     def prepare(self) -> typing.Generator[str, None, None]:
         while True:
             yield "%s"
+
+    @classmethod
+    def get_upsert_sql(cls, table_name: str, keys: typing.Sequence[str], columns: typing.Sequence[str]) -> str:
+        prep = cls().prepare()
+        return "INSERT INTO {0} ({1}) VALUES ({2}) ON DUPLICATE KEY UPDATE {3}".format(
+            table_name,
+            ", ".join((*keys, *columns)),
+            ", ".join(next(prep) for _ in (*keys, *columns)),
+            ", ".join(f"{i}=VALUES({i})" for i in columns),
+        )
@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import typing
+
+if typing.TYPE_CHECKING:
+    from .model import DatabaseWrapper
+
+
+NotificationCallback = typing.Callable[[str, str], typing.Union[None, typing.Awaitable[None]]]
+
+
+def get_notify_trigger_sql(
+        table_name: str,
+        key_columns: typing.Sequence[str],
+        *,
+        channel: str = "vbu_row_changes") -> str:
+    """
+    Get the SQL for a PostgreSQL trigger that sends a notification whenever a row
+    in the given table is inserted, updated, or deleted. The payload is a JSON
+    object of the table name (``table``), the operation (``op``), the row's key
+    columns (``keys``), and the columns whose values were changed (``values``).
+    Updates that don't change anything aren't sent.
+
+    PostgreSQL refuses notifications of 8000 bytes or more (failing the write that
+    sent it), so if the changed values would make the payload too big, they're left
+    out and ``values`` is ``null`` - listeners should fetch the row again themselves.
+    """
+
+    trigger_args = ", ".join(f"'{i}'" for i in (channel, *key_columns))
+    return f"""
+        CREATE OR REPLACE FUNCTION vbu_notify_row_change() RETURNS TRIGGER AS $$
+        DECLARE
+            new_row JSONB := CASE WHEN TG_OP = 'DELETE' THEN '{{}}'::JSONB ELSE to_jsonb(NEW) END;
+            old_row JSONB := CASE WHEN TG_OP = 'INSERT' THEN '{{}}'::JSONB ELSE to_jsonb(OLD) END;
+            keys JSONB := '{{}}'::JSONB;
+            changed JSONB;
+            payload TEXT;
+        BEGIN
+            FOR i IN 1..TG_NARGS - 1 LOOP
+                keys := keys || jsonb_build_object(TG_ARGV[i], COALESCE(new_row -> TG_ARGV[i], old_row -> TG_ARGV[i]));
+            END LOOP;
+            SELECT COALESCE(jsonb_object_agg(key, value), '{{}}'::JSONB) INTO changed
+                FROM jsonb_each(new_row) WHERE old_row -> key IS DISTINCT FROM value;
+            IF TG_OP = 'UPDATE' AND changed = '{{}}'::JSONB THEN
+                RETURN NULL;
+            END IF;
+            payload := jsonb_build_object(
+                'table', TG_TABLE_NAME, 'op', TG_OP, 'keys', keys, 'values', changed
+            )::TEXT;
+            IF octet_length(payload) >= 8000 THEN
+                payload := jsonb_build_object(
+                    'table', TG_TABLE_NAME, 'op', TG_OP, 'keys', keys, 'values', NULL
+                )::TEXT;
+            END IF;
+            PERFORM pg_notify(TG_ARGV[0], payload);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+        DROP TRIGGER IF EXISTS {table_name}_vbu_notify ON {table_name};
+        CREATE TRIGGER {table_name}_vbu_notify AFTER INSERT OR UPDATE OR DELETE ON {table_name}
+            FOR EACH ROW EXECUTE PROCEDURE vbu_notify_row_change({trigger_args});
+    """
+
+
+class NotificationListener(object):
+    """
+    Dedicated connections (outside of the pools) that listen for notifications on
+    any number of channels, one to each database, reconnecting and listening again
+    if a connection drops.
+
+    Parameters
+    -----------
+    database: Type[:class:`DatabaseWrapper`]
+        The database class that the notifications are for.
+    configs: Optional[Dict[Optional[:class:`str`], :class:`dict`]]
+        The configs of the databases to listen to, keyed by partition name (``None``
+        for the main database). Defaults to just the main database.
+    health_check_interval: :class:`float`
+        How many seconds to wait between checking that the connection is still alive.
+    max_reconnect_delay: :class:`float`
+        The longest that the listener waits between attempts to reconnect.
+
+    :meta private:
+    """
+
+    logger: logging.Logger = logging.getLogger("vbu.database.notifications")
+
+    def __init__(
+            self,
+            database: typing.Type[DatabaseWrapper],
+            configs: typing.Optional[typing.Dict[typing.Optional[str], typing.Any]] = None,
+            *,
+            health_check_interval: float = 30,
+            max_reconnect_delay: float = 30):
+        self.database = database
+        self.configs = configs if configs is not None else {None: database.config}
+        self.health_check_interval = health_check_interval
+        self.max_reconnect_delay = max_reconnect_delay
+        self.callbacks: typing.Dict[str, typing.List[NotificationCallback]] = dict()
+        self.connections: typing.Dict[typing.Optional[str], typing.Any] = dict()
+        self._tasks: typing.List[asyncio.Task] = list()
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__} channels={list(self.callbacks)} connected={len(self.connections)}/{len(self.configs)}>"
+
+    async def add(self, channel: str, callback: NotificationCallback) -> None:
+        """
+        Run the given callback whenever a notification is sent to the channel.
+        """
+
+        callbacks = self.callbacks.setdefault(channel, list())
+        callbacks.append(callback)
+        if len(callbacks) == 1:
+            for connection in list(self.connections.values()):
+                await self.database.driver.add_notification_listener(connection, channel, self._dispatch)
+
+    async def remove(self, channel: str, callback: NotificationCallback) -> None:
+        """
+        Stop running the given callback for the channel.
+        """
+
+        callbacks = self.callbacks.get(channel, [])
+        if callback in callbacks:
+            callbacks.remove(callback)
+        if callbacks:
+            return
+        self.callbacks.pop(channel, None)
+        for connection in list(self.connections.values()):
+            await self.database.driver.remove_notification_listener(connection, channel, self._dispatch)
+
+    def _dispatch(self, connection: typing.Any, pid: int, channel: str, payload: str) -> None:
+        for callback in list(self.callbacks.get(channel, [])):
+            try:
+                result = callback(channel, payload)
+                if asyncio.iscoroutine(result):
+                    asyncio.get_running_loop().create_task(result)
+            except Exception:
+                self.logger.error(f"Failed to run notification callback for channel {channel}", exc_info=True)
+
+    async def _run(self, name: typing.Optional[str], config: typing.Any) -> None:
+        database_name = name or "main"
+        delay = 1.0
+        while True:
+            connection = None
+            try:
+                connection = await self.database.driver.connect_listener(config)
+
+                # Channels can be added while we're listening to the others
+                listening: typing.Set[str] = set()
+                while (missing := set(self.callbacks) - listening):
+                    for channel in missing:
+                        await self.database.driver.add_notification_listener(connection, channel, self._dispatch)
+                        listening.add(channel)
+                self.connections[name] = connection
+                self.logger.info(f"Listening for notifications from the {database_name} database on {len(self.callbacks)} channels")
+                delay = 1.0
+
+                # Notifications are handled by the driver, so we just need to notice if the connection dies
+                while True:
+                    await asyncio.sleep(self.health_check_interval)
+                    await asyncio.wait_for(connection.execute("SELECT 1"), timeout=self.health_check_interval)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.warning(f"Lost the notification connection to the {database_name} database, reconnecting in {delay:.0f}s - {e}")
+            finally:
+                self.connections.pop(name, None)
+                if connection is not None:
+                    try:
+                        await asyncio.wait_for(connection.close(), timeout=5)
+                    except Exception:
+                        pass
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_reconnect_delay)
+
+    def start(self) -> None:
+        """
+        Connect to each database and start listening in the background.
+        """
+
+        loop = asyncio.get_running_loop()
+        self._tasks = [loop.create_task(self._run(name, config)) for name, config in self.configs.items()]
+
+    async def close(self) -> None:
+        """
+        Stop listening and close the connections.
+        """
+
+        tasks, self._tasks = self._tasks, list()
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import asyncio
+import functools
+import importlib
+import re
+import typing
+
+from .pool import MonitoredPool
+
+
+PartitionRouter = typing.Callable[[int, int], int]
+
+_TABLE_REFERENCE = re.compile(
+    r"\b(?:from|join|into|update|table(?:\s+if\s+(?:not\s+)?exists)?)\s+([\w.\"`]+)(?![\w.\"`(])",
+    re.IGNORECASE,
+)
+_CTE_NAME = re.compile(r"([\w\"`]+)\s+as\s+(?:(?:not\s+)?materialized\s+)?\(", re.IGNORECASE)
+_NOT_TABLES = frozenset({"set", "select", "lateral", "only", "values"})
+
+
+@functools.lru_cache(maxsize=1_024)
+def get_referenced_tables(sql: str) -> typing.FrozenSet[str]:
+    """
+    Get the names of the tables that some SQL reads from or writes to, lowercased
+    and without their schema or any quotes. Function calls (names directly followed
+    by a bracket, so ``INSERT INTO table (column)`` is still counted) and the names
+    of common table expressions aren't included. This can give names that aren't
+    tables (eg the column in ``EXTRACT(YEAR FROM column)``), so it should only be
+    used to see whether some SQL touches a given table, not that it doesn't.
+    """
+
+    def clean(name: str) -> str:
+        return name.strip("\"`").split(".")[-1].strip("\"`").lower()
+
+    cte_names = {clean(i.group(1)) for i in _CTE_NAME.finditer(sql)}
+    return frozenset(
+        name
+        for name in (clean(i.group(1)) for i in _TABLE_REFERENCE.finditer(sql))
+        if name and name not in cte_names and name not in _NOT_TABLES
+    )
+
+
+def default_router(guild_id: int, partition_count: int) -> int:
+    """
+    Get the index of the partition that a guild's rows are on, spreading guilds
+    evenly across the partitions by their ID.
+    """
+
+    return guild_id % partition_count
+
+
+class PartitionSet(object):
+    """
+    The databases that some tables are spread across, with each guild's rows in
+    those tables being kept on a single partition chosen by a routing function.
+
+    Parameters
+    -----------
+    pools: List[:class:`MonitoredPool`]
+        The partitions' connection pools, in order. The pools' names are the names
+        of the partitions.
+    tables: Iterable[:class:`str`]
+        The tables whose rows are spread across the partitions. Every other table
+        is only on the main database.
+    router: Union[Callable[[:class:`int`, :class:`int`], :class:`int`], :class:`str`, None]
+        A function which takes a guild ID and the number of partitions and gives the
+        index of the partition that the guild's rows are on, or the function given
+        as ``module:function``. Defaults to ``guild_id % len(pools)``.
+    configs: Optional[Dict[:class:`str`, :class:`dict`]]
+        The connection configs of the partitions, keyed by name, for connections
+        made outside of the pools.
+
+    :meta private:
+    """
+
+    def __init__(
+            self,
+            pools: typing.List[MonitoredPool],
+            *,
+            tables: typing.Iterable[str] = (),
+            router: typing.Union[PartitionRouter, str, None] = None,
+            configs: typing.Optional[typing.Dict[str, typing.Any]] = None):
+        if not pools:
+            raise RuntimeError("At least one database partition needs to be given")
+        self.pools = pools
+        self.pools_by_name = {i.name: i for i in pools}
+        if len(self.pools_by_name) != len(pools):
+            raise RuntimeError("Multiple database partitions have the same name")
+        self.tables = frozenset(i.lower() for i in tables)
+        if isinstance(router, str):
+            module_name, _, attr = router.replace(":", ".").rpartition(".")
+            router = getattr(importlib.import_module(module_name), attr)
+        self.router: PartitionRouter = router or default_router  # type: ignore
+        self.configs: typing.Dict[str, typing.Any] = configs or dict()
+
+    def __len__(self) -> int:
+        return len(self.pools)
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__} partitions={list(self.pools_by_name)}>"
+
+    def is_partitioned(self, table_name: str) -> bool:
+        """
+        Whether or not the given table's rows are spread across the partitions.
+        """
+
+        return table_name.lower() in self.tables
+
+    def get_pool(self, guild_id: int) -> MonitoredPool:
+        """
+        Get the pool for the partition that the given guild's rows are on.
+        """
+
+        index = self.router(int(guild_id), len(self.pools))
+        return self.pools[index]
+
+    def group_by_partition(self, guild_ids: typing.Iterable[int]) -> typing.Dict[str, typing.List[int]]:
+        """
+        Group guild IDs by the name of the partition that their rows are on.
+        """
+
+        groups: typing.Dict[str, typing.List[int]] = dict()
+        for guild_id in guild_ids:
+            groups.setdefault(self.get_pool(guild_id).name, list()).append(guild_id)
+        return groups
+
+    async def close(self) -> None:
+        """
+        Close each of the partitions' pools.
+        """
+
+        await asyncio.gather(*(i.close() for i in self.pools))
@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+import asyncio
+import time
+import typing
+
+from discord.ext import commands
+
+from ..deadline import DeadlineExceeded, time_remaining
+
+if typing.TYPE_CHECKING:
+    from .types import DriverPool, DriverConnection, DriverWrapper
+
+
+class DatabasePoolTimeout(commands.CommandError):
+    """
+    Raised when a connection couldn't be acquired from the database pool within
+    the :attr:`acquire timeout<BotConfig.database.acquire_timeout>`, usually because
+    every connection is in use.
+
+    Attributes
+    -----------
+    pool_name: :class:`str`
+        The name of the pool that the connection was being acquired from.
+    timeout: :class:`float`
+        The number of seconds that were waited for.
+    """
+
+    def __init__(self, pool_name: str, timeout: float):
+        self.pool_name = pool_name
+        self.timeout = timeout
+        super().__init__(f"Timed out after {timeout}s waiting for a connection from the {pool_name} database pool.")
+
+
+class PoolAcquireContext(object):
+    """
+    The result of :func:`MonitoredPool.acquire`, which can be awaited or used
+    as an async context manager.
+
+    :meta private:
+    """
+
+    __slots__ = ("pool", "connection",)
+
+    def __init__(self, pool: MonitoredPool):
+        self.pool = pool
+        self.connection: typing.Optional[DriverConnection] = None
+
+    def __await__(self) -> typing.Generator[typing.Any, None, DriverConnection]:
+        return self.pool._acquire().__await__()
+
+    async def __aenter__(self) -> DriverConnection:
+        self.connection = await self.pool._acquire()
+        return self.connection
+
+    async def __aexit__(self, *args) -> None:
+        connection, self.connection = self.connection, None
+        await self.pool.release(connection)
+
+
+class MonitoredPool(object):
+    """
+    A wrapper around a driver's connection pool that gives up on acquiring a connection
+    after a timeout, and keeps count of how the pool's connections are being used.
+    Any other attributes are taken from the driver's pool.
+
+    Parameters
+    -----------
+    name: :class:`str`
+        A name for the pool, used in errors and metrics.
+    pool: DriverPool
+        The driver's connection pool.
+    driver: Type[DriverWrapper]
+        The driver that the pool was made with.
+    acquire_timeout: Optional[:class:`float`]
+        The number of seconds to wait for a connection before raising
+        :class:`DatabasePoolTimeout`. If ``None``, acquiring waits forever.
+
+    Attributes
+    -----------
+    in_use: :class:`int`
+        The number of connections from this pool that are currently acquired.
+    waiting: :class:`int`
+        The number of tasks currently waiting for a connection.
+
+    :meta private:
+    """
+
+    def __init__(
+            self,
+            name: str,
+            pool: DriverPool,
+            driver: typing.Type[DriverWrapper],
+            *,
+            acquire_timeout: typing.Optional[float] = None):
+        self.name = name
+        self.pool = pool
+        self.driver = driver
+        self.acquire_timeout = acquire_timeout
+        self.in_use: int = 0
+        self.waiting: int = 0
+        self.acquires: int = 0
+        self.timeouts: int = 0
+        self.wait_total: float = 0
+        self.wait_max: float = 0
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__} name={self.name!r} in_use={self.in_use} waiting={self.waiting}>"
+
+    def __getattr__(self, item: str) -> typing.Any:
+        return getattr(self.pool, item)
+
+    @property
+    def size(self) -> typing.Optional[int]:
+        """
+        The number of connections that the pool currently has open, or ``None`` if
+        the driver doesn't say.
+        """
+
+        return self.driver.get_pool_size(self.pool)
+
+    @property
+    def idle(self) -> typing.Optional[int]:
+        """
+        The number of open connections that aren't in use, or ``None`` if the
+        driver doesn't say how many are open.
+        """
+
+        size = self.size
+        if size is None:
+            return None
+        return max(size - self.in_use, 0)
+
+    def acquire(self) -> PoolAcquireContext:
+        """
+        Acquire a connection from the pool. The result can either be awaited to get the
+        connection (which should then be given back with :func:`release`), or used as an
+        ``async with`` block which releases the connection when it's left - the same
+        as the driver's own pool.
+        """
+
+        return PoolAcquireContext(self)
+
+    async def _acquire(self) -> DriverConnection:
+
+        # Give up at the acquire timeout or the current deadline, whichever is sooner
+        timeout = self.acquire_timeout
+        remaining = time_remaining()
+        at_deadline = remaining is not None and (timeout is None or remaining < timeout)
+        if at_deadline:
+            if remaining <= 0:  # type: ignore
+                raise DeadlineExceeded(0)
+            timeout = remaining
+
+        # The timeout is given to the driver so that it can make sure no connection is lost
+        self.waiting += 1
+        start = time.perf_counter()
+        try:
+            connection = await self.driver.acquire(self.pool, timeout)
+        except asyncio.TimeoutError:
+            if at_deadline:
+                raise DeadlineExceeded(timeout) from None  # type: ignore
+            self.timeouts += 1
+            raise DatabasePoolTimeout(self.name, timeout) from None  # type: ignore
+        finally:
+            self.waiting -= 1
+        waited = (time.perf_counter() - start) * 1_000
+        self.acquires += 1
+        self.wait_total += waited
+        self.wait_max = max(self.wait_max, waited)
+        self.in_use += 1
+        return connection
+
+    async def release(self, connection: DriverConnection) -> None:
+        self.in_use -= 1
+        await self.pool.release(connection)
+
+    async def close(self) -> None:
+        await self.pool.close()
+
+    def reset_stats(self) -> typing.Dict[str, float]:
+        """
+        Reset the acquire counters, returning the number of acquires and timeouts, and
+        the average and longest time (in milliseconds) spent waiting for a connection,
+        since they were last reset.
+        """
+
+        stats = {
+            "acquires": self.acquires,
+            "timeouts": self.timeouts,
+            "wait_avg": self.wait_total / self.acquires if self.acquires else 0,
+            "wait_max": self.wait_max,
+        }
+        self.acquires = self.timeouts = 0
+        self.wait_total = self.wait_max = 0
+        return stats
@@ -1,15 +1,24 @@
 from __future__ import annotations
 
+import collections
+import importlib
+import json
 import typing
+import weakref
 
 import asyncpg
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
+from ..deadline import time_remaining
 from .types import DriverWrapper
 
 if typing.TYPE_CHECKING:
     import asyncpg.pool
     import asyncpg.transaction
-    from .types import UserDatabaseConfig, DatabaseConfig
+    from .types import UserDatabaseConfig, DatabaseConfig, DriverPool, CopyOutput
     from .model import DatabaseWrapper, DatabaseTransaction
 
     class PostgresDatabaseWrapper(DatabaseWrapper):
@@ -26,30 +35,139 @@ if typing.TYPE_CHECKING:
         commit_on_exit: bool
 
 
+# The key of the advisory lock held while running migrations
+_MIGRATION_LOCK_ID = 0x7662755F6D6967
+
+# Config keys that are used to set up connections rather than being passed to asyncpg.connect
+_POOL_OPTIONS = ("min_size", "max_size", "json_codecs", "statement_timeout", "prepared_statements", "init", "setup",)
+
+
+def _import_callable(path: str) -> typing.Callable[..., typing.Awaitable[None]]:
+    """
+    Import a function given as ``module:function`` or ``module.function``.
+    """
+
+    module_name, _, attr = path.replace(":", ".").rpartition(".")
+    return getattr(importlib.import_module(module_name), attr)
+
+
+def _get_timeout() -> typing.Optional[float]:
+    """
+    Get how long a query has until the current command's deadline. asyncpg asks the
+    server to cancel any query that's still running when its timeout ends.
+    """
+
+    remaining = time_remaining()
+    if remaining is None:
+        return None
+    return max(remaining, 0.001)
+
+
+if orjson is not None:
+    def _json_dumps(value: typing.Any) -> str:
+        return orjson.dumps(value).decode()
+    _json_loads = orjson.loads
+else:
+    _json_dumps = json.dumps
+    _json_loads = json.loads
+
+
 class PostgresWrapper(DriverWrapper):
 
-    @staticmethod
-    async def create_pool(config: DatabaseConfig) -> asyncpg.pool.Pool:
-        v = await asyncpg.create_pool(**config)
+    supports_notifications: typing.ClassVar[bool] = True
+
+    # A cache of prepared statements for each connection, keyed by their SQL. SQL that hasn't
+    # been run enough times to be worth preparing is kept with the number of times it's been run.
+    _statements: typing.ClassVar[weakref.WeakKeyDictionary] = weakref.WeakKeyDictionary()
+
+    @classmethod
+    async def create_pool(cls, config: DatabaseConfig) -> asyncpg.pool.Pool:
+        config = dict(config)  # type: ignore
+        json_codecs = config.pop("json_codecs", False)
+        statement_timeout = config.pop("statement_timeout", 0)
+        prepared_statements = list(config.pop("prepared_statements", []))
+        user_init = config.pop("init", None) or None
+        user_setup = config.pop("setup", None) or None
+        if isinstance(user_init, str):
+            user_init = _import_callable(user_init)
+        if isinstance(user_setup, str):
+            user_setup = _import_callable(user_setup)
+
+        # Set as a startup parameter, since the pool resets anything SET when a connection is released
+        if statement_timeout:
+            config["server_settings"] = {"statement_timeout": str(int(statement_timeout))}
+
+        async def init(connection: asyncpg.Connection) -> None:
+            if json_codecs:
+                await cls.set_json_codecs(connection)
+            if prepared_statements:
+                statements = cls._statements.setdefault(connection, collections.OrderedDict())
+                for sql in prepared_statements:
+                    statements[sql] = await connection.prepare(sql)
+            if user_init is not None:
+                await user_init(connection)
+
+        v = await asyncpg.create_pool(**config, init=init, setup=user_setup)
         assert v
         return v
 
     @staticmethod
-    async def get_connection(dbw: typing.Type[PostgresDatabaseWrapper]) -> PostgresDatabaseWrapper:
-        connection = await dbw.pool.acquire()
+    async def set_json_codecs(connection: asyncpg.Connection) -> None:
+        """
+        Make the connection encode and decode JSON and JSONB columns, using orjson
+        if it's installed.
+        """
+
+        for type_name in ("json", "jsonb"):
+            await connection.set_type_codec(
+                type_name,
+                schema="pg_catalog",
+                encoder=_json_dumps,
+                decoder=_json_loads,
+                format="text",
+            )
+
+    @staticmethod
+    def get_pool_size(pool: asyncpg.pool.Pool) -> typing.Optional[int]:
+        try:
+            return pool.get_size()
+        except AttributeError:
+            return sum(1 for i in pool._holders if i._con is not None)  # asyncpg<0.25 has no public method
+
+    @staticmethod
+    async def get_connection(dbw: typing.Type[PostgresDatabaseWrapper], pool: DriverPool) -> PostgresDatabaseWrapper:
+        connection = await pool.acquire()
         v = dbw(
             conn=connection,
+            source_pool=pool,
         )
         v.is_active = True
         return v
 
+    @staticmethod
+    async def acquire(pool: asyncpg.Pool, timeout: typing.Optional[float]) -> asyncpg.Connection:
+        return await pool.acquire(timeout=timeout)
+
     @staticmethod
     async def release_connection(dbw: PostgresDatabaseWrapper) -> None:
         assert dbw.conn
-        await dbw.pool.release(dbw.conn)
+        await dbw.source_pool.release(dbw.conn)
         dbw.conn = None
         dbw.is_active = False
 
+    @staticmethod
+    async def get_replication_lag(dbw: PostgresDatabaseWrapper) -> typing.Optional[float]:
+        assert dbw.conn
+
+        # A replica with nothing left to replay is caught up, however long ago the last write was
+        return await dbw.caller.fetchval(
+            """SELECT CASE
+                WHEN NOT pg_is_in_recovery() THEN NULL
+                WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+            END""",
+        )
+
     @classmethod
     async def start_transaction(cls, tra: PostgresDatabaseTransaction):
         assert tra.parent.conn
@@ -69,16 +187,151 @@ class PostgresWrapper(DriverWrapper):
     async def fetch(dbw: PostgresDatabaseWrapper, sql: str, *args) -> typing.List[typing.Any]:
         assert dbw.conn
         x = None
-        if 'select' in sql.casefold() or 'returning' in sql.casefold():
-            x = await dbw.caller.fetch(sql, *args)
+        folded = sql.casefold()
+        if 'select' in folded or 'returning' in folded:
+            x = await dbw.caller.fetch(sql, *args, timeout=_get_timeout())
         else:
-            await dbw.caller.execute(sql, *args)
+            await dbw.caller.execute(sql, *args, timeout=_get_timeout())
         return x or list()
 
+    @classmethod
+    def _get_statements(cls, dbw: PostgresDatabaseWrapper) -> typing.OrderedDict[str, typing.Union[asyncpg.prepared_stmt.PreparedStatement, int]]:
+        connection = getattr(dbw.conn, "_con", dbw.conn)  # Pooled connections are given as proxies
+        try:
+            return cls._statements[connection]
+        except KeyError:
+            statements = cls._statements[connection] = collections.OrderedDict()
+            return statements
+
+    @classmethod
+    async def _get_statement(cls, dbw: PostgresDatabaseWrapper, sql: str) -> typing.Optional[asyncpg.prepared_stmt.PreparedStatement]:
+        """
+        Get a prepared statement for the given SQL from the connection's cache. SQL is only
+        prepared once it's been run :attr:`statement_cache_threshold<BotConfig.database.statement_cache_threshold>`
+        times on the connection - until then ``None`` is returned, and the SQL is left to asyncpg's
+        own statement cache, so that SQL which is rarely run isn't prepared by both caches.
+        """
+
+        if dbw.statement_cache_size <= 0:
+            return None
+        statements = cls._get_statements(dbw)
+        cached = statements.get(sql, 0)
+        if not isinstance(cached, int):
+            cls.statement_cache_hits += 1
+            statements.move_to_end(sql)
+            return cached
+        cls.statement_cache_misses += 1
+        if cached + 1 < dbw.statement_cache_threshold:
+            statement = cached + 1
+        else:
+            statement = await dbw.caller.prepare(sql)
+        statements[sql] = statement
+        statements.move_to_end(sql)
+        while len(statements) > dbw.statement_cache_size:
+            statements.popitem(last=False)
+        return statement if not isinstance(statement, int) else None
+
+    @classmethod
+    async def _run_statement(cls, dbw: PostgresDatabaseWrapper, method: str, sql: str, *args) -> typing.Any:
+        """
+        Run one of the prepared statement's methods, falling back to the connection's
+        method of the same name if statements aren't being cached.
+        """
+
+        assert dbw.conn
+        statement = await cls._get_statement(dbw, sql)
+        if statement is None:
+            return await getattr(dbw.caller, method)(sql, *args, timeout=_get_timeout())
+        try:
+            return await getattr(statement, method)(*args, timeout=_get_timeout())
+        except asyncpg.exceptions.InvalidCachedStatementError:
+            cls._get_statements(dbw).pop(sql, None)  # The schema changed under us
+            if dbw.conn.is_in_transaction():
+                raise
+            statement = cls._get_statements(dbw)[sql] = await dbw.caller.prepare(sql)
+            return await getattr(statement, method)(*args, timeout=_get_timeout())
+
+    @classmethod
+    async def fetch_all(cls, dbw: PostgresDatabaseWrapper, sql: str, *args) -> typing.List[typing.Any]:
+        return await cls._run_statement(dbw, "fetch", sql, *args)
+
+    @classmethod
+    async def fetch_row(cls, dbw: PostgresDatabaseWrapper, sql: str, *args) -> typing.Optional[typing.Any]:
+        return await cls._run_statement(dbw, "fetchrow", sql, *args)
+
+    @classmethod
+    async def execute(cls, dbw: PostgresDatabaseWrapper, sql: str, *args) -> None:
+        assert dbw.conn
+
+        # SQL without arguments can hold multiple statements, which can't be prepared
+        if not args or dbw.statement_cache_size <= 0:
+            await dbw.caller.execute(sql, *args, timeout=_get_timeout())
+        else:
+            await cls._run_statement(dbw, "fetch", sql, *args)
+
     @staticmethod
     async def executemany(dbw: PostgresDatabaseWrapper, sql: str, *args_list) -> None:
         assert dbw.conn
-        await dbw.caller.executemany(sql, args_list)
+        await dbw.caller.executemany(sql, args_list, timeout=_get_timeout())
+
+    @staticmethod
+    async def execute_script(dbw: PostgresDatabaseWrapper, sql: str) -> None:
+        assert dbw.conn
+        await dbw.caller.execute(sql)  # Without arguments this is sent as one simple query
+
+    @staticmethod
+    async def acquire_migration_lock(dbw: PostgresDatabaseWrapper) -> None:
+        assert dbw.conn
+        await dbw.caller.execute(f"SELECT pg_advisory_lock({_MIGRATION_LOCK_ID})")
+
+    @staticmethod
+    async def release_migration_lock(dbw: PostgresDatabaseWrapper) -> None:
+        assert dbw.conn
+        await dbw.caller.execute(f"SELECT pg_advisory_unlock({_MIGRATION_LOCK_ID})")
+
+    @staticmethod
+    async def connect_listener(config: DatabaseConfig) -> asyncpg.Connection:
+        return await asyncpg.connect(**{i: o for i, o in config.items() if i not in _POOL_OPTIONS})
+
+    @staticmethod
+    async def add_notification_listener(connection: asyncpg.Connection, channel: str, callback: typing.Callable[..., None]) -> None:
+        await connection.add_listener(channel, callback)
+
+    @staticmethod
+    async def remove_notification_listener(connection: asyncpg.Connection, channel: str, callback: typing.Callable[..., None]) -> None:
+        await connection.remove_listener(channel, callback)
+
+    @staticmethod
+    async def iterate(dbw: PostgresDatabaseWrapper, sql: str, *args, chunk_size: int) -> typing.AsyncIterator[typing.List[typing.Any]]:
+        assert dbw.conn
+
+        # Cursors can only be used inside of a transaction
+        async with dbw.conn.transaction():
+            cursor = await dbw.caller.cursor(sql, *args)
+            while True:
+                rows = await cursor.fetch(chunk_size)
+                if not rows:
+                    break
+                yield rows
+
+    @staticmethod
+    async def copy_records(dbw: PostgresDatabaseWrapper, table_name: str, columns: typing.Sequence[str], records: typing.List[typing.Sequence[typing.Any]]) -> None:
+        assert dbw.conn
+        await dbw.caller.copy_records_to_table(table_name, columns=columns, records=records, timeout=_get_timeout())
+
+    @staticmethod
+    async def copy_from_query(
+            dbw: PostgresDatabaseWrapper, sql: str, *args,
+            output: CopyOutput, header: bool, chunk_size: int) -> int:
+        assert dbw.conn
+        status = await dbw.caller.copy_from_query(sql, *args, output=output, format="csv", header=header, timeout=_get_timeout())
+        return int(status.split()[-1])
+
+    @staticmethod
+    def get_any_sql(column: str, values: typing.Sequence[typing.Any]) -> typing.Tuple[str, typing.List[typing.Any]]:
+
+        # One array argument means the statement is the same for any number of values
+        return f"{column} = ANY($1)", [list(values)]
 
     def prepare(self) -> typing.Generator[str, None, None]:
         start = 1
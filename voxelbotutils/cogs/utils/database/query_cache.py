@@ -0,0 +1,220 @@
+from __future__ import annotations
+
+import asyncio
+import collections
+import functools
+import logging
+import re
+import time
+import typing
+
+from ..deadline import clear_deadline
+from ..redis import RedisConnection
+
+
+_WRITTEN_TABLE = re.compile(
+    r"\b(?:insert\s+(?:ignore\s+)?into|replace\s+into|update|delete\s+from|truncate(?:\s+table)?|"
+    r"merge\s+into|alter\s+table|drop\s+table(?:\s+if\s+exists)?)\s+([\w.\"`]+)",
+    re.IGNORECASE,
+)
+_NOT_TABLES = frozenset({"set", "of", "nowait", "skip"})  # ON CONFLICT DO UPDATE SET, FOR UPDATE OF, etc
+
+
+@functools.lru_cache(maxsize=1_024)
+def get_written_tables(sql: str) -> typing.FrozenSet[str]:
+    """
+    Get the names of the tables that some SQL writes to, lowercased and without
+    their schema or any quotes.
+    """
+
+    return frozenset(
+        name
+        for name in (i.group(1).strip("\"`").split(".")[-1].strip("\"`").lower() for i in _WRITTEN_TABLE.finditer(sql))
+        if name not in _NOT_TABLES
+    )
+
+
+class QueryCache(object):
+    """
+    A bounded in-memory cache of query results, used by :func:`DatabaseWrapper.cached`.
+    Each result is tagged with the tables that it was read from, and writes made via
+    :class:`DatabaseWrapper` to those tables remove it from the cache.
+
+    Parameters
+    -----------
+    maxsize: Optional[:class:`int`]
+        The maximum number of results to keep. The least recently used results are
+        evicted first. If ``None``, the cache is unbounded.
+    shared: :class:`bool`
+        Whether or not invalidations should be published via Redis (if it's enabled)
+        so that the other processes running the bot drop the same results.
+
+    Attributes
+    -----------
+    hits: :class:`int`
+        The number of lookups served from the cache since the stats were last reset.
+    misses: :class:`int`
+        The number of lookups that ran the query since the stats were last reset.
+    evictions: :class:`int`
+        The number of results removed to stay under ``maxsize`` since the stats were last reset.
+    invalidations: :class:`int`
+        The number of results removed by writes since the stats were last reset.
+    """
+
+    logger: logging.Logger = logging.getLogger("vbu.database.query_cache")
+
+    def __init__(self, *, maxsize: typing.Optional[int] = 1_024, shared: bool = True):
+        self.maxsize = maxsize
+        self.shared = shared
+        self._data: typing.OrderedDict[str, typing.Tuple[typing.List[typing.Any], float, typing.Tuple[str, ...]]] = collections.OrderedDict()
+        self._tags: typing.Dict[str, typing.Set[str]] = collections.defaultdict(set)
+        self.known_tags: typing.Set[str] = set()
+        self.generation: int = 0
+        self._invalidated_at: typing.Dict[str, int] = dict()
+        self._pending_publish: typing.Set[str] = set()
+        self._publish_task: typing.Optional[asyncio.Task] = None
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+        self.invalidations: int = 0
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__} size={len(self._data)}>"
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    @staticmethod
+    def make_key(sql: str, args: typing.Sequence[typing.Any]) -> str:
+        return repr((sql, tuple(args)))
+
+    def get(self, key: str) -> typing.Optional[typing.List[typing.Any]]:
+        """
+        Get a cached result, or ``None`` if it isn't cached or has expired.
+        """
+
+        try:
+            rows, expires, _ = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return None
+        if expires <= time.monotonic():
+            self._remove(key)
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return rows
+
+    def set(
+            self,
+            key: str,
+            rows: typing.List[typing.Any],
+            *,
+            ttl: float,
+            tags: typing.Iterable[str],
+            generation: typing.Optional[int] = None) -> None:
+        """
+        Store a result in the cache, evicting the least recently used results if
+        the cache has gone over its size. If a generation is given and any of the tags
+        have been invalidated since, the result may be out of date and isn't stored.
+        """
+
+        tags = tuple(i.lower() for i in tags)
+        self.known_tags.update(tags)
+        if generation is not None and any(self._invalidated_at.get(i, -1) >= generation for i in tags):
+            return
+        if key in self._data:
+            self._remove(key)
+        self._data[key] = (rows, time.monotonic() + ttl, tags)
+        for tag in tags:
+            self._tags[tag].add(key)
+        while self.maxsize is not None and len(self._data) > self.maxsize:
+            self._remove(next(iter(self._data)))
+            self.evictions += 1
+
+    def _remove(self, key: str) -> None:
+        _, _, tags = self._data.pop(key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is None:
+                continue
+            keys.discard(key)
+            if not keys:
+                del self._tags[tag]
+
+    def invalidate(self, *tags: str, publish: bool = True) -> None:
+        """
+        Remove every cached result with any of the given tags.
+
+        Parameters
+        -----------
+        *tags: :class:`str`
+            The tags (usually table names) whose results should be removed.
+        publish: :class:`bool`
+            Whether or not the invalidation should be published to the bot's other
+            processes via Redis.
+        """
+
+        for tag in tags:
+            tag = tag.lower()
+            self._invalidated_at[tag] = self.generation
+            for key in list(self._tags.get(tag, ())):
+                self._remove(key)
+                self.invalidations += 1
+        self.generation += 1
+        if publish and self.shared and RedisConnection.enabled:
+            self._pending_publish.update(i.lower() for i in tags)
+            if self._publish_task is None or self._publish_task.done():
+                self._publish_task = asyncio.get_running_loop().create_task(self._publish())
+
+    def invalidate_for_sql(self, sql: str) -> typing.FrozenSet[str]:
+        """
+        Remove every cached result tagged with a table that the given SQL writes to,
+        returning the tags that were invalidated.
+        """
+
+        tags = get_written_tables(sql) & self.known_tags
+        if tags:
+            self.invalidate(*tags)
+        return tags
+
+    async def _publish(self) -> None:
+        """
+        Publish every pending invalidation in one message, so a run of writes
+        to the same table only sends one.
+        """
+
+        clear_deadline()
+        await asyncio.sleep(0)
+        tags, self._pending_publish = self._pending_publish, set()
+        if not tags:
+            return
+        try:
+            async with RedisConnection() as re:
+                await re.publish_query_cache_invalidation(list(tags))
+        except Exception as e:
+            self.logger.warning(f"Failed to publish query cache invalidation for {', '.join(tags)} - {e}")
+
+    def clear(self) -> None:
+        """
+        Remove every result from the cache.
+        """
+
+        self._data.clear()
+        self._tags.clear()
+
+    def reset_stats(self) -> typing.Dict[str, int]:
+        """
+        Reset the hit, miss, eviction, and invalidation counters, returning their
+        values before being reset.
+        """
+
+        stats = {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+        return stats
@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import asyncio
+import itertools
+import logging
+import typing
+
+from .pool import MonitoredPool
+
+if typing.TYPE_CHECKING:
+    from .model import DatabaseWrapper
+
+
+class ReplicaPool(MonitoredPool):
+    """
+    A connection pool for a read replica, keeping track of how far behind the
+    primary it is.
+
+    Attributes
+    -----------
+    lag: Optional[:class:`float`]
+        How many seconds behind the primary the replica was when it was last checked,
+        or ``None`` if that isn't known.
+    healthy: :class:`bool`
+        Whether or not the replica could be reached when it was last checked.
+
+    :meta private:
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lag: typing.Optional[float] = None
+        self.healthy: bool = True
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__} name={self.name!r} in_use={self.in_use} lag={self.lag}>"
+
+
+class ReplicaSet(object):
+    """
+    The read replicas for a database, picking the least busy replica for each read-only
+    connection and checking in the background how far each is behind the primary.
+
+    Parameters
+    -----------
+    database: Type[:class:`DatabaseWrapper`]
+        The database class that the replicas belong to.
+    replicas: List[:class:`ReplicaPool`]
+        The replicas' connection pools.
+    max_lag: Optional[:class:`float`]
+        The number of seconds a replica can fall behind the primary before reads are
+        no longer sent to it. If ``None``, replication lag isn't checked.
+    check_interval: :class:`float`
+        How many seconds to wait between checking the replication lag.
+
+    :meta private:
+    """
+
+    logger: logging.Logger = logging.getLogger("vbu.database.replicas")
+
+    def __init__(
+            self,
+            database: typing.Type[DatabaseWrapper],
+            replicas: typing.List[ReplicaPool],
+            *,
+            max_lag: typing.Optional[float] = 10,
+            check_interval: float = 5):
+        self.database = database
+        self.replicas = replicas
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self._counter = itertools.count()
+        self._check_task: typing.Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self.replicas)
+
+    def is_usable(self, replica: ReplicaPool) -> bool:
+        """
+        Whether or not reads can be sent to the given replica.
+        """
+
+        if not replica.healthy:
+            return False
+        if self.max_lag is None or replica.lag is None:
+            return True
+        return replica.lag <= self.max_lag
+
+    def choose(self) -> typing.Optional[ReplicaPool]:
+        """
+        Get the usable replica with the fewest connections in use, rotating between
+        replicas that are equally busy. Returns ``None`` if no replica is usable.
+        """
+
+        offset = next(self._counter)
+        count = len(self.replicas)
+        chosen = None
+        for index in range(count):
+            replica = self.replicas[(offset + index) % count]
+            if not self.is_usable(replica):
+                continue
+            if chosen is None or replica.in_use < chosen.in_use:
+                chosen = replica
+        return chosen
+
+    async def check_lag(self) -> None:
+        """
+        Update the replication lag of each replica, marking any that can't be
+        reached as unhealthy.
+        """
+
+        for replica in self.replicas:
+            was_usable = self.is_usable(replica)
+            try:
+                db = await self.database.driver.get_connection(self.database, replica)
+                try:
+                    replica.lag = await self.database.driver.get_replication_lag(db)
+                finally:
+                    await db.disconnect()
+            except Exception as e:
+                replica.healthy = False
+                if was_usable:
+                    self.logger.warning(f"Failed to reach replica {replica.name}, sending its reads to the primary - {e}")
+                continue
+            replica.healthy = True
+
+            # Only log when the replica changes state
+            is_usable = self.is_usable(replica)
+            if was_usable and not is_usable:
+                self.logger.warning(f"Replica {replica.name} is {replica.lag:.1f}s behind the primary, sending its reads to the primary")
+            elif is_usable and not was_usable:
+                self.logger.info(f"Replica {replica.name} has caught up, sending reads to it again")
+
+    async def _check_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.check_interval)
+            await self.check_lag()
+
+    def start(self) -> None:
+        """
+        Start checking the replication lag in the background.
+        """
+
+        self._check_task = asyncio.get_running_loop().create_task(self._check_loop())
+
+    async def close(self) -> None:
+        """
+        Stop checking the replication lag and close each replica's pool.
+        """
+
+        if self._check_task is not None:
+            self._check_task.cancel()
+            self._check_task = None
+        for replica in self.replicas:
+            await replica.close()
@@ -1,29 +1,36 @@
 from __future__ import annotations
 
+import asyncio
+import logging
+import sqlite3
 import typing
 
 import aiosqlite
 
 from .types import DriverWrapper
+from .migrations import split_sql_statements
 
 if typing.TYPE_CHECKING:
-    from .types import UserDatabaseConfig, DatabaseConfig
+    from .types import UserDatabaseConfig, DatabaseConfig, DriverPool
     from .model import DatabaseWrapper, DatabaseTransaction
 
     class SQLiteDatabaseWrapper(DatabaseWrapper):
         config: UserDatabaseConfig
-        pool: None
+        pool: SQLitePool
         conn: typing.Optional[aiosqlite.Connection]
         cursor: typing.Optional[aiosqlite.Cursor]
         caller: aiosqlite.Connection
 
     class SQLiteDatabaseTransaction(DatabaseTransaction):
         parent: SQLiteDatabaseWrapper
-        _transaction: None
+        _transaction: typing.Optional[str]
         is_active: bool
         commit_on_exit: bool
 
 
+_READ_PREFIXES = ("select", "with", "pragma", "explain", "values")
+
+
 class RowWrapper(aiosqlite.Row):
 
     def values(self):
@@ -35,18 +42,192 @@ class RowWrapper(aiosqlite.Row):
             yield (i, self[i])
 
 
+class SQLiteWriter(object):
+    """
+    A single connection that all writes made outside of a transaction are queued to.
+    Writes that are queued at the same time are run in one transaction, so many small
+    writes only need one commit between them. Each write's future is only resolved once
+    its transaction has been committed, so anything read afterwards will see it.
+
+    :meta private:
+    """
+
+    logger: logging.Logger = logging.getLogger("vbu.database.sqlite")
+
+    def __init__(self, connection: aiosqlite.Connection, *, max_batch_size: int = 100):
+        self.connection = connection
+        self.max_batch_size = max_batch_size
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.task: typing.Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self.task = asyncio.get_running_loop().create_task(self.run())
+
+    async def write(self, sql: str, args: typing.Iterable[typing.Any], *, many: bool = False) -> typing.List[typing.Any]:
+        """
+        Queue some SQL to be run, waiting for it to be committed.
+        """
+
+        future = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait((sql, args, many, future))
+        return await future
+
+    async def run(self) -> None:
+        closing = False
+        while not closing:
+            batch = []
+            item = await self.queue.get()
+            while item is not None:
+                batch.append(item)
+                if len(batch) >= self.max_batch_size or self.queue.empty():
+                    break
+                item = self.queue.get_nowait()
+            closing = item is None  # We've been told to stop
+            if not batch:
+                continue
+            try:
+                await self.run_batch(batch)
+            except Exception as e:
+                for *_, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    async def run_batch(self, batch: list) -> None:
+        """
+        Run a batch of writes inside a single transaction. A write that fails only undoes
+        itself, so the other writes in the batch are still committed.
+        """
+
+        results = []
+        try:
+            await self.connection.execute("BEGIN IMMEDIATE")
+            for sql, args, many, _ in batch:
+
+                # Each write is in a savepoint, so an executemany that fails partway through
+                # doesn't leave the rows before the failing one behind
+                await self.connection.execute("SAVEPOINT vbu_write")
+                try:
+                    if many:
+                        await self.connection.executemany(sql, args)
+                        rows = []
+                    else:
+                        async with self.connection.execute(sql, args) as cursor:
+                            rows = list(await cursor.fetchall())
+                    await self.connection.execute("RELEASE SAVEPOINT vbu_write")
+                    results.append((rows, None))
+                except Exception as e:
+                    results.append((None, e))
+                    if self.connection.in_transaction:
+                        await self.connection.execute("ROLLBACK TO SAVEPOINT vbu_write")
+                        await self.connection.execute("RELEASE SAVEPOINT vbu_write")
+                    else:  # Some errors roll back the whole transaction
+                        await self.connection.execute("BEGIN IMMEDIATE")
+            await self.connection.execute("COMMIT")
+        except Exception as e:
+            self.logger.error(f"Failed to commit {len(batch)} queued writes - {e}", exc_info=True)
+            if self.connection.in_transaction:
+                await self.connection.execute("ROLLBACK")
+            results = [(None, e)] * len(batch)
+
+        # Tell everyone how it went
+        for (*_, future), (rows, error) in zip(batch, results):
+            if future.done():
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(rows)
+
+    async def close(self) -> None:
+        """
+        Run any writes that are still queued and then stop the writer.
+        """
+
+        if self.task is None:
+            return
+        self.queue.put_nowait(None)
+        await self.task
+        self.task = None
+
+
+class SQLitePool(object):
+    """
+    A pool of long-lived connections to an SQLite database in WAL mode, where reads
+    are spread over the pooled connections and writes made outside of a transaction
+    are queued to a single writer connection.
+
+    :meta private:
+    """
+
+    def __init__(self, database: str, *, size: int = 5, synchronous: str = "NORMAL", max_batch_size: int = 100):
+        if synchronous.upper() not in ("OFF", "NORMAL", "FULL", "EXTRA"):
+            raise ValueError(f"Invalid SQLite synchronous level {synchronous!r}")
+        self.database = database
+        self.size = size
+        self.synchronous = synchronous.upper()
+        self.max_batch_size = max_batch_size
+        self.connections: typing.List[aiosqlite.Connection] = list()
+        self.available: asyncio.Queue = asyncio.Queue()
+        self.writer: typing.Optional[SQLiteWriter] = None
+
+    async def _connect(self) -> aiosqlite.Connection:
+        connection = await aiosqlite.connect(self.database, isolation_level=None)
+        connection.row_factory = RowWrapper
+        await connection.execute("PRAGMA journal_mode=WAL")
+        await connection.execute(f"PRAGMA synchronous={self.synchronous}")
+        await connection.execute("PRAGMA busy_timeout=5000")
+        self.connections.append(connection)
+        return connection
+
+    async def open(self) -> SQLitePool:
+        # In-memory databases only exist for a single connection
+        if self.database == ":memory:":
+            self.size = 1
+        for _ in range(self.size):
+            self.available.put_nowait(await self._connect())
+        if self.database != ":memory:":
+            self.writer = SQLiteWriter(await self._connect(), max_batch_size=self.max_batch_size)
+            self.writer.start()
+        return self
+
+    async def acquire(self) -> aiosqlite.Connection:
+        return await self.available.get()
+
+    async def release(self, connection: aiosqlite.Connection) -> None:
+        if connection.in_transaction:
+            await connection.execute("ROLLBACK")
+        self.available.put_nowait(connection)
+
+    async def close(self) -> None:
+        if self.writer is not None:
+            await self.writer.close()
+        for connection in self.connections:
+            await connection.close()
+        self.connections.clear()
+
+
 class SQLiteWrapper(DriverWrapper):
 
     @staticmethod
-    async def create_pool(config: DatabaseConfig) -> None:
-        return None
+    async def create_pool(config: DatabaseConfig) -> SQLitePool:
+        pool = SQLitePool(
+            config.get("database"),
+            size=config.get("pool_size", 5),
+            synchronous=config.get("synchronous", "NORMAL"),
+            max_batch_size=config.get("max_batch_size", 100),
+        )
+        return await pool.open()
 
     @staticmethod
-    async def get_connection(dbw: typing.Type[SQLiteDatabaseWrapper]) -> SQLiteDatabaseWrapper:
-        connection = await aiosqlite.connect(dbw.config.get("database"))
-        connection.row_factory = RowWrapper
+    def get_pool_size(pool: SQLitePool) -> typing.Optional[int]:
+        return pool.size
+
+    @staticmethod
+    async def get_connection(dbw: typing.Type[SQLiteDatabaseWrapper], pool: DriverPool) -> SQLiteDatabaseWrapper:
+        connection = await pool.acquire()
         v = dbw(
             conn=connection,
+            source_pool=pool,
         )
         v.is_active = True
         return v
@@ -54,33 +235,131 @@ class SQLiteWrapper(DriverWrapper):
     @staticmethod
     async def release_connection(dbw: SQLiteDatabaseWrapper) -> None:
         assert dbw.conn
-        await dbw.conn.close()
         if dbw.cursor:
             try:
                 await dbw.cursor.close()
             except ValueError:
                 pass
             dbw.cursor = None
+        await dbw.source_pool.release(dbw.conn)
         dbw.conn = None
         dbw.is_active = False
 
     @staticmethod
-    async def fetch(dbw: SQLiteDatabaseWrapper, sql: str, *args) -> typing.List[typing.Any]:
-        if dbw.cursor:
-            try:
-                await dbw.cursor.close()
-            except ValueError:
-                pass
-            dbw.cursor = None
-        cursor: aiosqlite.Cursor = await dbw.caller.execute(sql, args)
-        await dbw.conn.commit()
-        dbw.cursor = cursor
-        return await cursor.fetchall() or list()
+    async def start_transaction(tra: SQLiteDatabaseTransaction) -> None:
+        assert tra.parent.conn
+
+        # Transactions started inside of another (ie on a borrowed connection) are savepoints
+        if tra.parent.conn.in_transaction:
+            tra._transaction = f"vbu_{id(tra)}"
+            await tra.parent.conn.execute(f"SAVEPOINT {tra._transaction}")
+            return
+        await tra.parent.conn.execute("BEGIN IMMEDIATE")
+
+    @staticmethod
+    async def commit_transaction(tra: SQLiteDatabaseTransaction) -> None:
+        assert tra.parent.conn
+        if tra._transaction:
+            await tra.parent.conn.execute(f"RELEASE SAVEPOINT {tra._transaction}")
+            return
+        await tra.parent.conn.execute("COMMIT")
+
+    @staticmethod
+    async def rollback_transaction(tra: SQLiteDatabaseTransaction) -> None:
+        assert tra.parent.conn
+        if tra._transaction:
+            await tra.parent.conn.execute(f"ROLLBACK TO SAVEPOINT {tra._transaction}")
+            await tra.parent.conn.execute(f"RELEASE SAVEPOINT {tra._transaction}")
+            return
+        await tra.parent.conn.execute("ROLLBACK")
+
+    @staticmethod
+    async def cancel_query(dbw: SQLiteDatabaseWrapper) -> None:
+        if dbw.conn:
+            await dbw.conn.interrupt()  # The query is still running in aiosqlite's thread
+
+    @staticmethod
+    def _use_writer(dbw: SQLiteDatabaseWrapper) -> bool:
+        """
+        Whether or not writes should be queued to the pool's writer rather than run
+        on the wrapper's own connection.
+        """
+
+        assert dbw.conn
+        return dbw.source_pool.writer is not None and not dbw.conn.in_transaction
+
+    @classmethod
+    async def fetch(cls, dbw: SQLiteDatabaseWrapper, sql: str, *args) -> typing.List[typing.Any]:
+        if not sql.lstrip().casefold().startswith(_READ_PREFIXES) and cls._use_writer(dbw):
+            return await dbw.source_pool.writer.write(sql, args)
+        return await cls.fetch_all(dbw, sql, *args)
+
+    @staticmethod
+    async def fetch_all(dbw: SQLiteDatabaseWrapper, sql: str, *args) -> typing.List[typing.Any]:
+        assert dbw.conn
+        async with dbw.caller.execute(sql, args) as cursor:
+            return list(await cursor.fetchall())
+
+    @staticmethod
+    async def fetch_row(dbw: SQLiteDatabaseWrapper, sql: str, *args) -> typing.Optional[typing.Any]:
+        assert dbw.conn
+        async with dbw.caller.execute(sql, args) as cursor:
+            return await cursor.fetchone()
+
+    @classmethod
+    async def execute(cls, dbw: SQLiteDatabaseWrapper, sql: str, *args) -> None:
+        if cls._use_writer(dbw):
+            await dbw.source_pool.writer.write(sql, args)
+            return
+        async with dbw.caller.execute(sql, args):
+            pass
+
+    @classmethod
+    async def executemany(cls, dbw: SQLiteDatabaseWrapper, sql: str, *args_list) -> None:
+        if cls._use_writer(dbw):
+            await dbw.source_pool.writer.write(sql, args_list, many=True)
+            return
+
+        # Run them in a transaction so that they aren't committed one by one
+        assert dbw.conn
+        if dbw.conn.in_transaction:
+            await dbw.caller.executemany(sql, args_list)
+            return
+        await dbw.conn.execute("BEGIN IMMEDIATE")
+        try:
+            await dbw.caller.executemany(sql, args_list)
+        except Exception:
+            await dbw.conn.execute("ROLLBACK")
+            raise
+        await dbw.conn.execute("COMMIT")
+
+    @classmethod
+    async def execute_script(cls, dbw: SQLiteDatabaseWrapper, sql: str) -> None:
+
+        # Trigger bodies have semicolons of their own, so join the pieces back up until they're complete
+        statement = ""
+        for piece in split_sql_statements(sql):
+            statement += piece + ";"
+            if sqlite3.complete_statement(statement):
+                await cls.execute(dbw, statement)
+                statement = ""
+            else:
+                statement += "\n"
+        if statement.strip():
+            await cls.execute(dbw, statement)
 
     @staticmethod
-    async def executemany(dbw: SQLiteDatabaseWrapper, sql: str, *args_list) -> None:
+    async def iterate(dbw: SQLiteDatabaseWrapper, sql: str, *args, chunk_size: int) -> typing.AsyncIterator[typing.List[typing.Any]]:
         assert dbw.conn
-        await dbw.caller.executemany(sql, args_list)
+        cursor: aiosqlite.Cursor = await dbw.caller.execute(sql, args)
+        try:
+            while True:
+                rows = await cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            await cursor.close()
 
     def prepare(self) -> typing.Generator[str, None, None]:
         while True:
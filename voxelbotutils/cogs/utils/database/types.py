@@ -1,8 +1,15 @@
 from __future__ import annotations
 
+import asyncio
+import csv
+import functools
+import inspect
+import io
+import os
 import typing
 
 from .model import DatabaseTransaction
+from .migrations import split_sql_statements
 
 if typing.TYPE_CHECKING:
     from .model import DatabaseWrapper
@@ -34,6 +41,34 @@ class DriverExecuteConnection(typing.Protocol):
 
 
 DriverConnection = typing.Union[DriverFetchConnection, DriverExecuteConnection]
+CopyOutput = typing.Union[str, os.PathLike, typing.BinaryIO, typing.Callable[[bytes], typing.Awaitable[None]]]
+
+
+def _release_unused(pool: DriverPool, acquiring: asyncio.Future) -> None:
+    """
+    Give back a connection that was acquired after we stopped waiting for it.
+    """
+
+    if acquiring.cancelled() or acquiring.exception() is not None:
+        return
+    released = pool.release(acquiring.result())
+    if inspect.isawaitable(released):
+        asyncio.ensure_future(released)
+
+
+def _get_copy_writer(output: CopyOutput) -> typing.Tuple[typing.Callable[[bytes], typing.Awaitable[None]], typing.Callable[[], None]]:
+    """
+    Get a coroutine function that writes data to the given copy output, and
+    a function that closes anything that was opened for it.
+    """
+
+    loop = asyncio.get_running_loop()
+    if isinstance(output, (str, os.PathLike)):
+        file = open(output, "wb")
+        return (lambda data: loop.run_in_executor(None, file.write, data)), file.close
+    if hasattr(output, "write"):
+        return (lambda data: loop.run_in_executor(None, output.write, data)), lambda: None  # type: ignore
+    return output, lambda: None  # type: ignore
 
 
 class DriverPool(typing.Protocol):
@@ -50,21 +85,52 @@ class DriverPool(typing.Protocol):
 
 class DriverWrapper(typing.Protocol):
 
+    statement_cache_hits: typing.ClassVar[int] = 0
+    statement_cache_misses: typing.ClassVar[int] = 0
+    supports_notifications: typing.ClassVar[bool] = False
+
     @staticmethod
     async def create_pool(config: DatabaseConfig) -> DriverPool:
         """Connect to your database driver using the given config."""
         raise NotImplementedError()
 
     @staticmethod
-    async def get_connection(dbw: typing.Type[DatabaseWrapper]) -> DatabaseWrapper:
-        """Get a connection from the database pool and return a wrapper around the given connection."""
+    def get_pool_size(pool: DriverPool) -> typing.Optional[int]:
+        """Get the number of connections that the given pool has open, or None if it isn't known."""
+        return None
+
+    @staticmethod
+    async def get_connection(dbw: typing.Type[DatabaseWrapper], pool: DriverPool) -> DatabaseWrapper:
+        """Get a connection from the given pool and return a wrapper around the given connection."""
         raise NotImplementedError()
 
+    @staticmethod
+    async def acquire(pool: DriverPool, timeout: typing.Optional[float]) -> DriverConnection:
+        """Acquire a connection from the given pool, raising asyncio.TimeoutError if none is free within the timeout."""
+
+        if timeout is None:
+            return await pool.acquire()
+
+        # The acquire is shielded so that a connection which arrives as we time out
+        # (or are cancelled) is given back rather than being lost from the pool
+        acquiring = asyncio.ensure_future(pool.acquire())
+        try:
+            return await asyncio.wait_for(asyncio.shield(acquiring), timeout=timeout)
+        except BaseException:
+            acquiring.cancel()
+            acquiring.add_done_callback(functools.partial(_release_unused, pool))
+            raise
+
     @staticmethod
     async def release_connection(dbw: DatabaseWrapper) -> None:
-        """Release the connection back into the pool."""
+        """Release the connection back into the pool it came from."""
         raise NotImplementedError()
 
+    @staticmethod
+    async def get_replication_lag(dbw: DatabaseWrapper) -> typing.Optional[float]:
+        """Get how many seconds the connected replica is behind its primary, or None if it isn't known."""
+        return None
+
     @classmethod
     def transaction(cls: typing.Type[DriverWrapper], dbw: DatabaseWrapper, *, commit_on_exit: bool = True):
         """Make a transaction instance with the connection's current instance."""
@@ -90,7 +156,123 @@ class DriverWrapper(typing.Protocol):
         """Run some SQL in your database."""
         raise NotImplementedError()
 
+    @staticmethod
+    async def fetch_all(dbw: DatabaseWrapper, sql: str, *args: typing.Any) -> typing.List[typing.Any]:
+        """Run some SQL in your database, returning every row."""
+        raise NotImplementedError()
+
+    @staticmethod
+    async def fetch_row(dbw: DatabaseWrapper, sql: str, *args: typing.Any) -> typing.Optional[typing.Any]:
+        """Run some SQL in your database, returning the first row."""
+        raise NotImplementedError()
+
+    @staticmethod
+    async def execute(dbw: DatabaseWrapper, sql: str, *args: typing.Any) -> None:
+        """Run some SQL in your database without returning anything."""
+        raise NotImplementedError()
+
     @staticmethod
     async def executemany(dbw: DatabaseWrapper, sql: str, *args_list: typing.Iterable[typing.Any]) -> None:
         """Run some SQL in your database."""
         raise NotImplementedError()
+
+    @classmethod
+    async def execute_script(cls, dbw: DatabaseWrapper, sql: str) -> None:
+        """Run a script of multiple SQL statements in your database."""
+        for statement in split_sql_statements(sql):
+            await cls.execute(dbw, statement)
+
+    @staticmethod
+    async def cancel_query(dbw: DatabaseWrapper) -> None:
+        """Stop the database running a query whose task was cancelled."""
+        return None
+
+    @staticmethod
+    async def acquire_migration_lock(dbw: DatabaseWrapper) -> None:
+        """Wait until the connection is the only one running migrations."""
+        return None
+
+    @staticmethod
+    async def release_migration_lock(dbw: DatabaseWrapper) -> None:
+        """Let other connections run migrations again."""
+        return None
+
+    @staticmethod
+    async def connect_listener(config: DatabaseConfig) -> typing.Any:
+        """Open a connection outside of the pool for listening to notifications on."""
+        raise NotImplementedError()
+
+    @staticmethod
+    async def add_notification_listener(connection: typing.Any, channel: str, callback: typing.Callable[..., None]) -> None:
+        """Start listening for notifications sent to the given channel."""
+        raise NotImplementedError()
+
+    @staticmethod
+    async def remove_notification_listener(connection: typing.Any, channel: str, callback: typing.Callable[..., None]) -> None:
+        """Stop listening for notifications sent to the given channel."""
+        raise NotImplementedError()
+
+    @classmethod
+    def reset_statement_cache_stats(cls) -> typing.Dict[str, int]:
+        """Reset the prepared statement cache counters, returning their values before being reset."""
+        stats = {"hits": cls.statement_cache_hits, "misses": cls.statement_cache_misses}
+        cls.statement_cache_hits = cls.statement_cache_misses = 0
+        return stats
+
+    @staticmethod
+    def iterate(dbw: DatabaseWrapper, sql: str, *args: typing.Any, chunk_size: int) -> typing.AsyncIterator[typing.List[typing.Any]]:
+        """Run some SQL in your database, yielding the returned rows in lists of at most the given size."""
+        raise NotImplementedError()
+
+    @classmethod
+    async def copy_records(cls, dbw: DatabaseWrapper, table_name: str, columns: typing.Sequence[str], records: typing.List[typing.Sequence[typing.Any]]) -> None:
+        """Insert a chunk of records into the given table."""
+        prep = cls().prepare()
+        sql = "INSERT INTO {0} ({1}) VALUES ({2})".format(
+            table_name,
+            ", ".join(columns),
+            ", ".join(next(prep) for _ in columns),
+        )
+        await cls.executemany(dbw, sql, *records)
+
+    @classmethod
+    async def copy_from_query(
+            cls, dbw: DatabaseWrapper, sql: str, *args: typing.Any,
+            output: CopyOutput, header: bool, chunk_size: int) -> int:
+        """Run some SQL in your database, writing the returned rows to the given output as CSV."""
+        write, close = _get_copy_writer(output)
+        total = 0
+        try:
+            async for rows in cls.iterate(dbw, sql, *args, chunk_size=chunk_size):
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                if header and total == 0:
+                    writer.writerow(rows[0].keys())
+                writer.writerows(list(i.values()) for i in rows)
+                await write(buffer.getvalue().encode())
+                total += len(rows)
+        finally:
+            close()
+        return total
+
+    def prepare(self) -> typing.Generator[str, None, None]:
+        """Get a generator of the argument placeholders for the driver."""
+        raise NotImplementedError()
+
+    @classmethod
+    def get_any_sql(cls, column: str, values: typing.Sequence[typing.Any]) -> typing.Tuple[str, typing.List[typing.Any]]:
+        """Get a condition matching rows whose column is any of the given values, and the arguments for it."""
+        prep = cls().prepare()
+        return "{0} IN ({1})".format(column, ", ".join(next(prep) for _ in values)), list(values)
+
+    @classmethod
+    def get_upsert_sql(cls, table_name: str, keys: typing.Sequence[str], columns: typing.Sequence[str]) -> str:
+        """Get the SQL for inserting a row, updating the given columns if the keys already exist."""
+        prep = cls().prepare()
+        return "INSERT INTO {0} ({1}) VALUES ({2}) ON CONFLICT ({3}) DO UPDATE SET {4}".format(
+            table_name,
+            ", ".join((*keys, *columns)),
+            ", ".join(next(prep) for _ in (*keys, *columns)),
+            ", ".join(keys),
+            ", ".join(f"{i}=excluded.{i}" for i in columns),
+        )
@@ -0,0 +1,247 @@
+from __future__ import annotations
+
+import asyncio
+import collections
+import logging
+import time
+import typing
+
+from ..deadline import clear_deadline
+from ..statsd import StatsdConnection
+
+if typing.TYPE_CHECKING:
+    from .model import DatabaseWrapper
+
+
+_UpsertKey = typing.Tuple[str, typing.Tuple[typing.Tuple[str, typing.Any], ...]]
+
+
+class DeadLetter(typing.NamedTuple):
+    """
+    A queued write that failed too many times and was dropped.
+
+    :meta private:
+    """
+
+    table_name: str
+    keys: typing.Dict[str, typing.Any]
+    values: typing.Dict[str, typing.Any]
+    error: str
+
+
+class WriteBehindQueue(object):
+    """
+    A queue of upserts that are held for a short time so that multiple writes
+    to the same row can be merged, and then written to the database in batches.
+
+    Parameters
+    -----------
+    database: Type[:class:`DatabaseWrapper`]
+        The database class that the writes should be made with.
+    delay: :class:`float`
+        How many seconds to wait after a write is queued before flushing the queue.
+    max_size: :class:`int`
+        The number of queued rows that causes the queue to be flushed immediately.
+    max_retries: :class:`int`
+        The number of times a row can fail to be written before it's dropped and
+        added to :attr:`dead_letters`.
+
+    Attributes
+    -----------
+    dead_letters: Deque[:class:`DeadLetter`]
+        The most recent rows that were dropped after failing to be written.
+    """
+
+    logger: logging.Logger = logging.getLogger("vbu.database.write_behind")
+
+    def __init__(
+            self,
+            database: typing.Type[DatabaseWrapper],
+            *,
+            delay: float = 0.5,
+            max_size: int = 500,
+            max_retries: int = 3):
+        self.database = database
+        self.delay = delay
+        self.max_size = max_size
+        self.max_retries = max_retries
+        self.pending: typing.Dict[_UpsertKey, typing.Dict[str, typing.Any]] = dict()
+        self.attempts: typing.Dict[_UpsertKey, int] = dict()
+        self.dead_letters: typing.Deque[DeadLetter] = collections.deque(maxlen=max_size)
+        self._flush_task: typing.Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+
+    def __len__(self) -> int:
+        return len(self.pending)
+
+    def add(self, table_name: str, keys: typing.Dict[str, typing.Any], values: typing.Dict[str, typing.Any]) -> None:
+        """
+        Queue an upsert, merging it with any write to the same row that's
+        already waiting to be flushed.
+
+        Parameters
+        -----------
+        table_name: :class:`str`
+            The table to write to.
+        keys: Dict[:class:`str`, Any]
+            The primary key columns of the row and their values.
+        values: Dict[:class:`str`, Any]
+            The columns that should be set and their values.
+        """
+
+        queue_key = (table_name, tuple(keys.items()))
+        self.pending.setdefault(queue_key, dict()).update(values)
+        if len(self.pending) >= self.max_size:
+            self._schedule_flush(0)
+        else:
+            self._schedule_flush(self.delay)
+
+    async def discard(self, table_name: str, keys: typing.Dict[str, typing.Any]) -> None:
+        """
+        Drop a queued write to a row, waiting for any flush that's running to finish
+        so that the row isn't written after this returns. This should be used before
+        deleting a row that may have been queued.
+
+        Parameters
+        -----------
+        table_name: :class:`str`
+            The table that the row is in.
+        keys: Dict[:class:`str`, Any]
+            The primary key columns of the row and their values, in the same order
+            that they were given to :func:`add`.
+        """
+
+        queue_key = (table_name, tuple(keys.items()))
+        self.pending.pop(queue_key, None)
+        async with self._flush_lock:
+            self.pending.pop(queue_key, None)  # In case the flush put it back
+            self.attempts.pop(queue_key, None)
+
+    def _schedule_flush(self, delay: float) -> None:
+        task = self._flush_task
+        if delay > 0 and task is not None and not task.done() and task is not asyncio.current_task():
+            return
+        self._flush_task = asyncio.get_running_loop().create_task(self._delayed_flush(delay))
+
+    async def _delayed_flush(self, delay: float) -> None:
+        clear_deadline()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        await self.flush()
+
+        # Anything that was queued during the flush (or put back after failing) needs
+        # another go, as nothing else will schedule it while we're running
+        if self.pending:
+            self._schedule_flush(self.delay)
+
+    def _requeue(self, failed: typing.Dict[_UpsertKey, typing.Dict[str, typing.Any]]) -> None:
+        """
+        Put writes that failed back into the queue, under any writes to the same row
+        that have been queued since, so that they're tried again on the next flush.
+        """
+
+        for queue_key, values in failed.items():
+            newer = self.pending.get(queue_key)
+            if newer is not None:
+                values.update(newer)
+            self.pending[queue_key] = values
+
+    async def _write_rows(
+            self,
+            db: DatabaseWrapper,
+            sql: str,
+            rows: typing.Dict[_UpsertKey, typing.List[typing.Any]],
+            written: typing.Set[_UpsertKey],
+            dropped: typing.Set[_UpsertKey],
+            pending: typing.Dict[_UpsertKey, typing.Dict[str, typing.Any]]) -> None:
+        """
+        Write the rows of a batch that failed one at a time, so that a bad row doesn't
+        stop the rest of its batch from being written. Rows that have failed
+        :attr:`max_retries` times are dropped.
+        """
+
+        for queue_key, row in rows.items():
+            try:
+                await db.execute(sql, *row)
+            except Exception as e:
+                attempts = self.attempts[queue_key] = self.attempts.get(queue_key, 0) + 1
+                if attempts < self.max_retries:
+                    continue
+                table_name, keys = queue_key
+                self.attempts.pop(queue_key)
+                self.dead_letters.append(DeadLetter(table_name, dict(keys), pending[queue_key], str(e)))
+                dropped.add(queue_key)
+                self.logger.error(f"Dropping queued write to {table_name} {dict(keys)} after {attempts} failed attempts - {e}")
+                continue
+            written.add(queue_key)
+            self.attempts.pop(queue_key, None)
+
+    async def flush(self) -> None:
+        """
+        Write everything in the queue to the database. Rows with the same table,
+        primary key columns, and set columns are written in a single ``executemany``,
+        with rows in partitioned tables being written to the partition for their guild.
+        If a batch fails then its rows are written one at a time; rows that fail are
+        put back into the queue to be retried on the next flush, and dropped once
+        they've failed :attr:`max_retries` times. Batches that can't be written at all
+        (eg when a connection can't be acquired) are put back without counting as
+        an attempt.
+        """
+
+        async with self._flush_lock:
+            if not self.pending:
+                return
+            pending, self.pending = self.pending, dict()
+
+            # Group our writes so they can be done together
+            partitions: typing.Dict[typing.Optional[str], typing.Dict[tuple, typing.Dict[_UpsertKey, typing.List[typing.Any]]]] = dict()
+            for queue_key, values in pending.items():
+                table_name, keys = queue_key
+                partition = self.database.get_partition(table_name, dict(keys).get("guild_id"))
+                key_names = tuple(i for i, _ in keys)
+                value_names = tuple(values.keys())
+                batches = partitions.setdefault(partition, collections.defaultdict(dict))
+                batches[(table_name, key_names, value_names)][queue_key] = [
+                    *(o for _, o in keys),
+                    *values.values(),
+                ]
+            batch_count = sum(len(i) for i in partitions.values())
+
+            # And write them, putting back anything that didn't get written
+            written: typing.Set[_UpsertKey] = set()
+            dropped: typing.Set[_UpsertKey] = set()
+            start = time.perf_counter()
+            try:
+                for partition, batches in partitions.items():
+                    try:
+                        async with self.database(partition=partition) as db:
+                            for batch_key, rows in batches.items():
+                                sql = self.database.driver.get_upsert_sql(*batch_key)
+                                try:
+                                    await db.executemany(sql, *rows.values())
+                                except Exception as e:
+                                    self.logger.warning(f"Failed to write {len(rows)} queued rows to {batch_key[0]}, writing them one at a time - {e}")
+                                    await self._write_rows(db, sql, rows, written, dropped, pending)
+                                    continue
+                                written.update(rows)
+                                if self.attempts:
+                                    for i in rows:
+                                        self.attempts.pop(i, None)
+                    except Exception as e:
+                        unwritten = sum(1 for rows in batches.values() for i in rows if i not in written and i not in dropped)
+                        self.logger.error(f"Failed to write {unwritten} queued rows to the {partition or 'main'} database, retrying on next flush - {e}", exc_info=True)
+            finally:
+                failed = {i: o for i, o in pending.items() if i not in written and i not in dropped}
+                self._requeue(failed)
+            elapsed = (time.perf_counter() - start) * 1_000
+
+        # Log our metrics
+        self.logger.debug(f"Flushed {len(written)} queued rows in {batch_count} batches ({elapsed:.2f}ms)")
+        async with StatsdConnection() as stats:
+            stats.timing("vbu.database.write_behind.flush", value=elapsed)
+            stats.gauge("vbu.database.write_behind.queue_depth", value=len(pending))
+            stats.increment("vbu.database.write_behind.batches", value=batch_count)
+            if failed:
+                stats.increment("vbu.database.write_behind.failures", value=len(failed))
+            if dropped:
+                stats.increment("vbu.database.write_behind.dropped", value=len(dropped))
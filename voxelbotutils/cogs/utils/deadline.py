@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import contextvars
+import time
+import typing
+
+from discord.ext import commands
+
+
+T = typing.TypeVar("T")
+
+# The time.monotonic() time by which the current command should be done
+_current_deadline: contextvars.ContextVar[typing.Optional[float]] = contextvars.ContextVar(
+    "vbu_deadline",
+    default=None,
+)
+
+
+class DeadlineExceeded(commands.CommandError):
+    """
+    Raised when a database query, Redis command, or web request made via :attr:`Bot.session`
+    is still running when the command that made it reaches its :attr:`deadline<BotConfig.command_deadline>`.
+    The call is cancelled rather than being left to hold its connection.
+
+    Attributes
+    -----------
+    timeout: :class:`float`
+        The number of seconds that the call was given before it was cancelled.
+    """
+
+    def __init__(self, timeout: float):
+        self.timeout = timeout
+        super().__init__("Cancelled a call that was still running at the command's deadline.")
+
+
+def get_deadline() -> typing.Optional[float]:
+    """
+    Get the :func:`time.monotonic` time by which the current command should be done,
+    or ``None`` if it doesn't have a deadline.
+    """
+
+    return _current_deadline.get()
+
+
+def time_remaining() -> typing.Optional[float]:
+    """
+    Get the number of seconds until the current command's deadline (which can be negative
+    if it's passed), or ``None`` if it doesn't have a deadline.
+    """
+
+    deadline = _current_deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+@contextlib.contextmanager
+def deadline(at: typing.Optional[float]) -> typing.Iterator[None]:
+    """
+    Set the deadline for everything run inside of the block. A deadline that's already
+    set is only ever brought forward, never pushed back.
+
+    Examples
+    ---------
+    >>> with vbu.deadline(time.monotonic() + 2):
+    ...     rows = await db("SELECT * FROM very_large_table")
+
+    Parameters
+    -----------
+    at: Optional[:class:`float`]
+        The :func:`time.monotonic` time that everything should be done by. If ``None``,
+        the current deadline is left as it is.
+    """
+
+    current = _current_deadline.get()
+    if at is None or (current is not None and current <= at):
+        yield
+        return
+    token = _current_deadline.set(at)
+    try:
+        yield
+    finally:
+        _current_deadline.reset(token)
+
+
+def clear_deadline() -> None:
+    """
+    Remove the deadline from the current task. Tasks copy the deadline of whatever
+    started them, so this is used by background tasks that are shared between commands
+    and shouldn't be cancelled by the deadline of whichever command happened to start them.
+    It's also used once a command has responded, since after that it can take as long as
+    it needs (eg waiting for the user to answer a prompt).
+
+    :meta private:
+    """
+
+    _current_deadline.set(None)
+
+
+async def wait_with_deadline(awaitable: typing.Awaitable[T], *, timeout: typing.Optional[float] = None) -> T:
+    """
+    Wait for something to finish, cancelling it and raising :class:`DeadlineExceeded` if
+    the current deadline passes first. If a timeout is given and ends before the deadline,
+    :class:`asyncio.TimeoutError` is raised as with :func:`asyncio.wait_for`.
+
+    :meta private:
+    """
+
+    remaining = time_remaining()
+    if remaining is None or (timeout is not None and timeout < remaining):
+        if timeout is None:
+            return await awaitable
+        return await asyncio.wait_for(awaitable, timeout=timeout)
+    if remaining <= 0:
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()  # Don't leave it unawaited
+        raise DeadlineExceeded(0)
+    try:
+        return await asyncio.wait_for(awaitable, timeout=remaining)
+    except asyncio.TimeoutError:
+        if time_remaining() > 0:  # type: ignore
+            raise  # Something inside timed out by itself
+        raise DeadlineExceeded(remaining) from None
@@ -8,3 +8,5 @@ from .checks.is_upgrade_chat_subscriber import IsNotUpgradeChatSubscriber, IsNot
 from .missing_required_argument import MissingRequiredArgumentString
 from .time_value import InvalidTimeDuration
 from .menus.errors import ConverterFailure, ConverterTimeout
+from .database.pool import DatabasePoolTimeout
+from .deadline import DeadlineExceeded
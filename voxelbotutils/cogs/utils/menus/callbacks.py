@@ -48,9 +48,15 @@ class MenuCallbacks(object):
         """
         Returns a wrapper that updates the guild settings table for the bot's database.
 
+        The value is written with :func:`voxelbotutils.DatabaseWrapper.queue_upsert`, so the table
+        needs a primary key or unique index on its ``guild_id`` or ``user_id`` column for the
+        ``ON CONFLICT``/``ON DUPLICATE KEY`` to use. If the write queue is enabled, the write happens
+        after the command has finished, so a table without one only fails (and is logged) then.
+
         Args:
             data_location (voxelbotutils.menus.DataLocation): The location of the content to be stored.
-            table_name (str): The name of the table that you want to store the data in.
+            table_name (str): The name of the table that you want to store the data in. This needs a
+                unique constraint on the ``guild_id`` or ``user_id`` column.
             column_name (str): The name of the column that should be set.
 
         Returns:
@@ -60,29 +66,18 @@ class MenuCallbacks(object):
         """
 
         async def wrapper(ctx, data: list):
-            prep = ctx.bot.database.driver().prepare()
-            insert_sql = f"""INSERT INTO {{0}} ({{1}}, {{2}}) VALUES ({next(prep)}, {next(prep)})"""
-            prep = ctx.bot.database.driver().prepare()
-            conflict_sql = f"""UPDATE {{0}} SET {{2}}={next(prep)} WHERE {{1}}={next(prep)}"""
-            args = (
+            primary_key = "guild_id" if data_location == DataLocation.GUILD else "user_id" if data_location == DataLocation.USER else None
+            key = ctx.guild.id if data_location == DataLocation.GUILD else ctx.author.id if data_location == DataLocation.USER else None
+            data = [i.id if cls._is_discord_object(i) else i for i in data]
+            await ctx.bot.database.queue_upsert(
                 table_name,
-                "guild_id" if data_location == DataLocation.GUILD else "user_id" if data_location == DataLocation.USER else None,
-                column_name
+                {primary_key: key},
+                {column_name: data[0]},
             )
-            data = [i.id if cls._is_discord_object(i) else i for i in data]
-            async with ctx.bot.database() as db:
-                try:
-                    await db(
-                        insert_sql.format(*args),
-                        ctx.guild.id if data_location == DataLocation.GUILD else ctx.author.id if data_location == DataLocation.USER else None,
-                        *data,
-                    )
-                except Exception:  # Hopefully it's a unique violation error
-                    await db(
-                        conflict_sql.format(*args),
-                        *data,
-                        ctx.guild.id if data_location == DataLocation.GUILD else ctx.author.id if data_location == DataLocation.USER else None,
-                    )
+
+            # Let the other processes know
+            if table_name in ("guild_settings", "user_settings") and len(data) == 1:
+                await ctx.bot.publish_settings_update(table_name, key, column_name, data[0])
 
         return wrapper
 
@@ -160,6 +160,7 @@ class Menu(MenuDisplayable):
                 name=name,
                 aliases=aliases,
                 application_command_meta=command_kwargs.pop("application_command_meta", meta),
+                deadline=command_kwargs.pop("deadline", 0),  # Menus wait for the user, so they can't have a deadline
                 **command_kwargs,
             )
             @commands.defer()
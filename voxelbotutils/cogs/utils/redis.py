@@ -4,10 +4,13 @@ import logging
 import typing
 import asyncio
 import json
+import uuid
 
 import aioredis
 import aioredlock
 
+from .deadline import wait_with_deadline
+
 
 class RedisConnection(object):
     """
@@ -35,6 +38,10 @@ class RedisConnection(object):
     logger: logging.Logger = logging.getLogger("vbu.redis")
     lock_manager: aioredlock.Aioredlock = None
     enabled: bool = False
+    settings_channel: str = "VBUSettingsUpdate"
+    query_cache_channel: str = "VBUQueryCacheInvalidate"
+    cache_channel: str = "VBUCacheInvalidate"
+    instance_id: str = uuid.uuid4().hex
 
     def __init__(self, connection: aioredis.RedisConnection = None):
         """:meta private:"""
@@ -103,7 +110,7 @@ class RedisConnection(object):
         """
 
         self.logger.debug(f"Publishing JSON to channel {channel}: {json!s}")
-        return await self.conn.publish_json(channel, json)
+        return await wait_with_deadline(self.conn.publish_json(channel, json))
 
     async def publish_str(self, channel: str, message: str) -> None:
         """
@@ -115,19 +122,99 @@ class RedisConnection(object):
         """
 
         self.logger.debug(f"Publishing message to channel {channel}: {message}")
-        return await self.conn.publish(channel, message)
+        return await wait_with_deadline(self.conn.publish(channel, message))
+
+    async def publish_settings_update(self, table: str, key: int, column: str, value: typing.Any) -> None:
+        """
+        Publishes a change to one of the bot's cached settings to the :attr:`settings_channel`,
+        so that every other process connected to the same Redis instance can apply the same
+        change to their cache. Values that can't be serialized into JSON are not published.
 
-    async def set(self, key: str, value: str) -> None:
+        Args:
+            table (str): The name of the cached table that was changed (eg ``guild_settings``).
+            key (int): The primary key of the row that was changed.
+            column (str): The name of the column that was changed.
+            value (typing.Any): The new value of the column.
+        """
+
+        try:
+            payload = json.dumps({
+                "table": table,
+                "key": key,
+                "column": column,
+                "value": value,
+                "origin": self.instance_id,
+            })
+        except TypeError:
+            self.logger.warning(f"Couldn't publish settings update for {table}.{column} - value is not JSON serializable")
+            return
+        self.logger.debug(f"Publishing settings update to channel {self.settings_channel}: {payload}")
+        return await wait_with_deadline(self.conn.publish(self.settings_channel, payload))
+
+    async def publish_query_cache_invalidation(self, tags: typing.List[str]) -> None:
+        """
+        Publishes the tags of some invalidated :attr:`DatabaseWrapper.query_cache` results to the
+        :attr:`query_cache_channel`, so that every other process connected to the same Redis
+        instance can drop the same results from their cache.
+
+        Args:
+            tags (typing.List[str]): The tags (usually table names) that were invalidated.
+        """
+
+        payload = json.dumps({
+            "tags": tags,
+            "origin": self.instance_id,
+        })
+        self.logger.debug(f"Publishing query cache invalidation to channel {self.query_cache_channel}: {payload}")
+        return await wait_with_deadline(self.conn.publish(self.query_cache_channel, payload))
+
+    async def publish_cache_invalidation(self, name: str, keys: typing.List[str]) -> None:
+        """
+        Publishes the keys of some invalidated :class:`voxelbotutils.CachedFunction` results to the
+        :attr:`cache_channel`, so that every other process connected to the same Redis
+        instance can drop the same results from their in-process cache.
+
+        Args:
+            name (str): The name of the cached function.
+            keys (typing.List[str]): The cache keys that were invalidated.
+        """
+
+        payload = json.dumps({
+            "name": name,
+            "keys": keys,
+            "origin": self.instance_id,
+        })
+        self.logger.debug(f"Publishing cache invalidation to channel {self.cache_channel}: {payload}")
+        return await wait_with_deadline(self.conn.publish(self.cache_channel, payload))
+
+    async def set(self, key: str, value: str, *, expire: int = 0, pexpire: int = 0) -> None:
         """
         Sets a key/value pair in the redis DB.
 
         Args:
             key (str): The key you want to set the value of
             value (str): The data you want to set the key to
+            expire (int, optional): The number of seconds after which the key should
+                be removed. If ``0``, the key never expires.
+            pexpire (int, optional): The number of milliseconds after which the key should
+                be removed, used instead of ``expire`` if given.
         """
 
         self.logger.debug(f"Setting Redis key:value pair with {key}:{value}")
-        return await self.conn.set(key, value)
+        return await wait_with_deadline(self.conn.set(key, value, expire=expire, pexpire=pexpire))
+
+    async def delete(self, *keys: str) -> None:
+        """
+        Removes keys from the redis DB.
+
+        Args:
+            keys (str): The keys you want to remove.
+        """
+
+        if not keys:
+            return
+        self.logger.debug(f"Deleting Redis keys {keys}")
+        return await wait_with_deadline(self.conn.delete(*keys))
 
     async def get(self, key: str) -> str:
         """
@@ -140,7 +227,7 @@ class RedisConnection(object):
             str: The key from the database.
         """
 
-        v = await self.conn.get(key)
+        v = await wait_with_deadline(self.conn.get(key))
         self.logger.debug(f"Getting Redis from key with {key}")
         if v:
             return v.decode()
@@ -159,7 +246,7 @@ class RedisConnection(object):
 
         if not keys:
             return []
-        v = await self.conn.mget(keys)
+        v = await wait_with_deadline(self.conn.mget(keys))
         self.logger.debug(f"Getting Redis from keys with {keys}")
         if v:
             return [i.decode() for i in v]
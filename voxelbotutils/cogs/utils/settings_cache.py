@@ -0,0 +1,632 @@
+from __future__ import annotations
+
+import asyncio
+import collections
+import collections.abc
+import copy
+import logging
+import time
+import typing
+import weakref
+
+from .database import DatabaseWrapper
+
+
+_MUTABLE_TYPES = (list, dict, set)
+
+
+def _create_tracked_type(base: type, methods: typing.Iterable[str]) -> type:
+    """
+    Create a subclass of a mutable type which attaches the :class:`SettingsRow` that it
+    was given out by as soon as any of the given methods change it in-place. Instances
+    pickle as their base type, so that snapshots don't keep hold of the row.
+
+    :meta private:
+    """
+
+    def make_method(name: str) -> typing.Callable[..., typing.Any]:
+        original = getattr(base, name)
+
+        def method(self, *args, **kwargs):
+            result = original(self, *args, **kwargs)
+            row, self._row = self._row, None
+            if row is not None:
+                row._attach()
+            return result
+        method.__name__ = name
+        return method
+
+    namespace: typing.Dict[str, typing.Any] = {
+        "__slots__": ("_row",),
+        "__reduce__": lambda self: (base, (base(self),)),
+    }
+    namespace.update({i: make_method(i) for i in methods})
+    return type(f"Tracked{base.__name__.title()}", (base,), namespace)
+
+
+_TRACKED_TYPES: typing.Dict[type, type] = {
+    list: _create_tracked_type(list, (
+        "__setitem__", "__delitem__", "__iadd__", "__imul__", "append", "extend",
+        "insert", "pop", "remove", "clear", "sort", "reverse",
+    )),
+    dict: _create_tracked_type(dict, (
+        "__setitem__", "__delitem__", "__ior__", "pop", "popitem", "clear",
+        "update", "setdefault",
+    )),
+    set: _create_tracked_type(set, (
+        "__ior__", "__iand__", "__isub__", "__ixor__", "add", "discard", "remove",
+        "pop", "clear", "update", "difference_update", "intersection_update",
+        "symmetric_difference_update",
+    )),
+}
+
+
+class SettingsRow(collections.abc.MutableMapping):
+    """
+    A single row of settings, acting as a dictionary. Rows are created via
+    :func:`create_row_class` so that each of the table's columns is stored in a slot
+    rather than in a per-row dictionary. Columns that haven't been set fall through
+    to the (shared) default settings without being copied, and any keys that aren't
+    columns of the table are kept in a small dictionary that's only made when
+    it's first needed.
+
+    Rows that were made for a key that isn't stored in their cache are *detached*,
+    and only add themselves to the cache when they're first written to - either by
+    setting a column, or by changing a list, dict, or set default in-place. If another
+    row was stored for the key in the meantime, the detached row's values are merged
+    into that row instead, and any reads and writes are passed through to it.
+
+    :meta private:
+    """
+
+    __slots__ = ("_store", "_key", "_extra", "__weakref__")
+    _defaults: typing.ClassVar[dict] = {}
+    _slot_names: typing.ClassVar[typing.Dict[str, str]] = {}
+
+    def __init__(self, store: typing.Optional[SettingsStore] = None, key: typing.Optional[int] = None):
+        self._store = store
+        self._key = key
+        self._extra: typing.Optional[dict] = None
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__} {dict(self.items())!r}>"
+
+    def _resolve(self) -> SettingsRow:
+        """
+        Get the row that reads and writes should go to - the row stored in the cache
+        for our key if a detached row has been superseded, or otherwise this row.
+        """
+
+        if self._store is None:
+            return self
+        stored = dict.get(self._store, self._key)
+        if stored is None or stored is self:
+            return self
+        return stored
+
+    def _attach(self) -> None:
+        """
+        Add the row to its cache if it isn't already there. If a different row has been
+        stored for our key since we were made, our values are merged into that row.
+        """
+
+        if self._store is None:
+            return
+        store = self._store
+        stored = store.setdefault(self._key, self)
+        if stored is self:
+            self._store = None
+        else:
+            for column, value in self._get_own_items().items():
+                stored[column] = value
+        store._release(self._key)
+
+    def __getitem__(self, key: str) -> typing.Any:
+        target = self._resolve()
+        if target is not self:
+            return target[key]
+        slot_name = self._slot_names.get(key)
+        if slot_name is not None:
+            try:
+                return getattr(self, slot_name)
+            except AttributeError:
+                pass
+        elif self._extra is not None and key in self._extra:
+            return self._extra[key]
+        value = self._defaults[key]
+
+        # Mutable defaults are copied so that they can be changed safely. The copy
+        # is kept on the row without attaching it - if the row is detached then the
+        # copy attaches it when it's changed in-place, and otherwise nothing keeps
+        # hold of the row
+        if isinstance(value, _MUTABLE_TYPES):
+            value = copy.deepcopy(value)
+            tracked_type = _TRACKED_TYPES.get(type(value)) if self._store is not None else None
+            if tracked_type is not None:
+                value = tracked_type(value)
+                value._row = self
+            self._set_value(key, value)
+        return value
+
+    def _set_value(self, key: str, value: typing.Any) -> None:
+        slot_name = self._slot_names.get(key)
+        if slot_name is not None:
+            setattr(self, slot_name, value)
+        else:
+            if self._extra is None:
+                self._extra = dict()
+            self._extra[key] = value
+
+    def __setitem__(self, key: str, value: typing.Any) -> None:
+        target = self._resolve()
+        if target is not self:
+            target[key] = value
+            return
+        self._set_value(key, value)
+        self._attach()
+
+    def __delitem__(self, key: str) -> None:
+        target = self._resolve()
+        if target is not self:
+            del target[key]
+            return
+        slot_name = self._slot_names.get(key)
+        if slot_name is not None:
+            try:
+                delattr(self, slot_name)
+            except AttributeError:
+                raise KeyError(key)
+        elif self._extra is not None and key in self._extra:
+            del self._extra[key]
+        else:
+            raise KeyError(key)
+
+    def __iter__(self) -> typing.Iterator[str]:
+        target = self._resolve()
+        if target is not self:
+            yield from target
+            return
+        seen = set()
+        for key in self._defaults:
+            seen.add(key)
+            yield key
+        for key, slot_name in self._slot_names.items():
+            if key not in seen and hasattr(self, slot_name):
+                seen.add(key)
+                yield key
+        for key in list(self._extra or ()):
+            if key not in seen:
+                yield key
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __contains__(self, key: object) -> bool:
+        if key in self._defaults:
+            return True
+        target = self._resolve()
+        if target is not self:
+            return key in target
+        slot_name = self._slot_names.get(key)  # type: ignore
+        if slot_name is not None:
+            return hasattr(self, slot_name)
+        return self._extra is not None and key in self._extra
+
+    def copy(self) -> dict:
+        """
+        Get the row as a plain dictionary.
+        """
+
+        return dict(self.items())
+
+    def get_set_items(self) -> dict:
+        """
+        Get a dictionary of only the values that have been set on the row, without
+        any of the defaults that it falls back to.
+        """
+
+        target = self._resolve()
+        if target is not self:
+            return target.get_set_items()
+        return self._get_own_items()
+
+    def _get_own_items(self) -> dict:
+        """
+        Get the values set on this row itself, even if it's been superseded.
+        """
+
+        items = dict()
+        for key, slot_name in self._slot_names.items():
+            try:
+                items[key] = getattr(self, slot_name)
+            except AttributeError:
+                pass
+        if self._extra:
+            items.update(self._extra)
+        return items
+
+
+def create_row_class(name: str, defaults: dict) -> typing.Type[SettingsRow]:
+    """
+    Create a :class:`SettingsRow` subclass with a slot for each of the keys in the given
+    defaults dictionary. The dictionary is kept by reference, so any defaults added to
+    it afterwards will still be used by the row class.
+
+    :meta private:
+    """
+
+    slot_names = {}
+    for index, column in enumerate(defaults):
+        slot_names[column] = f"_c{index}"
+    return type(name, (SettingsRow,), {
+        "__slots__": tuple(slot_names.values()),
+        "_defaults": defaults,
+        "_slot_names": slot_names,
+    })
+
+
+class SettingsStore(dict):
+    """
+    A dictionary of :class:`SettingsRow` objects, used for the bot's settings when the
+    :class:`SettingsCache` isn't enabled. Getting a missing key gives you a row full of
+    default values like a ``defaultdict`` would, but the row is only stored once it's
+    written to (including by changing a list, dict, or set default in-place), so reading
+    the settings of an unknown guild or user doesn't use any memory. Until then, getting
+    the same missing key again gives you the same row for as long as it's still
+    referenced somewhere.
+
+    Parameters
+    -----------
+    name: :class:`str`
+        The name of the settings table, used to name the row class.
+    defaults: :class:`dict`
+        The default settings for each row.
+    """
+
+    def __init__(self, name: str, defaults: dict):
+        super().__init__()
+        self.defaults = defaults
+        self.row_class = create_row_class(name, defaults)
+        self._pending: typing.MutableMapping[int, SettingsRow] = weakref.WeakValueDictionary()
+
+    def __missing__(self, key: int) -> SettingsRow:
+        row = self._pending.get(key)
+        if row is None:
+            row = self.row_class(self, key)
+            self._pending[key] = row
+        return row
+
+    def _release(self, key: int) -> None:
+        """
+        Forget about the detached row for a key, as it's been attached.
+        """
+
+        self._pending.pop(key, None)
+
+    def clear(self) -> None:
+        super().clear()
+        self._pending.clear()
+
+    def set_columns(self) -> None:
+        """
+        Rebuild the row class from the current defaults, so that every column has a slot.
+        This should be run after new columns are added to the defaults.
+        """
+
+        self.row_class = create_row_class(self.row_class.__name__, self.defaults)
+
+    def dump(self) -> typing.Dict[int, dict]:
+        """
+        Get each of the stored rows as a plain dictionary of the values that have been
+        set on it, for use in a :class:`SettingsSnapshot`.
+        """
+
+        return {key: row.get_set_items() for key, row in self.items()}
+
+    def load(self, data: typing.Dict[int, dict]) -> None:
+        """
+        Store the rows from a previous :func:`dump`, updating any rows that already exist.
+        """
+
+        for key, values in data.items():
+            row = self[key]
+            for column, value in values.items():
+                row[column] = value
+
+
+class SettingsCache(collections.abc.MutableMapping):
+    """
+    A bounded cache of rows from one of the bot's settings tables (ie
+    ``guild_settings`` or ``user_settings``), where rows are loaded from
+    the database on first access rather than all at startup.
+
+    Item access works the same as the :class:`SettingsStore` that the bot uses when
+    the cache is disabled - a missing key gives you a row full of default values.
+    The difference is that the missing key is then fetched from the database in
+    the background, and the row that you were given is updated in-place once it
+    arrives. If you need the real values, use :func:`get` (or :func:`prefetch`
+    for many keys at once) instead.
+
+    Parameters
+    -----------
+    table_name: :class:`str`
+        The name of the table that rows should be loaded from.
+    primary_key: :class:`str`
+        The column that the cache is keyed by.
+    defaults: :class:`dict`
+        The default settings for each row.
+    max_size: Optional[:class:`int`]
+        The maximum number of rows to keep in memory. The least recently
+        used rows are evicted first. If ``None``, the cache is unbounded.
+    ttl: Optional[:class:`float`]
+        The number of seconds a loaded row is considered fresh. Stale rows
+        are still returned while they're reloaded. If ``None``, rows never expire.
+    key_filter: Optional[Callable[[:class:`int`], :class:`bool`]]
+        A function that says whether a key should be loaded from the database.
+        Keys that fail the filter are given default rows without being queried.
+
+    Attributes
+    -----------
+    hits: :class:`int`
+        The number of lookups served from memory since the stats were last reset.
+    misses: :class:`int`
+        The number of lookups that needed to go to the database since the stats were last reset.
+    evictions: :class:`int`
+        The number of rows removed to stay under ``max_size`` since the stats were last reset.
+    """
+
+    logger: logging.Logger = logging.getLogger("vbu.settings_cache")
+
+    def __init__(
+            self,
+            table_name: str,
+            primary_key: str,
+            defaults: dict,
+            *,
+            max_size: typing.Optional[int] = None,
+            ttl: typing.Optional[float] = None,
+            key_filter: typing.Optional[typing.Callable[[int], bool]] = None,
+            database: typing.Type[DatabaseWrapper] = DatabaseWrapper):
+        self.table_name = table_name
+        self.primary_key = primary_key
+        self.defaults = defaults
+        self.row_class = create_row_class(table_name, defaults)
+        self.max_size = max_size
+        self.ttl = ttl
+        self.key_filter = key_filter
+        self.database = database
+        self._data: typing.OrderedDict[int, typing.Tuple[SettingsRow, typing.Optional[float]]] = collections.OrderedDict()
+        self._loading: typing.Dict[int, asyncio.Future] = dict()
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__} table={self.table_name!r} size={len(self._data)}>"
+
+    def set_columns(self) -> None:
+        """
+        Rebuild the row class from the current defaults, so that every column has a slot.
+        This should be run after new columns are added to the defaults.
+        """
+
+        self.row_class = create_row_class(self.table_name, self.defaults)
+
+    def _is_fresh(self, expires: typing.Optional[float]) -> bool:
+        return expires is None or expires > time.monotonic()
+
+    def _store(self, key: int, row: dict, *, loaded: bool = True) -> None:
+        """
+        Store a row in the cache, evicting the oldest items if we've gone over our size.
+        Rows that haven't been loaded from the database are stored as already expired.
+        """
+
+        if not loaded:
+            expires = 0.0
+        elif self.ttl is None:
+            expires = None
+        else:
+            expires = time.monotonic() + self.ttl
+        self._data[key] = (row, expires)
+        self._data.move_to_end(key)
+        if self.max_size is None:
+            return
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def _schedule_load(self, key: int) -> None:
+        """
+        Load a key from the database in the background, if we're able to.
+        """
+
+        if key in self._loading or not self.database.enabled:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        task = loop.create_task(self.prefetch(key))
+        task.add_done_callback(self._log_load_error)
+
+    def _log_load_error(self, task: asyncio.Task) -> None:
+        """
+        Log the error from a background load, as nothing else awaits it.
+        """
+
+        if task.cancelled():
+            return
+        error = task.exception()
+        if error is not None:
+            self.logger.error(f"Failed to load rows from {self.table_name} - {error}", exc_info=error)
+
+    def __getitem__(self, key: int) -> SettingsRow:
+        try:
+            row, expires = self._data[key]
+        except KeyError:
+            self.misses += 1
+            row = self.row_class()
+            self._store(key, row, loaded=False)
+            self._schedule_load(key)
+            return row
+        self._data.move_to_end(key)
+        if self._is_fresh(expires):
+            self.hits += 1
+        else:
+            self.misses += 1
+            self._schedule_load(key)
+        return row
+
+    def __setitem__(self, key: int, row: SettingsRow) -> None:
+        self._store(key, row)
+
+    def __delitem__(self, key: int) -> None:
+        del self._data[key]
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._data
+
+    def __iter__(self) -> typing.Iterator[int]:
+        return iter(list(self._data))
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    async def get(self, key: int) -> SettingsRow:  # type: ignore
+        """
+        Get a row from the cache, loading it from the database if it isn't
+        already cached (or if the cached row has expired).
+
+        Parameters
+        -----------
+        key: :class:`int`
+            The primary key of the row you want to get.
+
+        Returns
+        --------
+        :class:`SettingsRow`
+            The cached row.
+        """
+
+        cached = self._data.get(key)
+        if cached and self._is_fresh(cached[1]):
+            self.hits += 1
+            self._data.move_to_end(key)
+            return cached[0]
+        self.misses += 1
+        await self.prefetch(key)
+        cached = self._data.get(key)
+        if cached is None:
+            return self.row_class()
+        return cached[0]
+
+    async def prefetch(self, *keys: int) -> None:
+        """
+        Load a batch of rows from the database in a single query, skipping any
+        that are already cached and fresh. Keys that don't exist in the database
+        are cached as default rows so that they aren't looked up again. Keys that
+        are already being loaded by another task are waited for rather than
+        being queried again, and if that load fails then its error is raised here too.
+
+        Parameters
+        -----------
+        *keys: :class:`int`
+            The primary keys of the rows that you want to load.
+        """
+
+        # Work out which keys actually need loading
+        waiting = set()
+        to_load = []
+        for key in set(keys):
+            if key in self._loading:
+                waiting.add(self._loading[key])
+                continue
+            cached = self._data.get(key)
+            if cached and self._is_fresh(cached[1]):
+                continue
+            to_load.append(key)
+
+        # Load the keys that nobody else is getting
+        if to_load:
+            future = asyncio.get_running_loop().create_future()
+            for key in to_load:
+                self._loading[key] = future
+            try:
+                await self._load(to_load)
+            except Exception as e:
+                future.set_exception(e)
+                future.exception()  # Mark it as retrieved, in case there's nobody waiting
+                raise
+            finally:
+                for key in to_load:
+                    self._loading.pop(key, None)
+                if not future.done():
+                    future.set_result(None)
+
+        # Wait for everyone else
+        if waiting:
+            await asyncio.gather(*waiting)
+
+    async def _load(self, keys: typing.List[int]) -> None:
+        """
+        Select the given keys from the database and store them in the cache.
+        """
+
+        # Only query the keys that we're allowed to
+        query_keys = keys
+        if self.key_filter is not None:
+            query_keys = [i for i in keys if self.key_filter(i)]
+
+        # Grab them from the database
+        rows = []
+        if query_keys:
+            rows = await self._select(query_keys)
+
+        # Update our cached rows in-place so any references are kept up to date
+        found = {}
+        for row in rows:
+            found[row[self.primary_key]] = row
+        for key in keys:
+            cached = self._data.get(key)
+            new_row = cached[0] if cached else self.row_class()
+            db_row = found.get(key)
+            if db_row is not None:
+                for column, value in db_row.items():
+                    new_row[column] = value
+            self._store(key, new_row)
+
+    async def _select(self, keys: typing.List[int]) -> typing.List[typing.Any]:
+        """
+        Select the rows for the given keys from the database, from the partition
+        that each guild is on if the table is partitioned.
+        """
+
+        partitions = self.database.partitions
+        if self.primary_key == "guild_id" and partitions is not None and partitions.is_partitioned(self.table_name):
+            groups: typing.Dict[typing.Optional[str], typing.List[int]] = dict(partitions.group_by_partition(keys))
+        else:
+            groups = {None: keys}
+        rows = []
+        for partition, partition_keys in groups.items():
+            condition, args = self.database.driver.get_any_sql(self.primary_key, partition_keys)
+            sql = "SELECT * FROM {0} WHERE {1}".format(self.table_name, condition)
+            async with self.database(partition=partition) as db:
+                rows.extend(await db.fetch(sql, *args))
+        return rows
+
+    def reset_stats(self) -> typing.Dict[str, int]:
+        """
+        Get the hit, miss, and eviction counts for the cache, resetting them to zero.
+
+        Returns
+        --------
+        Dict[:class:`str`, :class:`int`]
+            A dictionary of ``hits``, ``misses``, and ``evictions``.
+        """
+
+        stats = {"hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+        self.hits = self.misses = self.evictions = 0
+        return stats
@@ -414,14 +414,15 @@ class SettingsMenuOption(object):
             original_data, data = data, serialize_function(data)
 
             # Add to the database
-            async with self.context.bot.database() as db:
-                await db(
-                    "INSERT INTO {0} ({1}, {2}) VALUES ($1, $2) ON CONFLICT ({1}) DO UPDATE SET {2}=$2".format(table_name, primary_key, column_name),
-                    self.context.guild.id, data,
-                )
+            await self.context.bot.database.queue_upsert(
+                table_name,
+                {primary_key: self.context.guild.id},
+                {column_name: data},
+            )
 
             # Cache
             self.context.bot.guild_settings[self.context.guild.id][column_name] = original_data
+            await self.context.bot.publish_settings_update("guild_settings", self.context.guild.id, column_name, original_data)
 
         # Return the callback
         return callback
@@ -459,11 +460,13 @@ class SettingsMenuOption(object):
                 in the callback definition.
                 """
 
-                # Database it
-                async with ctx.bot.database() as db:
+                # Database it, making sure a queued add for the same row isn't written afterwards
+                keys = {"guild_id": ctx.guild.id, column_name: delete_key, "key": database_key}
+                await ctx.bot.database.discard_queued_upsert(table_name, keys)
+                async with ctx.bot.database(partition=ctx.bot.database.get_partition(table_name, ctx.guild.id)) as db:
                     await db(
                         "DELETE FROM {0} WHERE guild_id=$1 AND {1}=$2 AND key=$3".format(table_name, column_name),
-                        ctx.guild.id, delete_key, database_key
+                        *keys.values()
                     )
 
                 # Remove the converted value from cache
@@ -527,12 +530,11 @@ class SettingsMenuOption(object):
                     role, value = data[0], None
 
                 # Database it
-                async with ctx.bot.database() as db:
-                    await db(
-                        """INSERT INTO {0} (guild_id, {1}, key, value) VALUES ($1, $2, $3, $4)
-                        ON CONFLICT (guild_id, {1}, key) DO UPDATE SET value=excluded.value""".format(table_name, column_name),
-                        ctx.guild.id, role.id, database_key, value
-                    )
+                await ctx.bot.database.queue_upsert(
+                    table_name,
+                    {"guild_id": ctx.guild.id, column_name: role.id, "key": database_key},
+                    {"value": value},
+                )
 
                 # Set the original value for the cache
                 if original_data_type is not None:
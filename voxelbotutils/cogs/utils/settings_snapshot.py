@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import pickle
+import typing
+
+
+class SettingsSnapshot(object):
+    """
+    A file on disk holding a copy of the bot's cached settings, written when the bot is
+    closed cleanly and read back on the next startup so that only the rows which were
+    changed in between need to be fetched from the database.
+
+    The snapshot is pickled, so it should only ever be read from a path that the bot
+    itself writes to.
+
+    Parameters
+    -----------
+    path: :class:`str`
+        The path of the snapshot file. If the bot is only running some of its shards
+        then the shard IDs are added to the end of the path, so that each cluster
+        has a file of its own.
+
+    Attributes
+    -----------
+    loaded_at: Optional[Dict[Optional[:class:`str`], Any]]
+        The time that the settings in the snapshot were last read from the database, as
+        given by each database's own clock, keyed by partition name (``None`` being the
+        main database).
+    """
+
+    VERSION: typing.ClassVar[int] = 2
+    logger: logging.Logger = logging.getLogger("vbu.settings_snapshot")
+
+    def __init__(self, path: str):
+        self.path = path
+        self.loaded_at: typing.Optional[typing.Dict[typing.Optional[str], typing.Any]] = None
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__} path={self.path!r}>"
+
+    def get_path(self, shard_ids: typing.Optional[typing.List[int]]) -> str:
+        """
+        Get the path of the snapshot file for the given shard IDs, with each run of
+        consecutive IDs given as a range (eg ``.settings_snapshot.0-7``).
+        """
+
+        if not shard_ids:
+            return self.path
+        ranges: typing.List[typing.List[int]] = []
+        for shard_id in sorted(shard_ids):
+            if ranges and ranges[-1][1] == shard_id - 1:
+                ranges[-1][1] = shard_id
+            else:
+                ranges.append([shard_id, shard_id])
+        suffix = "_".join(str(i) if i == o else f"{i}-{o}" for i, o in ranges)
+        return f"{self.path}.{suffix}"
+
+    def _read(self, path: str) -> typing.Optional[dict]:
+        try:
+            with open(path, "rb") as a:
+                data = pickle.load(a)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            self.logger.warning(f"Failed to read settings snapshot {path} - {e}")
+            return None
+        if not isinstance(data, dict) or data.get("version") != self.VERSION:
+            self.logger.warning(f"Ignoring settings snapshot {path} from a different version")
+            return None
+        return data
+
+    def _write(self, path: str, data: dict) -> None:
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "wb") as a:
+            pickle.dump(data, a, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)  # So a half-written file is never read
+
+    async def read(self, *, shard_count: typing.Optional[int], shard_ids: typing.Optional[typing.List[int]]) -> typing.Optional[dict]:
+        """
+        Read the snapshot from disk.
+
+        Parameters
+        -----------
+        shard_count: Optional[:class:`int`]
+            The shard count of the running bot. Snapshots written with a different
+            shard count are ignored.
+        shard_ids: Optional[List[:class:`int`]]
+            The shard IDs of the running bot. Snapshots written with different
+            shard IDs are ignored.
+
+        Returns
+        --------
+        Optional[:class:`dict`]
+            The data in the snapshot, or ``None`` if there isn't a usable snapshot.
+        """
+
+        path = self.get_path(shard_ids)
+        loop = asyncio.get_running_loop()
+        data = await loop.run_in_executor(None, self._read, path)
+        if data is None:
+            return None
+        if data["shard_count"] != shard_count or data["shard_ids"] != shard_ids:
+            self.logger.info(f"Ignoring settings snapshot {path} made for different shards")
+            return None
+        return data
+
+    async def write(self, data: dict, *, shard_count: typing.Optional[int], shard_ids: typing.Optional[typing.List[int]]) -> bool:
+        """
+        Write the given data to disk, along with the time that it was loaded at
+        and the shards that it's valid for.
+
+        Parameters
+        -----------
+        data: :class:`dict`
+            The data that should be saved.
+        shard_count: Optional[:class:`int`]
+            The shard count of the running bot.
+        shard_ids: Optional[List[:class:`int`]]
+            The shard IDs of the running bot.
+
+        Returns
+        --------
+        :class:`bool`
+            Whether or not the snapshot was written.
+        """
+
+        if self.loaded_at is None:
+            return False
+        data = {
+            **data,
+            "version": self.VERSION,
+            "loaded_at": self.loaded_at,
+            "shard_count": shard_count,
+            "shard_ids": shard_ids,
+        }
+        path = self.get_path(shard_ids)
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(None, self._write, path, data)
+        except Exception as e:
+            self.logger.warning(f"Failed to write settings snapshot {path} - {e}")
+            return False
+        return True
@@ -71,7 +71,7 @@ class StatsdConnection(object):
             StatsdConnection: The connection that was aquired from the pool.
         """
 
-        config = cls.config.copy()
+        config = (cls.config or {}).copy()
         if not config.get("constant_tags", {}).get("service"):
             # cls.logger.debug("Creating fake Statsd connection")
             conn = _FakeStatsdConnection()
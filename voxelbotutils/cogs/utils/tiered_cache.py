@@ -0,0 +1,364 @@
+from __future__ import annotations
+
+import asyncio
+import collections
+import functools
+import json
+import logging
+import math
+import time
+import typing
+
+from .deadline import clear_deadline, wait_with_deadline
+from .redis import RedisConnection
+
+
+class CachedFunction(object):
+    """
+    An async function whose results are cached, made via :func:`voxelbotutils.cached`.
+
+    Results are kept in a bounded in-process LRU cache, and (if ``shared`` is set and
+    Redis is enabled) in Redis so that they're shared between all of the bot's processes.
+    Concurrent calls with the same arguments that miss the cache only run the
+    function once, with every caller getting the same result. Invalidating a result
+    also drops it from the in-process caches of the bot's other processes, via Redis,
+    and stops any call that's already running for it from caching what it returns.
+
+    Every cached function is added to :attr:`registry`, which is available as
+    :attr:`voxelbotutils.Bot.caches`.
+
+    Parameters
+    -----------
+    func: Callable[..., Awaitable[Any]]
+        The function whose results should be cached.
+    ttl: Optional[:class:`float`]
+        The number of seconds a result is cached for. If ``None``, results never expire.
+    maxsize: Optional[:class:`int`]
+        The maximum number of results to keep in memory. The least recently used results
+        are evicted first. If ``None``, the in-process cache is unbounded.
+    shared: :class:`bool`
+        Whether or not results should also be cached in Redis, and invalidations sent to the
+        bot's other processes. Only results made of JSON-native types (dicts with string keys,
+        lists, strings, numbers, booleans and ``None``) are stored there, so that every
+        process gets back exactly the same value - anything else (eg tuples, or dicts with
+        integer keys) is only cached in memory.
+    name: Optional[:class:`str`]
+        The name of the cache, used in :attr:`registry`, for the Redis keys, and for
+        metrics. Defaults to the module and qualified name of the function.
+
+    Attributes
+    -----------
+    hits: :class:`int`
+        The number of calls served from memory since the stats were last reset.
+    shared_hits: :class:`int`
+        The number of calls served from Redis since the stats were last reset.
+    misses: :class:`int`
+        The number of calls that ran the function since the stats were last reset.
+    evictions: :class:`int`
+        The number of results removed to stay under ``maxsize`` since the stats were last reset.
+    """
+
+    registry: typing.ClassVar[typing.Dict[str, CachedFunction]] = {}
+    logger: logging.Logger = logging.getLogger("vbu.cache")
+
+    def __init__(
+            self,
+            func: typing.Callable[..., typing.Awaitable[typing.Any]],
+            *,
+            ttl: typing.Optional[float] = None,
+            maxsize: typing.Optional[int] = 1_024,
+            shared: bool = True,
+            name: typing.Optional[str] = None):
+        self.func = func
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.shared = shared
+        self.name = name or f"{func.__module__}.{func.__qualname__}"
+        self._data: typing.OrderedDict[str, typing.Tuple[typing.Any, typing.Optional[float]]] = collections.OrderedDict()
+        self._loading: typing.Dict[str, asyncio.Task] = dict()
+        self.generation: int = 0
+        self._invalidated_at: typing.Dict[str, int] = dict()
+        self._cleared_at: int = -1
+        self.hits: int = 0
+        self.shared_hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+        functools.update_wrapper(self, func)
+        self.registry[self.name] = self
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__} name={self.name!r} size={len(self._data)}>"
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        return BoundCachedFunction(self, instance)
+
+    def _make_key(self, args: tuple, kwargs: dict) -> str:
+        """
+        Make a cache key from the arguments that the function was called with.
+        """
+
+        return repr((args, sorted(kwargs.items())))
+
+    @property
+    def _is_shared(self) -> bool:
+        return self.shared and RedisConnection.enabled
+
+    def _get_redis_key(self, key: str) -> str:
+        return f"vbu.cache:{self.name}:{key}"
+
+    def _forget_loads(self, keys: typing.Optional[typing.Iterable[str]]) -> None:
+        """
+        Stop the loads that are running for the given keys (or for every key, if ``None``)
+        from storing their results, as they may be out of date. Calls made after this
+        start a load of their own rather than waiting for the old one.
+        """
+
+        if keys is None:
+            self._cleared_at = self.generation
+            self._loading.clear()
+        else:
+            for key in keys:
+                if self._loading.pop(key, None) is not None:
+                    self._invalidated_at[key] = self.generation
+        self.generation += 1
+
+    def _is_current(self, key: str, generation: int) -> bool:
+        """
+        Whether a load that started at the given generation hasn't been invalidated since.
+        """
+
+        return generation > self._cleared_at and self._invalidated_at.get(key, -1) < generation
+
+    def _finish_load(self, key: str, task: asyncio.Task) -> None:
+        if self._loading.get(key) is task:
+            del self._loading[key]
+        if key not in self._loading:
+            self._invalidated_at.pop(key, None)
+
+    def _store(self, key: str, value: typing.Any) -> None:
+        """
+        Store a value in memory, evicting the oldest items if we've gone over our size.
+        """
+
+        expires = time.monotonic() + self.ttl if self.ttl is not None else None
+        self._data[key] = (value, expires)
+        self._data.move_to_end(key)
+        while self.maxsize is not None and len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    async def __call__(self, *args, **kwargs) -> typing.Any:
+        """
+        Get the result of the function for the given arguments, from the cache
+        if it's in there.
+        """
+
+        return await self.call((), args, kwargs)
+
+    async def call(self, instance: tuple, args: tuple, kwargs: dict) -> typing.Any:
+        """
+        Get the result of the function for the given arguments, from the cache if it's
+        in there. The instance (if the function was decorated inside of a class) is
+        passed to the function but isn't part of the cache key.
+
+        :meta private:
+        """
+
+        key = self._make_key(args, kwargs)
+
+        # See if it's in memory
+        try:
+            value, expires = self._data[key]
+        except KeyError:
+            pass
+        else:
+            if expires is None or expires > time.monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._data[key]
+
+        # Get it, or wait for whoever's already getting it
+        task = self._loading.get(key)
+        if task is None:
+            task = asyncio.get_running_loop().create_task(self._load(key, self.generation, instance, args, kwargs))
+            self._loading[key] = task
+            task.add_done_callback(functools.partial(self._finish_load, key))
+        return await wait_with_deadline(asyncio.shield(task))
+
+    async def _load(self, key: str, generation: int, instance: tuple, args: tuple, kwargs: dict) -> typing.Any:
+        """
+        Get a value from Redis, or from the function itself, storing it in the caches
+        unless the key was invalidated while we were getting it.
+        """
+
+        clear_deadline()  # Everyone waiting on this goes by their own deadline
+
+        # See if it's in Redis
+        if self._is_shared:
+            try:
+                async with RedisConnection() as re:
+                    data = await re.get(self._get_redis_key(key))
+            except Exception as e:
+                self.logger.warning(f"Failed to get result of {self.name} from Redis - {e}")
+                data = None
+            if data is not None:
+                value = json.loads(data)
+                self.shared_hits += 1
+                if self._is_current(key, generation):
+                    self._store(key, value)
+                return value
+
+        # Run the function
+        self.misses += 1
+        value = await self.func(*instance, *args, **kwargs)
+        if not self._is_current(key, generation):
+            return value
+        self._store(key, value)
+
+        # And store it in Redis, as long as it comes back out as the same value
+        if self._is_shared:
+            try:
+                data = json.dumps(value)
+                if json.loads(data) != value:
+                    raise TypeError("value changes when serialized")
+            except (TypeError, ValueError):
+                self.logger.debug(f"Not storing result of {self.name} in Redis - value is not JSON-native")
+            else:
+                pexpire = max(1, math.ceil(self.ttl * 1_000)) if self.ttl is not None else 0
+                try:
+                    async with RedisConnection() as re:
+                        await re.set(self._get_redis_key(key), data, pexpire=pexpire)
+                except Exception as e:
+                    self.logger.warning(f"Failed to store result of {self.name} in Redis - {e}")
+        return value
+
+    async def invalidate(self, *args, **kwargs) -> None:
+        """
+        Remove the cached result for the given arguments, both from memory and from Redis,
+        and tell the bot's other processes to remove it from their memory.
+        """
+
+        key = self._make_key(args, kwargs)
+        self._data.pop(key, None)
+        self._forget_loads([key])
+        if self._is_shared:
+            async with RedisConnection() as re:
+                await re.delete(self._get_redis_key(key))
+                await re.publish_cache_invalidation(self.name, [key])
+
+    def invalidate_keys(self, *keys: str) -> None:
+        """
+        Remove the cached results for the given cache keys from memory, without telling
+        any other processes. This is used to apply invalidations sent by other processes.
+
+        :meta private:
+        """
+
+        for key in keys:
+            self._data.pop(key, None)
+        self._forget_loads(keys)
+
+    def clear(self) -> None:
+        """
+        Remove every result from the in-process cache.
+        """
+
+        self._data.clear()
+        self._forget_loads(None)
+
+    def reset_stats(self) -> typing.Dict[str, int]:
+        """
+        Reset the hit, miss, and eviction counters, returning their values before being reset.
+        """
+
+        stats = {
+            "hits": self.hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+        self.hits = self.shared_hits = self.misses = self.evictions = 0
+        return stats
+
+
+class BoundCachedFunction(object):
+    """
+    A :class:`CachedFunction` that was decorated inside of a class, bound to an
+    instance of that class.
+
+    :meta private:
+    """
+
+    __slots__ = ("cache", "instance",)
+
+    def __init__(self, cache: CachedFunction, instance: typing.Any):
+        self.cache = cache
+        self.instance = instance
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__} cache={self.cache!r} instance={self.instance!r}>"
+
+    async def __call__(self, *args, **kwargs) -> typing.Any:
+        return await self.cache.call((self.instance,), args, kwargs)
+
+    async def invalidate(self, *args, **kwargs) -> None:
+        """
+        See :func:`CachedFunction.invalidate`.
+        """
+
+        await self.cache.invalidate(*args, **kwargs)
+
+    def clear(self) -> None:
+        """
+        See :func:`CachedFunction.clear`.
+        """
+
+        self.cache.clear()
+
+
+def cached(
+        *,
+        ttl: typing.Optional[float] = None,
+        maxsize: typing.Optional[int] = 1_024,
+        shared: bool = True,
+        name: typing.Optional[str] = None,
+        ) -> typing.Callable[[typing.Callable[..., typing.Awaitable[typing.Any]]], CachedFunction]:
+    """
+    Cache the results of an async function or method, in memory and optionally in Redis.
+    See :class:`voxelbotutils.CachedFunction` for the details of each argument.
+
+    Examples:
+
+        ::
+
+            class MyCog(voxelbotutils.Cog):
+
+                @voxelbotutils.cached(ttl=60, maxsize=1_000)
+                async def get_role_list(self, guild_id: int) -> typing.List[int]:
+                    async with vbu.Database() as db:
+                        rows = await db("SELECT role_id FROM role_list WHERE guild_id=$1", guild_id)
+                    return [i['role_id'] for i in rows]
+
+                @voxelbotutils.command()
+                async def roles(self, ctx):
+                    roles = await self.get_role_list(ctx.guild.id)
+
+                    # The cached value can be removed when it's changed
+                    await self.get_role_list.invalidate(ctx.guild.id)
+
+    Args:
+        ttl (float, optional): The number of seconds a result is cached for.
+        maxsize (int, optional): The maximum number of results kept in memory.
+        shared (bool, optional): Whether or not results should also be cached in Redis.
+        name (str, optional): The name of the cache.
+    """
+
+    def wrapper(func):
+        return CachedFunction(func, ttl=ttl, maxsize=maxsize, shared=shared, name=name)
+    return wrapper
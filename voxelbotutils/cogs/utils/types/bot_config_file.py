@@ -12,6 +12,17 @@ __all__ = (
     "_BotInfoLinks",
     "_BotInfo",
     "_Oauth",
+    "_DatabaseSettingsCache",
+    "_DatabaseWriteBehind",
+    "_DatabaseSnapshot",
+    "_DatabaseSQLite",
+    "_DatabasePostgres",
+    "_DatabaseInstrumentation",
+    "_DatabaseReplica",
+    "_DatabaseQueryCache",
+    "_DatabaseNotifications",
+    "_DatabasePartition",
+    "_DatabasePartitions",
     "_Database",
     "_Redis",
     "_ShardManager",
@@ -92,6 +103,78 @@ class _Oauth(TypedDict):
     permissions: List[str]
 
 
+class _DatabaseSettingsCache(TypedDict):
+    enabled: bool
+    max_size: int
+    ttl: float
+
+
+class _DatabaseWriteBehind(TypedDict):
+    enabled: bool
+    delay: float
+    max_size: int
+    max_retries: int
+
+
+class _DatabaseSnapshot(TypedDict):
+    enabled: bool
+    path: str
+    updated_column: str
+
+
+class _DatabaseSQLite(TypedDict):
+    pool_size: int
+    synchronous: Literal["OFF", "NORMAL", "FULL", "EXTRA"]
+    max_batch_size: int
+
+
+class _DatabasePostgres(TypedDict):
+    json_codecs: bool
+    statement_timeout: int
+    prepared_statements: List[str]
+    init: str
+    setup: str
+
+
+class _DatabaseInstrumentation(TypedDict):
+    enabled: bool
+    slow_query_threshold: float
+    max_logged_args: int
+
+
+class _DatabaseReplica(TypedDict):
+    host: str
+    port: int
+    database: str
+    user: str
+    password: str
+
+
+class _DatabaseQueryCache(TypedDict):
+    max_size: int
+    shared: bool
+
+
+class _DatabaseNotifications(TypedDict):
+    enabled: bool
+    channel: str
+
+
+class _DatabasePartition(TypedDict):
+    name: str
+    host: str
+    port: int
+    database: str
+    user: str
+    password: str
+
+
+class _DatabasePartitions(TypedDict):
+    databases: List[_DatabasePartition]
+    tables: List[str]
+    router: str
+
+
 class _Database(TypedDict):
     type: Literal["postgres", "sqlite", "mysql"]
     enabled: bool
@@ -100,6 +183,26 @@ class _Database(TypedDict):
     database: str
     host: str
     port: int
+    min_size: int
+    max_size: int
+    acquire_timeout: float
+    chunk_size: int
+    cache_setup_concurrency: int
+    statement_cache_size: int
+    statement_cache_threshold: int
+    replicas: List[_DatabaseReplica]
+    replica_max_lag: float
+    replica_check_interval: float
+    migrations: str
+    settings_cache: _DatabaseSettingsCache
+    write_behind: _DatabaseWriteBehind
+    snapshot: _DatabaseSnapshot
+    sqlite: _DatabaseSQLite
+    postgres: _DatabasePostgres
+    instrumentation: _DatabaseInstrumentation
+    query_cache: _DatabaseQueryCache
+    notifications: _DatabaseNotifications
+    partitions: _DatabasePartitions
 
 
 class _Redis(TypedDict):
@@ -168,6 +271,8 @@ class BotConfig(TypedDict):
     guild_settings_prefix_column: str
     ephemeral_error_messages: bool
     owners_ignore_check_failures: bool
+    command_deadline: float
+    slash_command_deadline: float
 
     default_prefix: str
     cached_messages: int
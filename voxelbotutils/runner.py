@@ -13,6 +13,7 @@ from discord.ext import commands
 import toml
 
 from .cogs.utils.database import DatabaseWrapper
+from .cogs.utils.database.migrations import MigrationRunner
 from .cogs.utils.redis import RedisConnection
 from .cogs.utils.statsd import StatsdConnection
 from .cogs.utils.custom_bot import Bot
@@ -196,35 +197,16 @@ def set_default_log_levels(args: argparse.Namespace) -> None:
         _set_default_log_level(i, log_filter, formatter, getattr(args, "loglevel", "ERROR"))
 
 
-async def create_initial_database(db: DatabaseWrapper) -> bool:
+async def create_initial_database(db: DatabaseWrapper, migrations_directory: str = "./config/migrations") -> bool:
     """
-    Create the initial database using the internal database.psql file.
+    Apply any database migrations that haven't been applied yet, as well as the
+    internal database.pgsql file if it's been changed since it was last applied.
     """
 
-    # Open the db file
-    try:
-        with open("./config/database.pgsql") as a:
-            data = a.read()
-    except Exception:
+    runner = MigrationRunner.from_directory(migrations_directory, legacy_file="./config/database.pgsql")
+    if not runner.migrations:
         return False
-
-    # Get the statements
-    create_table_statements = []
-    current_line = ''
-    for line in data.split('\n'):
-        if line.lstrip().startswith('--'):
-            continue
-        current_line += line + '\n'
-        if line.endswith(';') and not line.startswith(' '):
-            create_table_statements.append(current_line.strip())
-            current_line = ''
-
-    # Let's do it baybeee
-    for i in create_table_statements:
-        if i and i.strip():
-            await db(i.strip())
-
-    # Sick we're done
+    await runner.run(db)
     return True
 
 
@@ -247,9 +229,17 @@ async def start_database_pool(config: dict) -> None:
     except Exception:
         raise Exception("Error creating database pool")
     logger.info("Created database pool successfully")
-    logger.info("Creating initial database tables")
+    logger.info("Running database migrations")
+    migrations_directory = config['database'].get('migrations', "./config/migrations")
     async with DatabaseWrapper() as db:
-        await create_initial_database(db)
+        await create_initial_database(db, migrations_directory)
+
+    # Each partition has the same schema as the main database
+    if DatabaseWrapper.partitions is not None:
+        for partition in DatabaseWrapper.partitions.pools_by_name:
+            logger.info(f"Running database migrations on partition {partition}")
+            async with DatabaseWrapper(partition=partition) as db:
+                await create_initial_database(db, migrations_directory)
 
 
 async def start_redis_pool(config: dict) -> None:
@@ -439,7 +429,8 @@ def run_bot(args: argparse.Namespace) -> None:
         logger.info("Closing database pool")
         try:
             if DatabaseWrapper.pool:
-                loop.run_until_complete(asyncio.wait_for(DatabaseWrapper.pool.close(), timeout=30.0))
+                loop.run_until_complete(asyncio.wait_for(DatabaseWrapper.flush_writes(), timeout=30.0))
+                loop.run_until_complete(asyncio.wait_for(DatabaseWrapper.close_pool(), timeout=30.0))
         except asyncio.TimeoutError:
             logger.error("Couldn't gracefully close the database connection pool within 30 seconds")
     if bot.config.get('redis', {}).get('enabled', False):
@@ -524,7 +515,8 @@ def run_interactions(args: argparse.Namespace) -> None:
         logger.info("Closing database pool")
         try:
             if DatabaseWrapper.pool:
-                loop.run_until_complete(asyncio.wait_for(DatabaseWrapper.pool.close(), timeout=30.0))
+                loop.run_until_complete(asyncio.wait_for(DatabaseWrapper.flush_writes(), timeout=30.0))
+                loop.run_until_complete(asyncio.wait_for(DatabaseWrapper.close_pool(), timeout=30.0))
         except asyncio.TimeoutError:
             logger.error("Couldn't gracefully close the database connection pool within 30 seconds")
     if bot.config.get('redis', {}).get('enabled', False):
@@ -688,7 +680,8 @@ def run_website(args: argparse.Namespace) -> None:
         logger.info("Closing database pool")
         try:
             if DatabaseWrapper.pool:
-                loop.run_until_complete(asyncio.wait_for(DatabaseWrapper.pool.close(), timeout=30.0))
+                loop.run_until_complete(asyncio.wait_for(DatabaseWrapper.flush_writes(), timeout=30.0))
+                loop.run_until_complete(asyncio.wait_for(DatabaseWrapper.close_pool(), timeout=30.0))
         except asyncio.TimeoutError:
             logger.error("Couldn't gracefully close the database connection pool within 30 seconds")
     if config.get('redis', {}).get('enabled', False):
@@ -835,7 +828,8 @@ def run_shell(args: argparse.Namespace) -> None:
         logger.info("Closing database pool")
         try:
             if DatabaseWrapper.pool:
-                loop.run_until_complete(asyncio.wait_for(DatabaseWrapper.pool.close(), timeout=30.0))
+                loop.run_until_complete(asyncio.wait_for(DatabaseWrapper.flush_writes(), timeout=30.0))
+                loop.run_until_complete(asyncio.wait_for(DatabaseWrapper.close_pool(), timeout=30.0))
         except asyncio.TimeoutError:
             logger.error("Couldn't gracefully close the database connection pool within 30 seconds")
     if bot.config.get('redis', {}).get('enabled', False):